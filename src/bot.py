@@ -1,13 +1,24 @@
 # src/bot.py
 from __future__ import annotations
 
+# isort: off
+# En premier : t0 du rapport de démarrage pris avant les imports lourds
+from src.core.startup import STARTUP
+
+# isort: on
+import asyncio
 import importlib.metadata
+import signal
+from collections.abc import Callable
 
 import discord
 
-from src.botui.commands import install_commands
 from src.config import settings
-from src.scheduler.loop import start_scheduler
+
+# Seuls discord.py et la config sont importés ici : la pile pipeline
+# (scheduler, ESI, pricing, embeds) est importée dans setup_hook et les
+# slash commands dans on_ready, pour que le login Discord parte tout de suite
+STARTUP.mark("imports")
 
 try:
     __version__ = importlib.metadata.version("killmailbot")
@@ -18,33 +29,84 @@ intents = discord.Intents.none()
 intents.guilds = True
 intents.messages = True
 
-client = discord.Client(intents=intents)
+
+class KillMailClient(discord.Client):
+    # Sauvegarde du snapshot d'état renvoyée par le scheduler (opt-in)
+    save_snapshot: Callable[[], None] | None = None
+
+    async def setup_hook(self) -> None:
+        # Appelé après le login HTTP, avant la connexion gateway : le pipeline
+        # (poll ESI, enrichissement) démarre sans attendre on_ready
+        from src.core.tenants import load_tenants
+        from src.scheduler.loop import start_scheduler
+
+        STARTUP.mark("pipeline imports")
+        try:
+            self.save_snapshot = await start_scheduler(self, load_tenants(settings))
+        except Exception as e:
+            print(f"Scheduler start failed: {e}")
+
+
+client = KillMailClient(intents=intents)
 
 
 @client.event
 async def on_ready():
+    STARTUP.mark("gateway ready")
+    STARTUP.report_once("gateway ready", "first poll")
     user = client.user
     assert user is not None
     print(f"KillMailBot v{__version__} - Release: 26/11/2025")
     print(f"Logged in as {user} (ID: {user.id})")
 
+    from src.botui.commands import install_commands
+
     try:
         await install_commands(client)  # ⬅️ plus de client.tree ici
     except Exception as e:
         print(f"Slash commands setup failed: {e}")
 
+
+def _install_uvloop() -> bool:
+    """Active uvloop si disponible (déclaré pour Linux dans pyproject.toml)."""
     try:
-        channel_id = int(settings.DISCORD_CHANNEL_ID)
-        await start_scheduler(client, channel_id)
-    except Exception as e:
-        print(f"Scheduler start failed: {e}")
+        import uvloop  # type: ignore[import-not-found]
+    except ImportError:
+        return False
+    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    return True
+
+
+def _sigterm_to_interrupt(_signum, _frame):
+    # docker stop / tini envoient SIGTERM : on sort comme sur Ctrl+C pour
+    # laisser discord.py fermer proprement et sauvegarder le snapshot
+    raise KeyboardInterrupt
 
 
 def main():
     token = settings.DISCORD_TOKEN
-    if not token:
-        raise SystemExit("DISCORD_TOKEN manquant dans .env")
-    client.run(token, log_handler=None)
+    # Mode headless : posts via webhook(s), ni gateway ni slash commands
+    headless = bool(getattr(settings, "DISCORD_WEBHOOK_URL", "")) or (
+        not token and bool(getattr(settings, "TENANTS_FILE", ""))
+    )
+    if not token and not headless:
+        raise SystemExit("DISCORD_TOKEN (ou DISCORD_WEBHOOK_URL) manquant dans .env")
+    print(f"[startup] event loop: {'uvloop' if _install_uvloop() else 'asyncio'}")
+    signal.signal(signal.SIGTERM, _sigterm_to_interrupt)
+    if headless:
+        from src.headless import run_headless
+
+        try:
+            asyncio.run(run_headless())
+        except KeyboardInterrupt:
+            pass
+        return
+    STARTUP.wait_for("gateway ready")
+    try:
+        client.run(token, log_handler=None)
+    finally:
+        if client.save_snapshot is not None:
+            client.save_snapshot()
 
 
 if __name__ == "__main__":
@@ -5,13 +5,22 @@ import discord
 import httpx
 from discord import app_commands
 
-from src.botui.test_runner import run_test_post
-from src.esi.client import AsyncESIClient
+# Diagnostics (test_runner) et client ESI importés à la demande : rarement
+# utilisés, ils ne doivent pas ralentir le démarrage du bot
 
 _tree: app_commands.CommandTree | None = None
+# /profile : durée max d'une capture (le token d'interaction vit 15 min)
+PROFILE_TIMEOUT_S = 14 * 60
 _commands_installed = False
 
 
+def _tenant_runtime(name: str):
+    """Runtime du tenant nommé (défaut : le premier), None si inconnu."""
+    from src.scheduler import loop
+
+    return loop.RUNTIME.get(name) if name else next(iter(loop.RUNTIME.values()), None)
+
+
 def _get_tree(client: discord.Client) -> app_commands.CommandTree:
     global _tree
     if _tree is None:
@@ -32,6 +41,8 @@ async def install_commands(client: discord.Client) -> None:
 
     @tree.command(name="status", description="Statut rapide")
     async def status(interaction: discord.Interaction):
+        from src.esi.client import AsyncESIClient
+
         await interaction.response.defer(ephemeral=True)
         esi = AsyncESIClient()
         try:
@@ -62,10 +73,20 @@ async def install_commands(client: discord.Client) -> None:
         finally:
             await esi.aclose()
 
+    @tree.command(name="stats", description="Statistiques internes (caches, files, polls)")
+    async def stats(interaction: discord.Interaction):
+        from src.botui.stats import collect_stats, format_stats
+
+        # Limite Discord : 2000 caractères par message
+        text = format_stats(collect_stats())
+        await interaction.response.send_message(text[:2000], ephemeral=True)
+
     @tree.command(
         name="test_post_esi", description="Poste le kill le plus récent via ESI (diagnostic)."
     )
     async def test_post_esi(interaction: discord.Interaction):
+        from src.botui.test_runner import run_test_post
+
         await run_test_post(interaction, source="esi")
 
     @tree.command(
@@ -73,6 +94,8 @@ async def install_commands(client: discord.Client) -> None:
         description="Poste le kill le plus récent via zKill (diagnostic, via ESI).",
     )
     async def test_post_zkill(interaction: discord.Interaction):
+        from src.botui.test_runner import run_test_post
+
         await run_test_post(interaction, source="zkill")
 
     @tree.command(
@@ -101,5 +124,221 @@ async def install_commands(client: discord.Client) -> None:
                 ephemeral=True,
             )
 
+    @tree.command(
+        name="profile",
+        description="Profile les N prochains polls ou traitements de kill (admin)",
+    )
+    @app_commands.default_permissions(administrator=True)
+    @app_commands.describe(target="poll | process", count="Nombre d'événements (1-50)")
+    async def profile(interaction: discord.Interaction, target: str = "process", count: int = 5):
+        import asyncio
+        import io
+
+        from src.core.profiler import PROFILER
+
+        perms = getattr(interaction.user, "guild_permissions", None)
+        if perms is None or not perms.administrator:
+            await interaction.response.send_message(
+                "⛔ Réservé aux administrateurs.", ephemeral=True
+            )
+            return
+        try:
+            report = PROFILER.start(target.lower().strip(), count)
+        except (ValueError, RuntimeError) as e:
+            await interaction.response.send_message(f"❌ {e}", ephemeral=True)
+            return
+        await interaction.response.defer(ephemeral=True, thinking=True)
+        try:
+            # Le token d'interaction expire à 15 min : rapport partiel avant
+            await asyncio.wait_for(asyncio.shield(report), timeout=PROFILE_TIMEOUT_S)
+        except TimeoutError:
+            PROFILER.stop()
+        text = await report
+        await interaction.followup.send(
+            text.splitlines()[0],
+            file=discord.File(io.BytesIO(text.encode()), filename="profile.txt"),
+            ephemeral=True,
+        )
+
+    @tree.command(
+        name="backfill",
+        description="Rattrape l'historique zKill dans l'archive locale (admin)",
+    )
+    @app_commands.default_permissions(administrator=True)
+    @app_commands.describe(
+        action="start | status | stop",
+        pages="Pages d'historique zKill, ex. 1-20 (défaut 1-10)",
+        since="Premier jour YYYY-MM-DD (au lieu des pages)",
+        until="Dernier jour YYYY-MM-DD (défaut : aujourd'hui)",
+        post="Poste aussi les kills dans le channel",
+        restart="Ignore le checkpoint et repart du début",
+        tenant="Tenant (défaut : le premier)",
+    )
+    async def backfill(
+        interaction: discord.Interaction,
+        action: str = "start",
+        pages: str = "",
+        since: str = "",
+        until: str = "",
+        post: bool = False,
+        restart: bool = False,
+        tenant: str = "",
+    ):
+        from src.scheduler.backfill import JOBS, parse_job, start_backfill, stop_backfill
+
+        perms = getattr(interaction.user, "guild_permissions", None)
+        if perms is None or not perms.administrator:
+            await interaction.response.send_message(
+                "⛔ Réservé aux administrateurs.", ephemeral=True
+            )
+            return
+        runtime = _tenant_runtime(tenant)
+        if runtime is None:
+            await interaction.response.send_message(
+                f"❌ Tenant inconnu ou scheduler non démarré : {tenant or 'default'}",
+                ephemeral=True,
+            )
+            return
+        a = (action or "start").lower().strip()
+        if a == "status":
+            current = JOBS.get(runtime.name)
+            text = current.summary() if current is not None else "Aucun backfill lancé."
+        elif a == "stop":
+            stopped = stop_backfill(runtime.name)
+            text = (
+                "⏹️ Backfill arrêté (reprise possible)." if stopped else "Aucun backfill en cours."
+            )
+        elif a == "start":
+            try:
+                job = parse_job(
+                    runtime.tenant.corporation_id if runtime.tenant else 0,
+                    pages=pages,
+                    since=since,
+                    until=until,
+                    post=post,
+                )
+                text = "▶️ " + start_backfill(runtime, job, restart=restart).summary()
+            except (ValueError, RuntimeError) as e:
+                text = f"❌ {e}"
+        else:
+            text = "Utilisation : /backfill action:<start|status|stop>"
+        await interaction.response.send_message(text, ephemeral=True)
+
+    @tree.command(name="summary", description="Bilan kills/pertes de la période (archive locale)")
+    @app_commands.describe(period="day | week | month | all", tenant="Tenant (défaut : le premier)")
+    async def summary(interaction: discord.Interaction, period: str = "month", tenant: str = ""):
+        from src.botui.reports import PERIOD_LABELS, format_summary
+
+        runtime = _tenant_runtime(tenant)
+        archive = runtime.ctx.archive if runtime is not None and runtime.ctx else None
+        p = (period or "month").lower().strip()
+        if archive is None:
+            text = "❌ Archive indisponible (scheduler non démarré ou tenant inconnu)."
+        elif p not in PERIOD_LABELS:
+            text = f"❌ Période inconnue : {period} (day | week | month | all)"
+        else:
+            text = format_summary(archive, p)
+        await interaction.response.send_message(text[:2000], ephemeral=True)
+
+    @tree.command(name="top", description="Classement de la période (archive locale)")
+    @app_commands.describe(
+        by="pilot | corp | alliance | ship | system | region",
+        kind="kills | losses",
+        period="day | week | month | all",
+        metric="isk | count",
+        limit="Nombre de lignes (1-25)",
+        tenant="Tenant (défaut : le premier)",
+    )
+    async def top(
+        interaction: discord.Interaction,
+        by: str = "pilot",
+        kind: str = "kills",
+        period: str = "week",
+        metric: str = "isk",
+        limit: int = 10,
+        tenant: str = "",
+    ):
+        from src.botui.reports import PERIOD_LABELS, format_top
+        from src.core.archive import GROUPS
+
+        runtime = _tenant_runtime(tenant)
+        ctx = runtime.ctx if runtime is not None else None
+        by, kind = by.lower().strip(), kind.lower().strip()
+        period, metric = period.lower().strip(), metric.lower().strip()
+        if ctx is None or ctx.archive is None:
+            text = "❌ Archive indisponible (scheduler non démarré ou tenant inconnu)."
+        elif by not in GROUPS or kind not in ("kills", "losses"):
+            text = f"❌ Utilisation : by:<{' | '.join(GROUPS)}> kind:<kills | losses>"
+        elif period not in PERIOD_LABELS or metric not in ("isk", "count"):
+            text = "❌ Utilisation : period:<day | week | month | all> metric:<isk | count>"
+        else:
+            await interaction.response.defer(ephemeral=True)
+            text = await format_top(
+                ctx.archive,
+                period=period,
+                by=by,
+                kills=kind == "kills",
+                metric=metric,
+                limit=max(1, min(25, limit)),
+                resolve_names=ctx.resolve_names,
+                esi=ctx.esi,
+            )
+            await interaction.followup.send(text[:2000], ephemeral=True)
+            return
+        await interaction.response.send_message(text, ephemeral=True)
+
+    @tree.command(name="search", description="Recherche de kills dans l'archive locale")
+    @app_commands.describe(
+        pilot="Personnage (nom exact ou ID)",
+        corp="Corporation (nom exact ou ID)",
+        alliance="Alliance (nom exact ou ID)",
+        ship="Type de vaisseau (nom exact ou ID)",
+        system="Système solaire (nom exact ou ID)",
+        role="any | victim | attacker",
+        limit="Nombre de résultats (1-25)",
+        tenant="Tenant (défaut : le premier)",
+    )
+    async def search(
+        interaction: discord.Interaction,
+        pilot: str = "",
+        corp: str = "",
+        alliance: str = "",
+        ship: str = "",
+        system: str = "",
+        role: str = "any",
+        limit: int = 10,
+        tenant: str = "",
+    ):
+        from src.botui.reports import format_search, search_criteria
+        from src.core.search import ROLES
+
+        runtime = _tenant_runtime(tenant)
+        ctx = runtime.ctx if runtime is not None else None
+        role = role.lower().strip()
+        raw = {"pilot": pilot, "corp": corp, "alliance": alliance, "ship": ship, "system": system}
+        if ctx is None or ctx.archive is None:
+            text = "❌ Archive indisponible (scheduler non démarré ou tenant inconnu)."
+        elif not any(v.strip() for v in raw.values()):
+            text = "❌ Au moins un critère : pilot, corp, alliance, ship ou system."
+        elif role not in ROLES:
+            text = f"❌ Rôle inconnu : {role} ({' | '.join(ROLES)})"
+        else:
+            await interaction.response.defer(ephemeral=True)
+            try:
+                criteria = await search_criteria(raw, ctx.esi)
+                text = await format_search(
+                    ctx.archive,
+                    criteria,
+                    role=role,
+                    limit=max(1, min(25, limit)),
+                    resolve_names=ctx.resolve_names,
+                    esi=ctx.esi,
+                )
+            except Exception as e:
+                text = f"❌ {e}"
+            await interaction.followup.send(text[:2000], ephemeral=True)
+            return
+        await interaction.response.send_message(text, ephemeral=True)
+
     await tree.sync()
     _commands_installed = True
@@ -67,6 +67,14 @@ def row_link(label: str, text: str | None, url: str | None) -> str:
     return f"{label}: —"
 
 
+# Valeur affichée tant que le pricing n'est pas terminé (post provisoire)
+VALUING_PLACEHOLDER = "*valuing…*"
+
+
+def _isk_or_pending(value: float | None) -> str:
+    return format_isk(value) if value is not None else VALUING_PLACEHOLDER
+
+
 # --------- Main embed builder ----------
 
 
@@ -83,11 +91,13 @@ def build_embed_insight5(
     region_name: str,
     ship_name: str,
     final_ship_name: str | None,
-    total_value: float,
+    total_value: float | None,
     is_kill: bool,
     region_id: int | None = None,
-    dropped_value: float = 0.0,
+    dropped_value: float | None = 0.0,
 ) -> discord.Embed:
+    # total_value / dropped_value à None : embed provisoire, valeurs en cours
+    # de calcul (message édité ensuite)
     status = "Kill" if is_kill else "Loss"
     header = f"{status}: {ship_name} destroyed in {system_name}({region_name})"
     color = KILL_GREEN if is_kill else LOSS_RED
@@ -171,8 +181,8 @@ def build_embed_insight5(
         f_lines.append(row_link("Alliance", final_all_name, zkill_alliance(fb.alliance_id)))
     else:
         f_lines.append("Alliance: —")
-    f_lines.append(f"Drop:  {format_isk(dropped_value)}")
-    f_lines.append(f"Value: {format_isk(total_value)}")
+    f_lines.append(f"Drop:  {_isk_or_pending(dropped_value)}")
+    f_lines.append(f"Value: {_isk_or_pending(total_value)}")
 
     embed.add_field(
         name="Final Blow  ‎ ‎ ‎ ‎ ‎ ‎ ‎ ‎ ‎ ‎ ‎ ‎ ‎ ‎ ‎ ‎ ‎ ‎ ‎ ‎ ‎ ‎ ‎ ‎ ‎ ‎ ‎ ‎ ‎ ‎ ‎ ‎ ‎ ‎ ‎ ‎ ‎ ‎ ‎ ‎",
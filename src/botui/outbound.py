@@ -0,0 +1,485 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any
+
+import aiohttp
+import discord
+import httpx
+
+from src.core.metrics import METRICS
+
+# Limites Discord par message
+MAX_EMBEDS_PER_MESSAGE = 10
+MAX_CHARS_PER_MESSAGE = 6000
+# Backoff des erreurs transitoires (Discord indisponible, 5xx, réseau)
+RETRY_MIN_S = 2.0
+RETRY_MAX_S = 300.0
+# Compaction du journal de l'outbox : lignes mortes tolérées avant réécriture
+COMPACT_MIN_DEAD = 200
+
+
+@dataclass
+class _Item:
+    embed: discord.Embed
+    fut: asyncio.Future
+    seq: int | None = None  # entrée de l'outbox disque (None = non durable)
+    meta: dict[str, Any] = field(default_factory=dict)
+    editable: bool = False
+
+
+@dataclass
+class _Slot:
+    """Position d'un embed éditable dans un message envoyé. `embeds` est la
+    liste partagée par tous les slots du message (état courant affiché)."""
+
+    msg: Any
+    embeds: list[discord.Embed]
+    index: int
+    lock: asyncio.Lock
+
+
+class ChannelUnavailable(Exception):
+    """Le channel (ou webhook) configuré n'accepte pas de messages."""
+
+
+def _http_status(exc: BaseException) -> int | None:
+    # discord.HTTPException et WebhookError exposent tous deux `status`
+    status = getattr(exc, "status", None)
+    return status if isinstance(status, int) else None
+
+
+def _record_send(op: str, result: str, t0: float) -> None:
+    seconds = time.perf_counter() - t0
+    METRICS.inc("killbot_discord_sends_total", op=op, result=result)
+    METRICS.observe("killbot_discord_send_seconds", seconds, op=op)
+
+
+def is_retryable_error(exc: BaseException) -> bool:
+    """Erreurs transitoires : réseau, 429, 5xx Discord. Tout le reste (droits,
+    channel, payload refusé, bug de sérialisation) échoue immédiatement."""
+    status = _http_status(exc)
+    if status is not None:
+        return status == 429 or status >= 500
+    return isinstance(exc, OSError | aiohttp.ClientError | httpx.TransportError | TimeoutError)
+
+
+class OutboxLog:
+    """Outbox disque en journal JSONL append-only.
+
+    Chaque post durable ajoute une ligne `add`, chaque acquittement une ligne
+    `done` : coût O(1) par opération, même avec un gros backlog en panne. Le
+    journal est rejoué au démarrage et compacté quand les lignes mortes
+    dominent.
+
+    Aucune I/O dans la boucle : les lignes ajoutées pendant une écriture
+    partent ensemble à la suivante, dans un thread, avec un seul fsync (group
+    commit). Sans boucle asyncio active, elles sont écrites immédiatement."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.records: dict[int, dict] = {}
+        self._dead = 0
+        # Lignes en attente d'écriture ; réécriture complète demandée
+        self._lines: list[str] = []
+        self._compact_due = False
+        self._task: asyncio.Task | None = None
+        self._io_lock = threading.Lock()
+        self._replay()
+        self._write([], list(self.records.values()))
+
+    def _replay(self) -> None:
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    op = json.loads(line)
+                except ValueError:
+                    continue  # ligne tronquée (arrêt brutal pendant l'écriture)
+                if op.get("op") == "add":
+                    self.records[int(op["seq"])] = {
+                        "seq": int(op["seq"]),
+                        "meta": op.get("meta") or {},
+                        "embed": op["embed"],
+                    }
+                elif op.get("op") == "done":
+                    for seq in op.get("seqs", []):
+                        self.records.pop(int(seq), None)
+
+    def _append(self, op: dict) -> None:
+        self._lines.append(json.dumps(op, separators=(",", ":")) + "\n")
+        self._schedule()
+
+    def _schedule(self) -> None:
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self._write(*self._take())
+            return
+        if self._task is None or self._task.done():
+            self._task = loop.create_task(self._flush_later())
+
+    def _take(self) -> tuple[list[str], list[dict] | None]:
+        # Une réécriture part des records courants : elle couvre les lignes en attente
+        lines, self._lines = self._lines, []
+        snapshot = list(self.records.values()) if self._compact_due else None
+        self._compact_due = False
+        return lines, snapshot
+
+    def _write(self, lines: list[str], snapshot: list[dict] | None) -> None:
+        """Appel bloquant : ajoute `lines` au journal, ou le réécrit depuis
+        `snapshot` (fichier temporaire, os.replace), puis fsync."""
+        with self._io_lock:
+            if snapshot is not None:
+                tmp = f"{self.path}.tmp"
+                with open(tmp, "w", encoding="utf-8") as f:
+                    for r in snapshot:
+                        f.write(json.dumps({"op": "add", **r}, separators=(",", ":")) + "\n")
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp, self.path)
+            elif lines:
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.writelines(lines)
+                    f.flush()
+                    os.fsync(f.fileno())
+
+    async def flush(self) -> None:
+        """Attend que les lignes ajoutées soient sur disque."""
+        while self._task is not None and not self._task.done():
+            await asyncio.shield(self._task)
+
+    async def _flush_later(self) -> None:
+        try:
+            while self._lines or self._compact_due:
+                try:
+                    await asyncio.to_thread(self._write, *self._take())
+                except Exception as e:
+                    print(f"[outbound] outbox write error for {self.path}: {e}")
+        except asyncio.CancelledError:
+            # Arrêt de la boucle : on écrit ce qui reste avant de sortir
+            self._write(*self._take())
+            raise
+
+    def next_seq(self) -> int:
+        return max(self.records, default=0) + 1
+
+    def add(self, seq: int, meta: dict[str, Any], embed: dict) -> None:
+        if seq in self.records:
+            self._dead += 1  # remplacement (post provisoire édité avant envoi)
+        self.records[seq] = {"seq": seq, "meta": meta, "embed": embed}
+        self._append({"op": "add", "seq": seq, "meta": meta, "embed": embed})
+
+    def done(self, seqs: set[int]) -> None:
+        seqs = {s for s in seqs if s in self.records}
+        if not seqs:
+            return
+        for s in seqs:
+            del self.records[s]
+        self._append({"op": "done", "seqs": sorted(seqs)})
+        self._dead += len(seqs) + 1
+        if self._dead >= max(COMPACT_MIN_DEAD, 2 * len(self.records)):
+            self._compact_due = True
+            self._dead = 0
+            self._schedule()
+
+
+class Outbound:
+    """File d'envoi Discord (FIFO) avec regroupement des rafales et outbox durable.
+
+    Le pipeline y dépose ses embeds dès qu'ils sont prêts, même si le channel
+    n'est pas encore disponible (gateway pas prête) : ils sont bufferisés puis
+    postés dans l'ordre dès que attach() est appelé.
+
+    Les embeds arrivés dans une même fenêtre (window_s) sont regroupés dans un
+    seul message, dans la limite de 10 embeds et 6000 caractères. submit()
+    renvoie un Future résolu avec le message Discord une fois l'envoi accepté.
+
+    Avec une outbox (path), chaque embed soumis avec des `meta` est journalisé
+    sur disque jusqu'à son ack() : une panne Discord ou un redémarrage ne perd
+    rien et ne refait pas le travail ESI/pricing (voir restore()). L'appelant
+    acquitte après avoir enregistré le post (index) ; un arrêt entre l'envoi et
+    cet enregistrement re-poste le kill au redémarrage (livraison at-least-once).
+    Un post soumis `editable` peut ensuite être remplacé via edit() (post
+    provisoire complété après enrichissement).
+    Les erreurs transitoires sont retentées avec backoff ; le rythme d'envoi
+    suit les buckets de rate-limit Discord, gérés par discord.py."""
+
+    def __init__(
+        self,
+        *,
+        window_s: float = 0.0,
+        max_embeds: int = MAX_EMBEDS_PER_MESSAGE,
+        max_chars: int = MAX_CHARS_PER_MESSAGE,
+        path: str | None = None,
+    ) -> None:
+        self.window_s = window_s
+        self.max_embeds = max(1, min(max_embeds, MAX_EMBEDS_PER_MESSAGE))
+        self.max_chars = max_chars
+        self._queue: asyncio.Queue[_Item] = asyncio.Queue()
+        # Élément retiré de la file mais qui ne rentrait pas dans le lot précédent
+        self._carry: _Item | None = None
+        self._channel: Any = None
+        self._ready = asyncio.Event()
+        self._worker: asyncio.Task | None = None
+        self._log = OutboxLog(path) if path else None
+        # Future -> seq de l'outbox, en attente d'ack(). Clés : les Futures
+        # eux-mêmes, un id() pouvant être réutilisé après leur libération
+        self._unacked: dict[asyncio.Future, int] = {}
+        # Posts éditables (voir edit()) : en file, puis une fois envoyés
+        self._editable: dict[asyncio.Future, _Item] = {}
+        self._slots: dict[asyncio.Future, _Slot] = {}
+        # Erreur définitive du channel (voir close())
+        self._closed: BaseException | None = None
+
+    @property
+    def ready(self) -> bool:
+        return self._ready.is_set()
+
+    def pending(self) -> int:
+        return self._queue.qsize() + (1 if self._carry else 0)
+
+    def attach(self, channel: Any) -> None:
+        """`channel` : tout objet exposant `send(*, embeds)` (channel, webhook)."""
+        self._channel = channel
+        self._ready.set()
+
+    @property
+    def closed(self) -> bool:
+        return self._closed is not None
+
+    def close(self, exc: BaseException) -> int:
+        """Channel définitivement inutilisable (supprimé, droits manquants).
+
+        Les posts en attente échouent avec `exc` et les submit() suivants aussi,
+        au lieu de bufferiser sans fin. Leurs entrées d'outbox restent sur
+        disque : elles seront re-postées au prochain démarrage, une fois la
+        configuration corrigée. Retourne le nombre de posts abandonnés."""
+        self._closed = exc
+        if self._worker is not None:
+            self._worker.cancel()
+        dropped = 0
+        while True:
+            item = self._carry
+            self._carry = None
+            if item is None:
+                if self._queue.empty():
+                    return dropped
+                item = self._queue.get_nowait()
+            self._unacked.pop(item.fut, None)
+            self._editable.pop(item.fut, None)
+            if not item.fut.done():
+                item.fut.set_exception(exc)
+            dropped += 1
+
+    def _enqueue(self, item: _Item) -> asyncio.Future:
+        if self._closed is not None:
+            raise self._closed
+        if item.seq is not None:
+            self._unacked[item.fut] = item.seq
+        self._queue.put_nowait(item)
+        return item.fut
+
+    def submit(
+        self,
+        embed: discord.Embed,
+        *,
+        meta: dict[str, Any] | None = None,
+        editable: bool = False,
+    ) -> asyncio.Future:
+        """`editable` : le post pourra être remplacé par edit() (post provisoire)."""
+        if self._closed is not None:
+            raise self._closed
+        fut: asyncio.Future = asyncio.get_running_loop().create_future()
+        item = _Item(embed, fut, meta=dict(meta or {}), editable=editable)
+        if self._log is not None and meta is not None:
+            item.seq = self._log.next_seq()
+            self._log.add(item.seq, item.meta, dict(embed.to_dict()))
+        if editable:
+            self._editable[fut] = item
+        return self._enqueue(item)
+
+    async def edit(self, delivery: asyncio.Future, embed: discord.Embed) -> bool:
+        """Remplace l'embed d'un post éditable par sa version finale.
+
+        Encore en file : l'embed est simplement substitué (un seul envoi, pas
+        d'édition). Déjà envoyé : le message est édité, les autres embeds du
+        même message sont conservés. False si le post a échoué ou si l'édition
+        est refusée (l'embed provisoire reste affiché)."""
+        item = self._editable.pop(delivery, None)
+        if item is not None and not delivery.done():
+            item.embed = embed
+            if item.seq is not None and self._log is not None and item.seq in self._log.records:
+                # Le journal rejoue le dernier `add` d'un seq : l'outbox reste à jour
+                self._log.add(item.seq, item.meta, dict(embed.to_dict()))
+        try:
+            await delivery
+        except Exception:
+            self._slots.pop(delivery, None)
+            return False
+        slot = self._slots.pop(delivery, None)
+        if slot is None:
+            return False
+        if slot.embeds[slot.index] is embed:
+            return True  # substitué avant l'envoi
+        async with slot.lock:
+            slot.embeds[slot.index] = embed
+            return await self._edit(slot)
+
+    def forget(self, delivery: asyncio.Future) -> None:
+        """Le post provisoire ne sera jamais édité (enrichissement en échec)."""
+        self._editable.pop(delivery, None)
+        self._slots.pop(delivery, None)
+
+    def ack(self, delivery: asyncio.Future) -> None:
+        """Retire de l'outbox un post envoyé et enregistré par l'appelant."""
+        seq = self._unacked.pop(delivery, None)
+        if seq is not None and self._log is not None:
+            self._log.done({seq})
+
+    def restore(self) -> list[dict]:
+        """Entrées de l'outbox laissées par le process précédent (ordre d'origine).
+        À appeler avant tout submit() ; chaque entrée est à re-soumettre via
+        requeue() ou à abandonner via discard()."""
+        return list(self._log.records.values()) if self._log else []
+
+    def requeue(self, record: dict) -> asyncio.Future:
+        fut: asyncio.Future = asyncio.get_running_loop().create_future()
+        embed = discord.Embed.from_dict(record["embed"])
+        return self._enqueue(_Item(embed, fut, seq=int(record["seq"]), meta=record["meta"]))
+
+    def discard(self, record: dict) -> None:
+        if self._log is not None:
+            self._log.done({int(record["seq"])})
+
+    def start(self) -> None:
+        if self._worker is None:
+            self._worker = asyncio.create_task(self._drain())
+
+    async def _next(self, timeout: float | None) -> _Item | None:
+        if self._carry is not None:
+            item, self._carry = self._carry, None
+            return item
+        if timeout is None:
+            return await self._queue.get()
+        if not self._queue.empty():
+            return self._queue.get_nowait()
+        if timeout <= 0:
+            return None
+        try:
+            return await asyncio.wait_for(self._queue.get(), timeout)
+        except TimeoutError:
+            return None
+
+    async def _collect(self) -> list[_Item]:
+        """Un lot : le premier élément, puis tout ce qui arrive dans la fenêtre
+        et rentre dans les limites du message (l'ordre est conservé)."""
+        first = await self._next(None)
+        assert first is not None
+        batch = [first]
+        chars = len(first.embed)
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.window_s
+        while len(batch) < self.max_embeds:
+            item = await self._next(deadline - loop.time())
+            if item is None:
+                break
+            size = len(item.embed)
+            if chars + size > self.max_chars:
+                self._carry = item
+                break
+            batch.append(item)
+            chars += size
+        return batch
+
+    def _fail(self, batch: list[_Item], exc: BaseException) -> None:
+        # Rien n'a été posté : l'entrée d'outbox est abandonnée
+        if self._log is not None:
+            self._log.done({it.seq for it in batch if it.seq is not None})
+        for it in batch:
+            self._unacked.pop(it.fut, None)
+            self._editable.pop(it.fut, None)
+            if not it.fut.done():
+                it.fut.set_exception(exc)
+
+    @staticmethod
+    def _retry_wait(exc: BaseException, delay: float) -> float:
+        retry_after = getattr(exc, "retry_after", None)
+        return float(retry_after) if retry_after else delay
+
+    async def _send(self, batch: list[_Item]) -> None:
+        """Envoie un lot jusqu'au succès ou à une erreur définitive."""
+        assert self._channel is not None
+        delay = RETRY_MIN_S
+        while True:
+            sent = [it.embed for it in batch]
+            t0 = time.perf_counter()
+            try:
+                msg: Any = await self._channel.send(embeds=sent)
+            except Exception as e:
+                _record_send("send", "error", t0)
+                if len(batch) > 1 and _http_status(e) == 400:
+                    # Un seul embed invalide fait rejeter tout le message :
+                    # on renvoie un par un pour n'échouer que le fautif
+                    print(
+                        f"[outbound] message rejected ({e}), sending {len(batch)} posts one by one"
+                    )
+                    for it in batch:
+                        await self._send([it])
+                    return
+                if not is_retryable_error(e):
+                    print(f"[outbound] dropping {len(batch)} post(s): {e!r}")
+                    self._fail(batch, e)
+                    return
+                wait = self._retry_wait(e, delay)
+                print(f"[outbound] send failed ({e}), retrying {len(batch)} post(s) in {wait:.0f}s")
+                await asyncio.sleep(wait)
+                delay = min(RETRY_MAX_S, delay * 2)
+                continue
+            _record_send("send", "ok", t0)
+            lock = asyncio.Lock()
+            for i, it in enumerate(batch):
+                if it.editable:
+                    self._editable.pop(it.fut, None)
+                    self._slots[it.fut] = _Slot(msg, sent, i, lock)
+                if not it.fut.done():
+                    it.fut.set_result(msg)
+            return
+
+    async def _edit(self, slot: _Slot) -> bool:
+        delay = RETRY_MIN_S
+        while True:
+            t0 = time.perf_counter()
+            try:
+                await slot.msg.edit(embeds=list(slot.embeds))
+                _record_send("edit", "ok", t0)
+                return True
+            except Exception as e:
+                _record_send("edit", "error", t0)
+                if not is_retryable_error(e):
+                    print(f"[outbound] edit rejected, provisional post kept: {e!r}")
+                    return False
+                wait = self._retry_wait(e, delay)
+                print(f"[outbound] edit failed ({e}), retrying in {wait:.0f}s")
+                await asyncio.sleep(wait)
+                delay = min(RETRY_MAX_S, delay * 2)
+
+    async def flush(self) -> None:
+        """Attend que l'outbox soit sur disque (ajouts et acquittements)."""
+        if self._log is not None:
+            await self._log.flush()
+
+    async def _drain(self) -> None:
+        await self._ready.wait()
+        while True:
+            batch = await self._collect()
+            # Journal sur disque avant l'envoi : un post ne part jamais sans
+            # son entrée d'outbox
+            await self.flush()
+            await self._send(batch)
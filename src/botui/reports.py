@@ -0,0 +1,147 @@
+from __future__ import annotations
+
+from collections.abc import Callable
+from datetime import UTC, datetime
+from typing import Any
+
+from src.botui.embeds import (
+    zkill_alliance,
+    zkill_character,
+    zkill_corporation,
+    zkill_killmail,
+    zkill_region,
+    zkill_ship,
+)
+from src.core.archive import KillArchive, period_bounds
+from src.core.utils import format_isk
+from src.esi.universe import find_id
+
+PERIOD_LABELS = {"day": "today", "week": "last 7 days", "month": "this month", "all": "all time"}
+# Critères de /search -> catégorie ESI des noms
+SEARCH_CATEGORIES = {
+    "pilot": "character",
+    "corp": "corporation",
+    "alliance": "alliance",
+    "ship": "inventory_type",
+    "system": "solar_system",
+}
+_LINKS: dict[str, Callable[[int], str]] = {
+    "pilot": zkill_character,
+    "corp": zkill_corporation,
+    "alliance": zkill_alliance,
+    "ship": zkill_ship,
+    "region": zkill_region,
+}
+
+
+def format_summary(archive: KillArchive, period: str) -> str:
+    """Bilan d'une période calculé sur l'archive locale (sans appel réseau)."""
+    s = archive.summary(*period_bounds(period))
+    lines = [f"**Summary — {PERIOD_LABELS[period]}**"]
+    if not s["kills"] and not s["losses"]:
+        lines.append("- No killmail archived for this period.")
+        return "\n".join(lines)
+    lines.append(f"- Kills : {s['kills']} ({format_isk(s['isk_killed'])} destroyed)")
+    lines.append(f"- Losses : {s['losses']} ({format_isk(s['isk_lost'])} lost)")
+    if s["efficiency"] is not None:
+        lines.append(f"- ISK efficiency : {s['efficiency']:.0%}")
+    lines.append(f"- Dropped : {format_isk(s['isk_dropped'])}")
+    big = s["biggest"]
+    if big is not None:
+        kind = "kill" if big["is_kill"] else "loss"
+        lines.append(
+            f"- Biggest {kind} : [{format_isk(big['total_value'])}]"
+            f"({zkill_killmail(big['killmail_id'])})"
+        )
+    return "\n".join(lines)
+
+
+async def format_top(
+    archive: KillArchive,
+    *,
+    period: str,
+    by: str,
+    kills: bool,
+    metric: str,
+    limit: int,
+    resolve_names: Callable[..., Any] | None = None,
+    esi: Any = None,
+) -> str:
+    """Classement d'une période ; noms résolus en un appel groupé (cache)."""
+    rows = archive.top(*period_bounds(period), by=by, kills=kills, metric=metric, limit=limit)
+    side = "kills" if kills else "losses"
+    lines = [
+        f"**Top {by} by {'ISK' if metric == 'isk' else 'count'} — {side}, {PERIOD_LABELS[period]}**"
+    ]
+    if not rows:
+        lines.append("- No killmail archived for this period.")
+        return "\n".join(lines)
+    names: dict[int, str] = {}
+    if resolve_names is not None:
+        try:
+            for e in await resolve_names(esi, [key for key, _, _ in rows]):
+                if isinstance(e.get("id"), int) and isinstance(e.get("name"), str):
+                    names[e["id"]] = e["name"]
+        except Exception as e:
+            print(f"[reports] resolve_names error: {e}")
+    link = _LINKS.get(by)
+    for rank, (key, isk, count) in enumerate(rows, 1):
+        name = names.get(key, str(key))
+        label = f"[{name}]({link(key)})" if link is not None else name
+        lines.append(f"{rank}. {label} — {format_isk(isk)} ({count} {side})")
+    return "\n".join(lines)
+
+
+async def search_criteria(raw: dict[str, str], esi: Any) -> dict[str, int]:
+    """Critères de /search (ID ou nom exact) -> IDs ; ValueError si un nom est inconnu."""
+    criteria: dict[str, int] = {}
+    for name, value in raw.items():
+        value = value.strip()
+        if not value:
+            continue
+        if value.isdigit():
+            criteria[name] = int(value)
+            continue
+        entity = await find_id(esi, value, SEARCH_CATEGORIES[name])
+        if entity is None:
+            raise ValueError(f"unknown {name} name: {value}")
+        criteria[name] = entity
+    return criteria
+
+
+async def format_search(
+    archive: KillArchive,
+    criteria: dict[str, int],
+    *,
+    role: str,
+    limit: int,
+    resolve_names: Callable[..., Any] | None = None,
+    esi: Any = None,
+) -> str:
+    """Kills correspondant aux critères (index inversés, sans appel zKill)."""
+    hits = archive.records(archive.search.query(criteria, role=role, limit=limit))
+    names: dict[int, str] = {}
+    if resolve_names is not None:
+        ids = set(criteria.values())
+        for h in hits:
+            ids |= {h["ship_type_id"], h["solar_system_id"]}
+        try:
+            for e in await resolve_names(esi, ids):
+                if isinstance(e.get("id"), int) and isinstance(e.get("name"), str):
+                    names[e["id"]] = e["name"]
+        except Exception as e:
+            print(f"[reports] resolve_names error: {e}")
+    what = ", ".join(f"{name} {names.get(entity, entity)}" for name, entity in criteria.items())
+    lines = [f"**Search — {what}{'' if role == 'any' else f' ({role})'}**"]
+    if not hits:
+        lines.append("- No archived killmail matches.")
+        return "\n".join(lines)
+    for h in hits:
+        when = datetime.fromtimestamp(h["time"], UTC).strftime("%Y-%m-%d %H:%M")
+        ship = names.get(h["ship_type_id"], f"Type {h['ship_type_id']}")
+        system = names.get(h["solar_system_id"], f"System {h['solar_system_id']}")
+        lines.append(
+            f"- {when} · {'Kill' if h['is_kill'] else 'Loss'} · {ship} in {system}"
+            f" · [{format_isk(h['total_value'])}]({zkill_killmail(h['killmail_id'])})"
+        )
+    return "\n".join(lines)
@@ -0,0 +1,210 @@
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Callable
+from dataclasses import dataclass
+from typing import Any
+
+import discord
+
+from src.botui.outbound import ChannelUnavailable, Outbound
+
+# Faits d'un killmail évalués par les règles (calculés une fois par kill) :
+# is_kill, total_value (None tant que non valorisé), ship_type_id, region_id,
+# system_id, solo
+Facts = dict[str, Any]
+Predicate = Callable[[Facts], bool]
+
+# Clés de `match` reconnues ; une clé inconnue est une erreur de configuration
+_MATCH_KEYS = {"kind", "min_value", "max_value", "ship_type_ids", "region_ids", "solo"}
+# Conditions qui ont besoin de l'enrichissement (valeur ISK, région) : un post
+# provisoire ne peut pas être routé avant
+_ENRICHED_KEYS = {"min_value", "max_value", "region_ids"}
+
+
+@dataclass
+class Route:
+    name: str
+    channel_id: int
+    webhook_url: str
+    predicate: Predicate
+    needs_enrichment: bool
+    outbound: Outbound | None = None
+
+
+def compile_rule(rule: dict) -> Predicate:
+    """Compile le `match` d'une règle en un prédicat unique (évalué par kill).
+
+    Toutes les conditions présentes doivent être vraies ; `match` vide =
+    tous les kills. Les listes d'IDs sont figées en frozenset."""
+    match = dict(rule.get("match") or {})
+    unknown = set(match) - _MATCH_KEYS
+    if unknown:
+        raise ValueError(f"route {rule.get('name')!r}: unknown match keys {sorted(unknown)}")
+
+    checks: list[Predicate] = []
+    kind = match.get("kind")
+    if kind is not None:
+        if kind not in ("kill", "loss"):
+            raise ValueError(f"route {rule.get('name')!r}: kind must be 'kill' or 'loss'")
+        want_kill = kind == "kill"
+        checks.append(lambda f: f["is_kill"] is want_kill)
+    if "min_value" in match:
+        lo = float(match["min_value"])
+        checks.append(lambda f: f["total_value"] is not None and f["total_value"] >= lo)
+    if "max_value" in match:
+        hi = float(match["max_value"])
+        checks.append(lambda f: f["total_value"] is not None and f["total_value"] < hi)
+    if "ship_type_ids" in match:
+        ships = frozenset(int(x) for x in match["ship_type_ids"])
+        checks.append(lambda f: f["ship_type_id"] in ships)
+    if "region_ids" in match:
+        regions = frozenset(int(x) for x in match["region_ids"])
+        checks.append(lambda f: f["region_id"] in regions)
+    if "solo" in match:
+        solo = bool(match["solo"])
+        checks.append(lambda f: f["solo"] is solo)
+
+    if not checks:
+        return lambda f: True
+    if len(checks) == 1:
+        return checks[0]
+    return lambda f: all(check(f) for check in checks)
+
+
+def compile_routes(rules: list[dict]) -> list[Route]:
+    routes: list[Route] = []
+    for rule in rules:
+        name = str(rule.get("name") or "")
+        if not name or any(r.name == name for r in routes):
+            raise ValueError(f"route name missing or duplicated: {name!r}")
+        if not rule.get("channel_id") and not rule.get("webhook_url"):
+            raise ValueError(f"route {name!r} needs a channel_id or a webhook_url")
+        routes.append(
+            Route(
+                name=name,
+                channel_id=int(rule.get("channel_id") or 0),
+                webhook_url=str(rule.get("webhook_url") or ""),
+                predicate=compile_rule(rule),
+                needs_enrichment=bool(_ENRICHED_KEYS & set(rule.get("match") or {})),
+            )
+        )
+    return routes
+
+
+class RoutedOutbound:
+    """Fan-out d'un post vers plusieurs channels selon des règles compilées.
+
+    Même interface que Outbound pour le pipeline : l'embed est rendu une fois
+    et soumis à l'Outbound de chaque route retenue (chacune avec sa file, son
+    outbox et son channel). Le Future renvoyé aboutit dès que toutes les
+    routes ont répondu, avec succès si au moins une a accepté le post (les
+    erreurs définitives d'une route sont loggées, pas retentées)."""
+
+    def __init__(self, routes: list[Route]):
+        self.routes = routes
+        self.needs_enrichment = any(r.needs_enrichment for r in routes)
+        # Future combiné (clé : l'objet, pas son id() réutilisable) ->
+        # (route, Future de l'Outbound de la route)
+        self._parts: dict[asyncio.Future, list[tuple[Route, asyncio.Future]]] = {}
+
+    def _outbound(self, route: Route) -> Outbound:
+        assert route.outbound is not None
+        return route.outbound
+
+    @property
+    def closed(self) -> bool:
+        return all(self._outbound(r).closed for r in self.routes)
+
+    def pending(self) -> int:
+        return sum(self._outbound(r).pending() for r in self.routes)
+
+    def select(self, facts: Facts) -> list[Route]:
+        return [r for r in self.routes if r.predicate(facts)]
+
+    def _combine(self, parts: list[tuple[Route, asyncio.Future]]) -> asyncio.Future:
+        combined: asyncio.Future = asyncio.get_running_loop().create_future()
+        self._parts[combined] = parts
+
+        def _settle(_f: asyncio.Future) -> None:
+            if combined.done() or not all(f.done() for _r, f in parts):
+                return
+            ok = [f for _r, f in parts if not f.cancelled() and f.exception() is None]
+            if not ok:
+                self._parts.pop(combined, None)
+                first = parts[0][1]
+                exc = None if first.cancelled() else first.exception()
+                combined.set_exception(exc or ChannelUnavailable("post cancelled"))
+                return
+            for route, f in parts:
+                if f not in ok:
+                    why = "cancelled" if f.cancelled() else repr(f.exception())
+                    print(f"[routing] route {route.name} failed: {why}")
+            combined.set_result(ok[0].result())
+
+        for _route, f in parts:
+            f.add_done_callback(_settle)
+        return combined
+
+    def submit(
+        self,
+        embed: discord.Embed,
+        *,
+        meta: dict[str, Any] | None = None,
+        editable: bool = False,
+        facts: Facts | None = None,
+    ) -> asyncio.Future:
+        selected = self.select(facts) if facts is not None else self.routes
+        parts: list[tuple[Route, asyncio.Future]] = []
+        for route in selected:
+            out = self._outbound(route)
+            if out.closed:
+                continue
+            parts.append((route, out.submit(embed, meta=meta, editable=editable)))
+        if not parts:
+            # Aucune route ne veut ce kill : il est traité sans être posté
+            done: asyncio.Future = asyncio.get_running_loop().create_future()
+            done.set_result(None)
+            return done
+        return self._combine(parts)
+
+    def ack(self, delivery: asyncio.Future) -> None:
+        for route, f in self._parts.pop(delivery, []):
+            self._outbound(route).ack(f)
+
+    async def edit(self, delivery: asyncio.Future, embed: discord.Embed) -> bool:
+        parts = self._parts.get(delivery, [])
+        results = await asyncio.gather(*(self._outbound(r).edit(f, embed) for r, f in parts))
+        return any(results)
+
+    def forget(self, delivery: asyncio.Future) -> None:
+        for route, f in self._parts.get(delivery, []):
+            self._outbound(route).forget(f)
+
+    def restore(self) -> list[dict]:
+        """Entrées d'outbox de toutes les routes, regroupées par kill."""
+        merged: dict[tuple, dict] = {}
+        for route in self.routes:
+            for record in self._outbound(route).restore():
+                meta = record.get("meta") or {}
+                key = (
+                    (meta.get("km_id"), meta.get("km_hash"))
+                    if meta
+                    else (route.name, record["seq"])
+                )
+                group = merged.setdefault(key, {**record, "parts": []})
+                group["parts"].append((route, record))
+        return list(merged.values())
+
+    def requeue(self, record: dict) -> asyncio.Future:
+        return self._combine(
+            [(route, self._outbound(route).requeue(part)) for route, part in record["parts"]]
+        )
+
+    def discard(self, record: dict) -> None:
+        for route, part in record["parts"]:
+            self._outbound(route).discard(part)
+
+
+# File d'envoi du pipeline : un channel unique ou un fan-out routé
+PostQueue = Outbound | RoutedOutbound
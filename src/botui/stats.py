@@ -0,0 +1,111 @@
+from __future__ import annotations
+
+import time
+from typing import Any
+
+from src.botui.routing import RoutedOutbound
+from src.core.looplag import LOOP_LAG
+from src.core.metrics import requests_per_minute
+from src.esi.client import ERROR_LIMIT
+from src.esi.killmails import KILLMAIL_CACHE
+from src.esi.universe import NAME_CACHE, REGION_CACHE
+from src.scheduler import loop
+
+
+def _ratio(hits: int, misses: int) -> str:
+    total = hits + misses
+    return f"{hits / total:.0%}" if total else "n/a"
+
+
+def _ago(ts: float | None, now: float) -> str:
+    if ts is None:
+        return "never"
+    delta = ts - now
+    return f"in {delta:.0f}s" if delta >= 0 else f"{-delta:.0f}s ago"
+
+
+def collect_stats() -> dict[str, Any]:
+    """Instantané des internes du pipeline (caches, index, files, polls)."""
+    now = time.time()
+    caches: dict[str, Any] = {
+        "names": NAME_CACHE,
+        "regions": REGION_CACHE,
+        "killmails": KILLMAIL_CACHE,
+    }
+    if loop.PRICES is not None:
+        caches = {"prices": loop.PRICES, **caches}
+    tenants = []
+    for rt in loop.RUNTIME.values():
+        queues = {r.name: r.outbound.pending() for r in rt.routes if r.outbound is not None}
+        tenants.append(
+            {
+                "name": rt.name,
+                "index": len(rt.idx),
+                "inflight": rt.idx.inflight(),
+                "queues": queues,
+                "routed": isinstance(rt.outbound, RoutedOutbound),
+                "last_poll_s": rt.last_poll_s,
+                "last_poll_at": rt.last_poll_at,
+                "next_poll_at": min(rt.next_poll_at.values(), default=None),
+            }
+        )
+    return {
+        "now": now,
+        "caches": {
+            name: {"size": len(c), "hits": c.hits, "misses": c.misses} for name, c in caches.items()
+        },
+        "requests_per_minute": requests_per_minute(),
+        "esi_error_limit": dict(ERROR_LIMIT),
+        "loop_lag": {
+            "max_s": LOOP_LAG.max_recent(),
+            "stalls": LOOP_LAG.stalls,
+            "blocked_s": LOOP_LAG.blocked_s,
+        },
+        "tenants": tenants,
+    }
+
+
+def format_stats(stats: dict[str, Any]) -> str:
+    now = stats["now"]
+    lines = ["**Caches**"]
+    for name, c in stats["caches"].items():
+        lines.append(
+            f"- {name} : {c['size']} entries, hit ratio {_ratio(c['hits'], c['misses'])}"
+            f" ({c['hits']}/{c['hits'] + c['misses']})"
+        )
+
+    rpm = stats["requests_per_minute"]
+    lines.append("**Upstreams (req/min)**")
+    lines.append(
+        "- " + (", ".join(f"{svc} {n}" for svc, n in sorted(rpm.items())) or "no request yet")
+    )
+    budget = stats["esi_error_limit"]
+    if budget.get("remain") is None:
+        lines.append("- ESI error budget : unknown (no response yet)")
+    else:
+        lines.append(
+            f"- ESI error budget : {budget['remain']:.0f} left,"
+            f" reset {_ago(budget.get('reset_at'), now)}"
+        )
+
+    lag = stats["loop_lag"]
+    lines.append("**Event loop**")
+    lines.append(
+        f"- Max lag : {lag['max_s'] * 1000:.0f} ms (last 5 min), {lag['stalls']} stall(s),"
+        f" {lag['blocked_s']:.1f}s blocked in total"
+    )
+
+    for t in stats["tenants"]:
+        title = f"**Pipeline — {t['name']}**" if len(stats["tenants"]) > 1 else "**Pipeline**"
+        lines.append(title)
+        lines.append(f"- KillIndex : {t['index']} kills, {t['inflight']} in flight")
+        queues = ", ".join(f"{name} {n}" for name, n in t["queues"].items())
+        lines.append(f"- Pending posts : {queues or '0'}")
+        duration = "n/a" if t["last_poll_s"] is None else f"{t['last_poll_s']:.2f}s"
+        lines.append(
+            f"- Last poll : {duration} ({_ago(t['last_poll_at'], now)}),"
+            f" next {_ago(t['next_poll_at'], now)}"
+        )
+    if not stats["tenants"]:
+        lines.append("**Pipeline** : scheduler not started")
+    return "\n".join(lines)
@@ -1,28 +1,34 @@
 from __future__ import annotations
 
+import asyncio
+import dataclasses
+import time
 import traceback
-from collections.abc import Mapping
-from typing import TypeVar
+from typing import Any
 
 import discord
 import httpx
 from discord.errors import Forbidden, NotFound
 from discord.errors import HTTPException as DiscordHTTPException
 
-from src.botui.embeds import build_embed_insight5
 from src.config import settings
-from src.core.prices_cache import PricesCache
-from src.core.pricing import compute_killmail_value
-from src.esi.client import AsyncESIClient
-from src.esi.killmails import fetch_killmail_details, fetch_recent_killmails
-from src.esi.universe import get_region_id_for_system, resolve_names
+from src.core.probe import Probe, ProbeStep
+from src.core.processor import PipelineContext, process_ref
+from src.esi.killmails import fetch_recent_killmails
+from src.scheduler import loop
 from src.zkb.zkill import fetch_corporation_killrefs
 
-_T = TypeVar("_T")
-
-
-def dict_get_opt(m: Mapping[int, _T], key: int | None) -> _T | None:
-    return m.get(key) if key is not None else None
+# Étapes du rapport, dans l'ordre du pipeline (noms des étapes de process_ref)
+STEP_LABELS = {
+    "refs": "Lecture récents",
+    "details": "Détails du killmail",
+    "region": "Région",
+    "names": "Résolution des noms",
+    "pricing": "Estimation de la valeur",
+    "render": "Construction de l’embed",
+    "post": "Publication Discord",
+    "other": "Autres",
+}
 
 
 def _explain_http_status(code: int) -> str:
@@ -40,265 +46,147 @@ def _explain_http_status(code: int) -> str:
     return f"Réponse ESI inattendue (HTTP {code})."
 
 
-def _render_success_report(title: str, steps: list[tuple[str, str]]) -> str:
-    lines = [f"**✅ {title}**"]
-    for nom, msg in steps:
-        lines.append(f"- **{nom}** : {msg}")
-    return "\n".join(lines)
-
-
-def _render_failure_report(title: str, steps: list[tuple[str, str]], exc: BaseException) -> str:
-    lines = [f"**❌ {title}**"]
-    for nom, msg in steps:
-        lines.append(f"- **{nom}** : {msg}")
-    tb = "".join(traceback.format_exception(exc))
-    if len(tb) > 1500:
-        tb = tb[:1500] + "\n…(tronqué)…"
-    lines.append("\n**Détails techniques (trace):**")
-    lines.append(f"```py\n{tb}\n```")
-    return "\n".join(lines)
-
-
-async def _get_first_esi_ref(esi: AsyncESIClient, corp_id: int, steps: list[tuple[str, str]]):
-    try:
-        status, _etag, refs = await fetch_recent_killmails(esi, corp_id, etag=None, force_body=True)
+def _explain_error(exc: BaseException) -> str:
+    if isinstance(exc, httpx.RequestError):
+        return "Le serveur EVE ne répond pas (réseau/timeout)"
+    if isinstance(exc, httpx.HTTPStatusError):
+        return _explain_http_status(exc.response.status_code)
+    if isinstance(exc, Forbidden):
+        return "Permissions insuffisantes (Send Messages / Embed Links)"
+    if isinstance(exc, NotFound):
+        return "Channel introuvable"
+    if isinstance(exc, DiscordHTTPException):
+        return f"Erreur HTTP Discord ({exc.status})"
+    return "Erreur inattendue"
+
+
+def _format_step(step: ProbeStep) -> str:
+    """Temps mural, requêtes amont et accès cache d'une étape."""
+    parts = [f"{step.seconds * 1000:.0f} ms"]
+    if step.calls:
+        parts.append("appels " + ", ".join(f"{s} ×{n}" for s, n in sorted(step.calls.items())))
+    caches = sorted(set(step.hits) | set(step.misses))
+    if caches:
+        parts.append(
+            "cache "
+            + ", ".join(f"{c} {step.hits[c]}/{step.hits[c] + step.misses[c]}" for c in caches)
+        )
+    return " · ".join(parts)
+
+
+def _render_report(
+    title: str,
+    probe: Probe,
+    notes: dict[str, str],
+    *,
+    elapsed: float,
+    exc: BaseException | None = None,
+) -> str:
+    lines = [f"**{'❌' if exc else '✅'} {title}** ({elapsed * 1000:.0f} ms)"]
+    for name, label in STEP_LABELS.items():
+        step = probe.steps.get(name)
+        if step is None:
+            continue
+        if exc is not None and name == probe.failed:
+            status = f"❌ {_explain_error(exc)}"
+        else:
+            status = notes.get(name, "OK")
+        lines.append(f"- **{label}** : {status} — {_format_step(step)}")
+    if exc is not None:
+        if probe.failed is None:
+            lines.append(f"- ❌ {_explain_error(exc)}")
+        tb = "".join(traceback.format_exception(exc))
+        if len(tb) > 1500:
+            tb = tb[:1500] + "\n…(tronqué)…"
+        lines.append("\n**Détails techniques (trace):**")
+        lines.append(f"```py\n{tb}\n```")
+    return "\n".join(lines)[:2000]
+
+
+class _InteractionOutbound:
+    """File d'envoi du diagnostic : l'embed est posté dans le channel de la
+    commande (followup public) au lieu des channels du tenant."""
+
+    needs_enrichment = False
+
+    def __init__(self, interaction: discord.Interaction):
+        self.interaction = interaction
+
+    def submit(self, embed: discord.Embed, *, meta: Any = None, **extra: Any) -> asyncio.Future:
+        return asyncio.ensure_future(self.interaction.followup.send(embed=embed, ephemeral=False))
+
+
+def _diagnostic_ctx(ctx: PipelineContext, interaction: discord.Interaction) -> PipelineContext:
+    """Contexte du scheduler (clients ESI, caches partagés) avec l'envoi
+    redirigé vers l'interaction, sans archive, ni routage, ni post provisoire :
+    le rapport couvre l'enrichissement complet."""
+    return dataclasses.replace(
+        ctx,
+        outbound=_InteractionOutbound(interaction),
+        routed=False,
+        archive=None,
+        settings=ctx.settings.model_copy(update={"DISCORD_PROVISIONAL_POST": False}),
+    )
+
+
+async def _first_ref(ctx: PipelineContext, source: str, corp_id: int) -> tuple[int, str, int]:
+    """(killmail_id, hash, nombre de refs) du kill le plus récent."""
+    if source == "esi":
+        status, _etag, refs = await fetch_recent_killmails(
+            ctx.esi, corp_id, etag=None, force_body=True
+        )
         if status != "ok":
-            steps.append(("Lecture récents", "❌ Statut ESI inattendu"))
             raise RuntimeError("fetch_recent_killmails returned non-ok")
         if not refs:
-            steps.append(("Lecture récents", "❌ Aucun killmail récent trouvé"))
-            raise RuntimeError("No recent killmails")
-        steps.append(("Lecture récents", f"OK ({len(refs)} éléments)"))
-        return refs[0]
-    except httpx.RequestError:
-        steps.append(("Lecture récents", "❌ Le serveur EVE ne répond pas (réseau/timeout)"))
-        raise
-    except httpx.HTTPStatusError as e:
-        steps.append(("Lecture récents", f"❌ {_explain_http_status(e.response.status_code)}"))
-        raise
-    except Exception:
-        steps.append(("Lecture récents", "❌ Erreur inattendue"))
-        raise
-
-
-async def _get_first_zkb_ref(corp_id: int, pages: int, steps: list[tuple[str, str]]):
-    try:
-        refs = await fetch_corporation_killrefs(corp_id, pages=pages)
-        if not refs:
-            steps.append(("Lecture récents", "❌ Aucun killmail récent trouvé"))
-            raise RuntimeError("No recent killmails from zKill")
-        steps.append(("Lecture récents", f"OK ({len(refs)} éléments)"))
-        r0 = refs[0]
-        km_id = r0["killmail_id"] if isinstance(r0, dict) else r0.killmail_id
-        km_hash = r0["killmail_hash"] if isinstance(r0, dict) else r0.killmail_hash
-        return int(km_id), str(km_hash)
-    except Exception:
-        steps.append(("Lecture récents", "❌ Erreur (zKill)"))
-        raise
+            raise RuntimeError("No recent killmails from ESI")
+        return refs[0].killmail_id, refs[0].killmail_hash, len(refs)
+    zkb_refs = await fetch_corporation_killrefs(
+        corp_id, pages=int(getattr(settings, "ZKB_PAGES", 1))
+    )
+    if not zkb_refs:
+        raise RuntimeError("No recent killmails from zKill")
+    return zkb_refs[0].killmail_id, zkb_refs[0].killmail_hash, len(zkb_refs)
 
 
 async def run_test_post(interaction: discord.Interaction, source: str) -> None:
     """
     source: "esi" | "zkill"
     - Récupère le kill le plus récent depuis ESI ou zKill
-    - Passe par le pipeline standard (détails ESI -> noms -> pricing -> embed)
-    - Poste l'embed dans le channel, et renvoie un rapport éphémère
+    - Le fait passer par le vrai process_ref, avec les clients et caches du
+      scheduler (latence de production : caches chauds, budget ESI partagé)
+    - Poste l'embed dans le channel, et renvoie un rapport éphémère avec, par
+      étape, le temps mural, les requêtes amont et les hits de cache
     """
     title = "/test_post_esi terminé" if source == "esi" else "/test_post_zkill terminé"
     await interaction.response.defer(ephemeral=True)
 
-    steps: list[tuple[str, str]] = []
-    corp_id = settings.CORPORATION_ID
-    if not corp_id:
+    runtime = next((rt for rt in loop.RUNTIME.values() if rt.ctx is not None), None)
+    ctx = runtime.ctx if runtime is not None else None
+    problem = None
+    if ctx is None:
+        problem = "⚠️ Scheduler non démarré (aucun contexte pipeline partagé)"
+    elif source != "esi" and not getattr(settings, "ZKB_ENABLE", False):
+        problem = "❌ ZKB_ENABLE=false"
+    if ctx is None or problem is not None:
         await interaction.followup.send(
-            _render_failure_report(
-                title, [("Configuration", "⚠️ CORPORATION_ID manquant dans .env")], RuntimeError()
-            ),
-            ephemeral=True,
+            f"**❌ {title}**\n- **Configuration** : {problem}", ephemeral=True
         )
         return
+    corp_id = ctx.corporation_id or int(settings.CORPORATION_ID)
 
-    esi = AsyncESIClient()
-    prices = PricesCache("data/prices.json")
-
+    probe = Probe()
+    notes: dict[str, str] = {}
+    t0 = time.perf_counter()
     try:
-        # 1) Lecture récents -> choix du premier
-        if source == "esi":
-            first = await _get_first_esi_ref(esi, int(corp_id), steps)
-            km_id, km_hash = first.killmail_id, first.killmail_hash
-        else:
-            if not getattr(settings, "ZKB_ENABLE", False):
-                steps.append(("Configuration zKill", "❌ ZKB_ENABLE=false"))
-                raise RuntimeError("zKill disabled")
-            pages = int(getattr(settings, "ZKB_PAGES", 1))
-            km_id, km_hash = await _get_first_zkb_ref(int(corp_id), pages, steps)
-
-        # 2) Détails du killmail via ESI (même chemin dans les deux cas)
-        try:
-            km = await fetch_killmail_details(esi, km_id, km_hash)
-            steps.append(("Détails du killmail", "OK"))
-        except httpx.RequestError:
-            steps.append(
-                ("Détails du killmail", "❌ Le serveur EVE ne répond pas (réseau/timeout)")
-            )
-            raise
-        except httpx.HTTPStatusError as e:
-            steps.append(
-                ("Détails du killmail", f"❌ {_explain_http_status(e.response.status_code)}")
-            )
-            raise
-        except Exception:
-            steps.append(("Détails du killmail", "❌ Réponse ESI inattendue / parsing"))
-            raise
-
-        # 3) Kill ou Loss ?
-        is_kill = any(a.corporation_id == int(corp_id) for a in km.attackers)
-        steps.append(("Détermination kill/loss", "OK"))
-
-        # 4) Résolution des noms + région
-        try:
-            ids: set[int] = set()
-            if km.victim.character_id is not None:
-                ids.add(km.victim.character_id)
-            ids.add(km.victim.corporation_id)
-            if km.victim.alliance_id is not None:
-                ids.add(km.victim.alliance_id)
-
-            fb = next(
-                (a for a in km.attackers if a.final_blow), km.attackers[0] if km.attackers else None
-            )
-            if fb:
-                if fb.character_id is not None:
-                    ids.add(fb.character_id)
-                if fb.corporation_id is not None:
-                    ids.add(fb.corporation_id)
-                all_id = getattr(fb, "alliance_id", None)
-                if all_id is not None:
-                    ids.add(all_id)
-                if fb.ship_type_id is not None:
-                    ids.add(fb.ship_type_id)
-
-            ids.add(km.victim.ship_type_id)
-            ids.add(km.solar_system_id)
-
-            region_id: int | None = await get_region_id_for_system(esi, km.solar_system_id)
-            region_name = "Unknown Region"
-            if region_id is not None:
-                ids.add(region_id)
-
-            name_map: dict[int, str] = {}
-            try:
-                names = await resolve_names(esi, ids)
-                for e in names:
-                    name_map[int(e["id"])] = e["name"]
-                steps.append(("Résolution des noms", "OK"))
-            except Exception:
-                steps.append(("Résolution des noms", "⚠️ Échec (fallback IDs)"))
-
-            system_name = (
-                dict_get_opt(name_map, km.solar_system_id) or f"System {km.solar_system_id}"
-            )
-            ship_name = (
-                dict_get_opt(name_map, km.victim.ship_type_id) or f"Type {km.victim.ship_type_id}"
-            )
-            final_ship_name = dict_get_opt(name_map, fb.ship_type_id if fb else None)
-            victim_name = dict_get_opt(name_map, km.victim.character_id)
-            victim_corp_name = dict_get_opt(name_map, km.victim.corporation_id)
-            victim_all_name = dict_get_opt(name_map, km.victim.alliance_id)
-            final_name = dict_get_opt(name_map, fb.character_id if fb else None) if fb else None
-            final_corp_name = (
-                dict_get_opt(name_map, fb.corporation_id if fb else None) if fb else None
-            )
-            final_all_name = (
-                dict_get_opt(name_map, getattr(fb, "alliance_id", None) if fb else None)
-                if fb
-                else None
-            )
-            if region_id is not None:
-                region_name = dict_get_opt(name_map, region_id) or region_name
-
-        except httpx.RequestError:
-            steps.append(
-                ("Résolution des noms", "❌ Le serveur EVE ne répond pas (réseau/timeout)")
-            )
-            raise
-        except httpx.HTTPStatusError as e:
-            steps.append(
-                ("Résolution des noms", f"❌ {_explain_http_status(e.response.status_code)}")
-            )
-            raise
-        except Exception:
-            steps.append(("Résolution des noms", "❌ Erreur inattendue"))
-            raise
-
-        # 5) Estimation de la valeur
-        try:
-            total_value = await compute_killmail_value(km, prices)
-            steps.append(("Estimation de la valeur", "OK"))
-        except httpx.RequestError:
-            steps.append(
-                ("Estimation de la valeur", "❌ Le serveur EVE ne répond pas (réseau/timeout)")
-            )
-            raise
-        except httpx.HTTPStatusError as e:
-            steps.append(
-                ("Estimation de la valeur", f"❌ {_explain_http_status(e.response.status_code)}")
-            )
-            raise
-        except Exception:
-            steps.append(("Estimation de la valeur", "❌ Erreur inattendue"))
-            raise
-
-        # 6) Construction de l’embed
-        try:
-            embed = build_embed_insight5(
-                km,
-                victim_name=victim_name,
-                victim_corp_name=victim_corp_name,
-                victim_all_name=victim_all_name,
-                final_name=final_name,
-                final_corp_name=final_corp_name,
-                final_all_name=final_all_name,
-                system_name=system_name,
-                region_name=region_name,
-                ship_name=ship_name,
-                final_ship_name=final_ship_name,
-                total_value=total_value,
-                is_kill=is_kill,
-                region_id=region_id,
-            )
-            steps.append(("Construction de l’embed", "OK"))
-        except Exception:
-            steps.append(("Construction de l’embed", "❌ Impossible d’établir un embed"))
-            raise
-
-        # 7) Publication dans le channel (publique) + rapport (éphémère)
-        try:
-            await interaction.followup.send(embed=embed, ephemeral=False)
-            steps.append(("Publication Discord", "OK"))
-            await interaction.followup.send(
-                _render_success_report(title, steps),
-                ephemeral=True,
-            )
-        except Forbidden:
-            steps.append(
-                (
-                    "Publication Discord",
-                    "❌ Permissions insuffisantes (Send Messages / Embed Links)",
-                )
-            )
-            raise
-        except NotFound:
-            steps.append(("Publication Discord", "❌ Channel introuvable"))
-            raise
-        except DiscordHTTPException as e:
-            steps.append(("Publication Discord", f"❌ Erreur HTTP Discord ({e.status})"))
-            raise
-
+        with probe.active():
+            with probe.measure("refs"):
+                km_id, km_hash, count = await _first_ref(ctx, source, corp_id)
+            notes["refs"] = f"OK ({count} éléments, killmail {km_id})"
+            delivery = await process_ref(_diagnostic_ctx(ctx, interaction), km_id, km_hash)
+            with probe.measure("post"):
+                await delivery
     except Exception as e:
-        await interaction.followup.send(
-            _render_failure_report(title, steps, e),
-            ephemeral=True,
-        )
-    finally:
-        await esi.aclose()
+        report = _render_report(title, probe, notes, elapsed=time.perf_counter() - t0, exc=e)
+    else:
+        report = _render_report(title, probe, notes, elapsed=time.perf_counter() - t0)
+    await interaction.followup.send(report, ephemeral=True)
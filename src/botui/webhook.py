@@ -0,0 +1,95 @@
+from __future__ import annotations
+
+import asyncio
+from typing import Any
+
+import discord
+import httpx
+
+from src.botui.outbound import ChannelUnavailable
+
+
+class WebhookError(Exception):
+    """Réponse d'erreur de l'API webhook Discord (status HTTP, retry_after sur 429)."""
+
+    def __init__(self, status: int, message: str, retry_after: float | None = None):
+        super().__init__(f"{status} {message}")
+        self.status = status
+        self.retry_after = retry_after
+
+
+class WebhookMessage:
+    """Message posté via le webhook (éditable, comme un discord.Message)."""
+
+    def __init__(self, hook: WebhookChannel, data: dict):
+        self._hook = hook
+        self.id = int(data.get("id") or 0)
+
+    async def edit(self, *, embeds: list[discord.Embed]) -> None:
+        await self._hook._request("PATCH", f"/messages/{self.id}", embeds=embeds)
+
+
+class WebhookChannel:
+    """Cible de post via un webhook Discord : HTTP seul, sans gateway ni client
+    discord.py. S'utilise comme un channel avec Outbound.attach().
+
+    Les requêtes passent par un client httpx poolé et sont sérialisées : le
+    bucket de rate-limit du webhook est suivi via les en-têtes X-RateLimit-*
+    (pause quand il est vide), un 429 remonte avec son retry_after pour le
+    backoff de l'Outbound."""
+
+    def __init__(self, url: str, *, client: httpx.AsyncClient | None = None):
+        self.url = url.rstrip("/")
+        self._client = client or httpx.AsyncClient(
+            timeout=httpx.Timeout(15.0, connect=10.0),
+            limits=httpx.Limits(max_connections=2, max_keepalive_connections=2),
+        )
+        self._lock = asyncio.Lock()
+        self._resume_at = 0.0
+
+    async def aclose(self) -> None:
+        await self._client.aclose()
+
+    async def _request(
+        self, method: str, path: str = "", *, embeds: list[discord.Embed] | None = None
+    ) -> dict:
+        payload = None if embeds is None else {"embeds": [e.to_dict() for e in embeds]}
+        params = {"wait": "true"} if method == "POST" else None
+        loop = asyncio.get_running_loop()
+        async with self._lock:
+            wait = self._resume_at - loop.time()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            resp = await self._client.request(method, self.url + path, json=payload, params=params)
+            if resp.headers.get("X-RateLimit-Remaining") == "0":
+                reset_after = float(resp.headers.get("X-RateLimit-Reset-After") or 1.0)
+                self._resume_at = loop.time() + reset_after
+
+        if resp.status_code == 429:
+            data: Any = _json_or_empty(resp)
+            retry_after = float(data.get("retry_after") or resp.headers.get("Retry-After") or 1.0)
+            raise WebhookError(429, "rate limited", retry_after)
+        if resp.status_code >= 400:
+            raise WebhookError(resp.status_code, resp.text[:200])
+        return _json_or_empty(resp)
+
+    async def check(self) -> None:
+        """Vérifie que le webhook existe (au démarrage). Webhook supprimé ou
+        URL/token invalides : ChannelUnavailable (erreur de configuration)."""
+        try:
+            await self._request("GET")
+        except WebhookError as e:
+            if e.status in (401, 403, 404):
+                raise ChannelUnavailable(f"webhook unusable ({e})") from e
+            raise
+
+    async def send(self, *, embeds: list[discord.Embed]) -> WebhookMessage:
+        return WebhookMessage(self, await self._request("POST", embeds=embeds))
+
+
+def _json_or_empty(resp: httpx.Response) -> dict:
+    try:
+        data = resp.json()
+    except ValueError:
+        return {}
+    return data if isinstance(data, dict) else {}
@@ -9,13 +9,25 @@ ROOT = Path(__file__).resolve().parents[1]
 load_dotenv(ROOT / ".env")
 
 
+def _env_bool(name: str, default: str = "false") -> bool:
+    return os.getenv(name, default).lower() in ("1", "true", "yes")
+
+
 class Settings(BaseModel):
     DISCORD_TOKEN: str = os.getenv("DISCORD_TOKEN", "")
     DISCORD_CHANNEL_ID: str = os.getenv("DISCORD_CHANNEL_ID", "")
+    # Règles de routage vers d'autres channels (liste JSON, voir src/botui/routing.py)
+    ROUTES_FILE: str = os.getenv("ROUTES_FILE", "")
+    # Renseigné => mode headless : posts via webhook, sans gateway Discord
+    DISCORD_WEBHOOK_URL: str = os.getenv("DISCORD_WEBHOOK_URL", "")
     EVE_CLIENT_ID: str = os.getenv("EVE_CLIENT_ID", "")
     EVE_CLIENT_SECRET: str = os.getenv("EVE_CLIENT_SECRET", "")
     EVE_REFRESH_TOKEN: str = os.getenv("EVE_REFRESH_TOKEN", "")
+    # Tokens d'autres directeurs de la même corp (séparés par des virgules)
+    EVE_EXTRA_REFRESH_TOKENS: str = os.getenv("EVE_EXTRA_REFRESH_TOKENS", "")
     CORPORATION_ID: str = os.getenv("CORPORATION_ID", "")
+    # Plusieurs corporations dans un process (liste JSON, voir src/core/tenants.py)
+    TENANTS_FILE: str = os.getenv("TENANTS_FILE", "")
     CALLBACK_PORT: int = int(os.getenv("CALLBACK_PORT", "53682"))
     LOG_LEVEL: str = os.getenv("LOG_LEVEL", "INFO")
     POLL_INTERVAL_SECONDS: int = int(os.getenv("POLL_INTERVAL_SECONDS", "120"))
@@ -24,12 +36,34 @@ class Settings(BaseModel):
     PRICE_TTL_DAYS: int = int(os.getenv("PRICE_TTL_DAYS", "7"))
     COMPAT_DATE: str = os.getenv("COMPAT_DATE", "2025-08-26")
     TIMEZONE: str = os.getenv("TIMEZONE", "UTC")
-    ZKB_ENABLE: bool = os.getenv("ZKB_ENABLE", "false").lower() in ("1", "true", "yes")
+    ZKB_ENABLE: bool = _env_bool("ZKB_ENABLE")
     ZKB_PAGES: int = int(os.getenv("ZKB_PAGES", "1"))
     ZKB_EVERY_N: int = int(os.getenv("ZKB_EVERY_N", "3"))  # => 1 fois sur 3 cycles ESI
-    ZKB_POST_ENABLE: bool = os.getenv("ZKB_POST_ENABLE", "false").lower() in ("1", "true", "yes")
+    # 0 => POLL_INTERVAL_SECONDS * ZKB_EVERY_N
+    ZKB_INTERVAL_SECONDS: int = int(os.getenv("ZKB_INTERVAL_SECONDS", "0"))
+    ZKB_MAX_PER_CYCLE: int = int(os.getenv("ZKB_MAX_PER_CYCLE", "0"))  # 0 => illimité
+    ZKB_POST_ENABLE: bool = _env_bool("ZKB_POST_ENABLE")
     ZKB_POST_USER_AGENT: str = os.getenv("ZKB_POST_USER_AGENT", "")
     ESI_USER_AGENT: str = os.getenv("ESI_USER_AGENT", "")
+    # URLs de base des services (surchargées par le simulateur tests/sim)
+    ESI_BASE_URL: str = os.getenv("ESI_BASE_URL", "https://esi.evetech.net")
+    SSO_BASE_URL: str = os.getenv("SSO_BASE_URL", "https://login.eveonline.com")
+    ZKB_BASE_URL: str = os.getenv("ZKB_BASE_URL", "https://zkillboard.com/api")
+    # Regroupement des posts : fenêtre d'attente et nb max d'embeds par message
+    DISCORD_BATCH_WINDOW_MS: int = int(os.getenv("DISCORD_BATCH_WINDOW_MS", "1500"))
+    DISCORD_BATCH_MAX_EMBEDS: int = int(os.getenv("DISCORD_BATCH_MAX_EMBEDS", "10"))
+    # Post provisoire (ship/système/"valuing…") puis édition une fois enrichi
+    DISCORD_PROVISIONAL_POST: bool = _env_bool("DISCORD_PROVISIONAL_POST")
+    DISCORD_PROVISIONAL_GRACE_MS: int = int(os.getenv("DISCORD_PROVISIONAL_GRACE_MS", "300"))
+    # Endpoint Prometheus local (GET /metrics) ; 0 => désactivé
+    METRICS_PORT: int = int(os.getenv("METRICS_PORT", "0"))
+    METRICS_HOST: str = os.getenv("METRICS_HOST", "127.0.0.1")
+    # Persistance : "json" (fichiers de data/) ou "sqlite" (data/killbot.sqlite3, WAL)
+    STORAGE_BACKEND: str = os.getenv("STORAGE_BACKEND", "json").lower()
+    # Backfill (/backfill, python -m src.scheduler.backfill) : budget ESI propre
+    BACKFILL_RATE_PER_SECOND: int = int(os.getenv("BACKFILL_RATE_PER_SECOND", "2"))
+    STATE_SNAPSHOT_ENABLE: bool = _env_bool("STATE_SNAPSHOT_ENABLE")
+    STATE_SNAPSHOT_INTERVAL_SECONDS: int = int(os.getenv("STATE_SNAPSHOT_INTERVAL_SECONDS", "300"))
 
 
 settings = Settings()
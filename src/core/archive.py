@@ -0,0 +1,309 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import Counter
+from datetime import UTC, datetime, timedelta
+from itertools import compress
+from typing import Any
+
+from src.core.columns import append_columns, read_columns, truncate_columns
+from src.core.search import SearchIndex
+
+# Colonnes de l'archive et leur type (array) : une colonne = un fichier
+# <nom>.bin en ajout seul ; les IDs absents valent 0
+COLUMNS: dict[str, str] = {
+    "time": "q",
+    "killmail_id": "q",
+    "solar_system_id": "q",
+    "region_id": "q",
+    "ship_type_id": "q",
+    "victim_character_id": "q",
+    "victim_corporation_id": "q",
+    "victim_alliance_id": "q",
+    "final_character_id": "q",
+    "final_corporation_id": "q",
+    "final_alliance_id": "q",
+    "final_ship_type_id": "q",
+    "total_value": "d",
+    "dropped_value": "d",
+    "is_kill": "b",
+}
+# Regroupements de /top : (colonne côté kills, colonne côté pertes)
+GROUPS = {
+    "pilot": ("final_character_id", "victim_character_id"),
+    "corp": ("final_corporation_id", "victim_corporation_id"),
+    "alliance": ("final_alliance_id", "victim_alliance_id"),
+    "ship": ("final_ship_type_id", "ship_type_id"),
+    "system": ("solar_system_id", "solar_system_id"),
+    "region": ("region_id", "region_id"),
+}
+PERIODS = ("day", "week", "month", "all")
+# Dossier de l'archive dans le dossier du tenant, et ancienne archive JSON lines
+ARCHIVE_DIR = "archive"
+# Sous-dossier des index de /search (src/core/search.py)
+SEARCH_DIR = "search"
+LEGACY_ARCHIVE_FILE = "archive.jsonl"
+# Délai de regroupement des écritures disque (comme JSONStore)
+WRITE_DELAY_S = 0.5
+
+
+def period_bounds(period: str, now: datetime | None = None) -> tuple[int, int]:
+    """[début, fin) en epoch : jour et mois calendaires UTC, 7 derniers jours."""
+    now = now or datetime.now(UTC)
+    end = int(now.timestamp()) + 1
+    if period == "day":
+        start = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    elif period == "week":
+        start = now - timedelta(days=7)
+    elif period == "month":
+        start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    elif period == "all":
+        return 0, end
+    else:
+        raise ValueError(f"unknown period {period!r} (expected {', '.join(PERIODS)})")
+    return int(start.timestamp()), end
+
+
+class KillArchive:
+    """Archive locale des kills enrichis, en colonnes (array) triées par temps.
+
+    Une requête sur une période borne l'intervalle par dichotomie sur la
+    colonne time, puis agrège des tranches de colonnes (sum/compress/Counter,
+    boucles en C) : quelques ms pour un mois. Sur disque, chaque colonne est
+    un fichier binaire en ajout seul, écrit dans un thread ; un ajout
+    interrompu est tronqué au chargement. Les index inversés de /search
+    (`self.search`) sont mis à jour et écrits avec chaque ajout."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.cols: dict[str, array[Any]] = {name: array(code) for name, code in COLUMNS.items()}
+        self._ids: set[int] = set()
+        self._positions: dict[int, int] | None = None
+        self._pending: list[dict[str, Any]] = []
+        self._task: asyncio.Task | None = None
+        self._io_lock = threading.Lock()
+        self._load()
+        self.search = SearchIndex(os.path.join(directory, SEARCH_DIR))
+        if len(self) and not self.search.postings:
+            # Archive antérieure aux index : victime et coup final seulement
+            for i in range(len(self)):
+                self.search.add({name: col[i] for name, col in self.cols.items()})
+            self._schedule()
+
+    def __len__(self) -> int:
+        return len(self.cols["time"])
+
+    def __contains__(self, km_id: object) -> bool:
+        return km_id in self._ids
+
+    def _load(self) -> None:
+        raw = read_columns(self.directory, COLUMNS)
+        n = len(raw["time"])
+        truncate_columns(self.directory, COLUMNS, n)
+        times = raw["time"]
+        if all(a <= b for a, b in zip(times, times[1:])):
+            self.cols = raw
+        else:
+            # Kills rattrapés (backfill) : ordre d'arrivée sur disque, trié en mémoire
+            order = sorted(range(n), key=times.__getitem__)
+            self.cols = {
+                name: array(col.typecode, map(col.__getitem__, order)) for name, col in raw.items()
+            }
+        self._ids = set(self.cols["killmail_id"])
+
+    def add(self, record: dict[str, Any]) -> bool:
+        """Ajoute un kill (ligne processor.kill_record) ; False si déjà archivé."""
+        return self.add_many([record]) == 1
+
+    def add_many(self, records: list[dict[str, Any]]) -> int:
+        rows = []
+        for record in records:
+            km_id = int(record["killmail_id"])
+            if km_id in self._ids:
+                continue
+            self._ids.add(km_id)
+            self.search.add(record)
+            rows.append(
+                {
+                    name: (
+                        float(record.get(name) or 0) if code == "d" else int(record.get(name) or 0)
+                    )
+                    for name, code in COLUMNS.items()
+                }
+            )
+        if not rows:
+            return 0
+        rows.sort(key=lambda r: r["time"])
+        times = self.cols["time"]
+        if not times or rows[0]["time"] >= times[-1]:
+            # Cas du live : kills plus récents que l'archive, ajout en fin
+            for name, col in self.cols.items():
+                col.extend(r[name] for r in rows)
+        else:
+            # Backfill : fusion par tranches (copies mémoire, pas d'insert ligne à ligne)
+            positions = [bisect_right(times, r["time"]) for r in rows]
+            for name, col in self.cols.items():
+                merged: array[Any] = array(col.typecode)
+                prev = 0
+                for pos, row in zip(positions, rows, strict=True):
+                    merged += col[prev:pos]
+                    merged.append(row[name])
+                    prev = pos
+                merged += col[prev:]
+                self.cols[name] = merged
+        self._positions = None
+        self._pending.extend(rows)
+        self._schedule()
+        return len(rows)
+
+    def _schedule(self) -> None:
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self._write(self._take())
+            return
+        if self._task is None or self._task.done():
+            self._task = loop.create_task(self._flush_later())
+
+    def _take(self) -> tuple[list[dict[str, Any]], list[tuple[int, int]]]:
+        rows, self._pending = self._pending, []
+        return rows, self.search.take()
+
+    async def flush(self) -> None:
+        """Attend que les kills ajoutés soient sur disque."""
+        while self._task is not None and not self._task.done():
+            await asyncio.shield(self._task)
+
+    async def _flush_later(self) -> None:
+        try:
+            await asyncio.sleep(WRITE_DELAY_S)
+            while self._pending or self.search.pending:
+                try:
+                    await asyncio.to_thread(self._write, self._take())
+                except Exception as e:
+                    print(f"[archive] write error for {self.directory}: {e}")
+        except asyncio.CancelledError:
+            # Arrêt de la boucle : on écrit ce qui reste avant de sortir
+            self._write(self._take())
+            raise
+
+    def _write(self, pending: tuple[list[dict[str, Any]], list[tuple[int, int]]]) -> None:
+        rows, postings = pending
+        with self._io_lock:
+            if rows:
+                append_columns(
+                    self.directory, COLUMNS, {name: [r[name] for r in rows] for name in COLUMNS}
+                )
+            self.search.write(postings)
+
+    def import_jsonl(self, path: str) -> int:
+        """Import unique de l'ancienne archive JSON lines (une ligne par kill)."""
+        records = []
+        try:
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        records.append(json.loads(line))
+                    except ValueError:
+                        continue
+        except OSError:
+            return 0
+        return self.add_many([r for r in records if isinstance(r, dict) and "time" in r])
+
+    # --- requêtes ---
+
+    def records(self, km_ids: list[int]) -> list[dict[str, Any]]:
+        """Lignes archivées des killmails demandés (dans l'ordre donné)."""
+        if self._positions is None:
+            self._positions = {km_id: i for i, km_id in enumerate(self.cols["killmail_id"])}
+        out = []
+        for km_id in km_ids:
+            i = self._positions.get(km_id)
+            if i is not None:
+                out.append({name: col[i] for name, col in self.cols.items()})
+        return out
+
+    def _slice(self, start: int, end: int) -> tuple[int, int]:
+        times = self.cols["time"]
+        return bisect_left(times, start), bisect_left(times, end)
+
+    def summary(self, start: int, end: int) -> dict[str, Any]:
+        lo, hi = self._slice(start, end)
+        kill = self.cols["is_kill"][lo:hi]
+        loss = array("b", (1 - k for k in kill))
+        total = self.cols["total_value"][lo:hi]
+        dropped = self.cols["dropped_value"][lo:hi]
+        kill_values = list(compress(total, kill))
+        isk_killed, isk_lost = sum(kill_values), sum(compress(total, loss))
+        biggest = max(range(len(total)), key=total.__getitem__, default=None)
+        return {
+            "kills": sum(kill),
+            "losses": len(kill) - sum(kill),
+            "isk_killed": isk_killed,
+            "isk_lost": isk_lost,
+            "isk_dropped": sum(dropped),
+            "efficiency": isk_killed / (isk_killed + isk_lost) if isk_killed + isk_lost else None,
+            "biggest": (
+                None
+                if biggest is None
+                else {
+                    "killmail_id": self.cols["killmail_id"][lo + biggest],
+                    "total_value": total[biggest],
+                    "is_kill": bool(kill[biggest]),
+                }
+            ),
+        }
+
+    def top(
+        self,
+        start: int,
+        end: int,
+        *,
+        by: str = "pilot",
+        kills: bool = True,
+        metric: str = "isk",
+        limit: int = 10,
+    ) -> list[tuple[int, float, int]]:
+        """[(id, isk, nombre)] triés par `metric` ("isk" ou "count"), côté
+        kills (colonnes final_*) ou pertes (colonnes victim_*)."""
+        if by not in GROUPS:
+            raise ValueError(f"unknown group {by!r} (expected {', '.join(GROUPS)})")
+        lo, hi = self._slice(start, end)
+        mask = self.cols["is_kill"][lo:hi]
+        if not kills:
+            mask = array("b", (1 - k for k in mask))
+        keys = list(compress(self.cols[GROUPS[by][0 if kills else 1]][lo:hi], mask))
+        values = list(compress(self.cols["total_value"][lo:hi], mask))
+        counts = Counter(keys)
+        isk: dict[int, float] = {}
+        for key, value in zip(keys, values, strict=True):
+            isk[key] = isk.get(key, 0.0) + value
+        counts.pop(0, None)  # ID inconnu (NPC, pas d'alliance…)
+        rows = [(key, isk[key], n) for key, n in counts.items()]
+        rank = 1 if metric == "isk" else 2
+        rows.sort(key=lambda r: r[rank], reverse=True)
+        return rows[: max(1, limit)]
+
+
+def _key(directory: str) -> str:
+    return os.path.abspath(directory)
+
+
+# Une instance par dossier (partagée entre le live et le backfill du tenant)
+_ARCHIVES: dict[str, KillArchive] = {}
+
+
+def open_archive(directory: str, *, legacy_jsonl: str | None = None) -> KillArchive:
+    archive = _ARCHIVES.get(_key(directory))
+    if archive is None:
+        archive = _ARCHIVES[_key(directory)] = KillArchive(directory)
+        if legacy_jsonl and not len(archive) and os.path.exists(legacy_jsonl):
+            imported = archive.import_jsonl(legacy_jsonl)
+            if imported:
+                print(f"[archive] imported {imported} kills from {legacy_jsonl}")
+    return archive
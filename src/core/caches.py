@@ -0,0 +1,57 @@
+from __future__ import annotations
+
+from collections import OrderedDict
+from collections.abc import Hashable, Iterable
+from typing import Any
+
+from src.core.probe import probe_cache
+
+
+class LRUCache:
+    """Cache mémoire borné (LRU) avec compteurs hits/misses."""
+
+    def __init__(self, maxsize: int, *, name: str = ""):
+        self.maxsize = maxsize
+        # Nom rapporté aux sondes de diagnostic (src/core/probe.py)
+        self.name = name
+        self._data: OrderedDict[Hashable, Any] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._data
+
+    def get(self, key: Hashable) -> Any | None:
+        try:
+            value = self._data[key]
+        except KeyError:
+            self.misses += 1
+            if self.name:
+                probe_cache(self.name, False)
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        if self.name:
+            probe_cache(self.name, True)
+        return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        self._data[key] = value
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def update(self, items: Iterable[tuple[Hashable, Any]]) -> None:
+        for key, value in items:
+            self.set(key, value)
+
+    def items(self, limit: int | None = None) -> list[tuple[Hashable, Any]]:
+        """Entrées du plus ancien au plus récemment utilisé (les `limit` dernières)."""
+        arr = list(self._data.items())
+        return arr[-limit:] if limit else arr
+
+    def clear(self) -> None:
+        self._data.clear()
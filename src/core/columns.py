@@ -0,0 +1,55 @@
+from __future__ import annotations
+
+import os
+from array import array
+from collections.abc import Iterable
+from typing import Any
+
+
+def column_path(directory: str, name: str) -> str:
+    return os.path.join(directory, f"{name}.bin")
+
+
+def read_columns(directory: str, columns: dict[str, str]) -> dict[str, array[Any]]:
+    """Colonnes {nom: typecode} lues depuis <dossier>/<nom>.bin (absentes = vides).
+
+    Un ajout interrompu (crash pendant l'écriture) laisse des colonnes de
+    longueurs différentes : elles sont tronquées à la plus courte."""
+    cols: dict[str, array[Any]] = {}
+    for name, code in columns.items():
+        col = array(code)
+        try:
+            with open(column_path(directory, name), "rb") as f:
+                data = f.read()
+            col.frombytes(data[: len(data) - len(data) % col.itemsize])
+        except OSError:
+            pass
+        cols[name] = col
+    n = min(len(c) for c in cols.values())
+    for col in cols.values():
+        del col[n:]
+    return cols
+
+
+def append_columns(
+    directory: str, columns: dict[str, str], values: dict[str, Iterable[Any]]
+) -> None:
+    """Ajoute des valeurs en fin de chaque fichier de colonne (appel bloquant)."""
+    os.makedirs(directory, exist_ok=True)
+    for name, code in columns.items():
+        with open(column_path(directory, name), "ab") as f:
+            f.write(array(code, values[name]).tobytes())
+
+
+def truncate_columns(directory: str, columns: dict[str, str], n: int) -> None:
+    """Ramène chaque fichier de colonne à `n` valeurs (après read_columns) :
+    sans cela, l'ajout suivant s'écrirait après les octets d'un ajout
+    interrompu et les colonnes resteraient décalées."""
+    for name, code in columns.items():
+        path = column_path(directory, name)
+        size = n * array(code).itemsize
+        try:
+            if os.path.getsize(path) > size:
+                os.truncate(path, size)
+        except OSError:
+            pass
@@ -0,0 +1,121 @@
+from __future__ import annotations
+
+import math
+import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass
+from datetime import datetime
+
+from src.core.metrics import METRICS
+
+# Kills postés gardés pour les percentiles (fenêtre glissante)
+WINDOW = 500
+# Traces en cours (vus, pas encore postés) : les plus anciennes sont oubliées
+MAX_INFLIGHT = 2_000
+QUANTILES = (0.5, 0.9, 0.99)
+
+# Segment -> (début, fin). "visibility" = délai avant que la ref soit listée
+# (cache ESI / zKill + cadence de poll), le reste est notre pipeline.
+SEGMENTS = {
+    "visibility": ("killmail", "seen"),
+    "details": ("seen", "details"),
+    "enrich": ("details", "enriched"),
+    "post": ("enriched", "posted"),
+    "pipeline": ("seen", "posted"),
+    "total": ("killmail", "posted"),
+}
+
+
+@dataclass
+class KillTrace:
+    """Horodatages (epoch s) d'un kill, de killmail_time au post Discord."""
+
+    km_id: int
+    source: str
+    seen: float
+    killmail: float | None = None
+    details: float | None = None
+    enriched: float | None = None
+    posted: float | None = None
+
+    def span(self, segment: str) -> float | None:
+        start, end = SEGMENTS[segment]
+        a, b = getattr(self, start), getattr(self, end)
+        return None if a is None or b is None else max(0.0, b - a)
+
+
+def percentile(values: list[float], q: float) -> float:
+    """Percentile au rang le plus proche (values triées)."""
+    if not values:
+        return 0.0
+    return values[max(0, math.ceil(q * len(values)) - 1)]
+
+
+class LatencyTracker:
+    """Trace chaque kill de sa détection à son post et garde les WINDOW
+    derniers kills postés pour des percentiles par source et par segment."""
+
+    def __init__(self, window: int = WINDOW):
+        self._inflight: OrderedDict[int, KillTrace] = OrderedDict()
+        self.completed: deque[KillTrace] = deque(maxlen=window)
+
+    def seen(self, km_id: int, source: str) -> None:
+        # Première source qui voit le kill seulement (retentatives incluses)
+        if km_id in self._inflight:
+            return
+        self._inflight[km_id] = KillTrace(km_id, source, time.time())
+        while len(self._inflight) > MAX_INFLIGHT:
+            self._inflight.popitem(last=False)
+
+    def details(self, km_id: int, killmail_time: datetime | None) -> None:
+        trace = self._inflight.get(km_id)
+        if trace is None:
+            return
+        trace.details = time.time()
+        if killmail_time is not None:
+            trace.killmail = killmail_time.timestamp()
+
+    def enriched(self, km_id: int) -> None:
+        trace = self._inflight.get(km_id)
+        if trace is not None and trace.enriched is None:
+            trace.enriched = time.time()
+
+    def posted(self, km_id: int) -> KillTrace | None:
+        trace = self._inflight.pop(km_id, None)
+        if trace is None:
+            return None
+        trace.posted = time.time()
+        self.completed.append(trace)
+        return trace
+
+    def summary(self) -> dict[tuple[str, str], list[float]]:
+        """(source, segment) -> valeurs triées sur la fenêtre (source "all" incluse)."""
+        out: dict[tuple[str, str], list[float]] = {}
+        for trace in self.completed:
+            for segment in SEGMENTS:
+                value = trace.span(segment)
+                if value is None:
+                    continue
+                for source in (trace.source, "all"):
+                    out.setdefault((source, segment), []).append(value)
+        for values in out.values():
+            values.sort()
+        return out
+
+    def samples(self) -> list[tuple[dict[str, str], float]]:
+        samples: list[tuple[dict[str, str], float]] = []
+        for (source, segment), values in sorted(self.summary().items()):
+            for q in QUANTILES:
+                labels = {"source": source, "segment": segment, "quantile": str(q)}
+                samples.append((labels, percentile(values, q)))
+        return samples
+
+
+TRACES = LatencyTracker()
+
+METRICS.describe(
+    "killbot_detection_latency_seconds",
+    "gauge",
+    "Percentiles de latence par segment (killmail_time -> vu -> détails -> enrichi -> posté)",
+)
+METRICS.register("killbot_detection_latency_seconds", TRACES.samples)
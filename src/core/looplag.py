@@ -0,0 +1,66 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from collections import deque
+
+from src.core.metrics import METRICS
+
+# Période d'échantillonnage : le retard d'un sleep(INTERVAL) = temps bloqué
+INTERVAL_S = 0.25
+# Au-delà, le blocage est loggé (le heartbeat gateway s'inquiète vers 10 s)
+WARN_AFTER_S = 0.5
+# Échantillons gardés pour /stats (~5 min)
+WINDOW = 1_200
+
+
+class LoopLagMonitor:
+    """Mesure le retard de la boucle asyncio : une tâche dort INTERVAL_S et
+    compare le réveil réel à l'attendu. Tout retard est du temps pendant
+    lequel du code synchrone a bloqué la boucle (I/O disque, JSON, CPU)."""
+
+    def __init__(self, interval: float = INTERVAL_S, warn_after: float = WARN_AFTER_S):
+        self.interval = interval
+        self.warn_after = warn_after
+        self.samples: deque[float] = deque(maxlen=WINDOW)
+        self.blocked_s = 0.0
+        self.stalls = 0
+        self._task: asyncio.Task | None = None
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            t0 = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            self.record(time.perf_counter() - t0 - self.interval)
+
+    def record(self, lag: float) -> None:
+        lag = max(0.0, lag)
+        self.samples.append(lag)
+        self.blocked_s += lag
+        METRICS.observe("killbot_event_loop_lag_seconds", lag)
+        if lag >= self.warn_after:
+            self.stalls += 1
+            print(f"[loop] event loop blocked for {lag * 1000:.0f} ms")
+
+    def max_recent(self) -> float:
+        return max(self.samples, default=0.0)
+
+
+LOOP_LAG = LoopLagMonitor()
+
+METRICS.describe(
+    "killbot_event_loop_lag_seconds", "histogram", "Retard de réveil de la boucle asyncio"
+)
+METRICS.describe(
+    "killbot_event_loop_blocked_seconds_total", "counter", "Temps cumulé de boucle bloquée"
+)
+METRICS.register("killbot_event_loop_blocked_seconds_total", lambda: [({}, LOOP_LAG.blocked_s)])
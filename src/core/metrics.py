@@ -0,0 +1,223 @@
+from __future__ import annotations
+
+import asyncio
+import re
+import time
+from collections import deque
+from collections.abc import Callable, Iterable, Iterator, Mapping
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+
+from src.core.probe import probe_call
+
+# Bornes des histogrammes de latence (secondes)
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+LabelKey = tuple[tuple[str, str], ...]
+Sample = tuple[dict[str, str], float]
+
+# Segments variables des URLs (IDs, hashes) : une route = un motif d'endpoint
+_ID_SEGMENT = re.compile(r"/\d+(?=/|$)")
+_HASH_SEGMENT = re.compile(r"/[0-9a-f]{32,}(?=/|$)")
+
+
+def route_of(path: str) -> str:
+    """/v1/killmails/123/abc…/ -> /v1/killmails/{id}/{hash}/ (label de route)."""
+    path = urlsplit(path).path
+    return _HASH_SEGMENT.sub("/{hash}", _ID_SEGMENT.sub("/{id}", path))
+
+
+def _key(labels: Mapping[str, object]) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _fmt_labels(key: Iterable[tuple[str, str]]) -> str:
+    parts = []
+    for k, v in key:
+        v = v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        parts.append(f'{k}="{v}"')
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _fmt_value(v: float) -> str:
+    return str(int(v)) if float(v).is_integer() else repr(float(v))
+
+
+class _Histogram:
+    __slots__ = ("counts", "count", "sum")
+
+    def __init__(self) -> None:
+        self.counts = [0] * len(BUCKETS)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        for i, bound in enumerate(BUCKETS):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        self.count += 1
+        self.sum += value
+
+
+class Metrics:
+    """Registre mémoire des métriques du pipeline, exposé au format texte
+    Prometheus (voir serve_metrics).
+
+    Compteurs et histogrammes sont mis à jour à chaque appel (simples
+    opérations de dict, sans I/O) ; les jauges et compteurs déjà tenus
+    ailleurs (caches, index) sont lus à l'exposition via des callbacks."""
+
+    def __init__(self) -> None:
+        self._help: dict[str, tuple[str, str]] = {}
+        self._counters: dict[str, dict[LabelKey, float]] = {}
+        self._histograms: dict[str, dict[LabelKey, _Histogram]] = {}
+        self._callbacks: dict[str, list[Callable[[], Iterable[Sample]]]] = {}
+
+    def describe(self, name: str, kind: str, help_text: str) -> None:
+        self._help.setdefault(name, (kind, help_text))
+
+    def inc(self, name: str, value: float = 1.0, **labels: object) -> None:
+        series = self._counters.setdefault(name, {})
+        key = _key(labels)
+        series[key] = series.get(key, 0.0) + value
+
+    def observe(self, name: str, seconds: float, **labels: object) -> None:
+        series = self._histograms.setdefault(name, {})
+        key = _key(labels)
+        hist = series.get(key)
+        if hist is None:
+            hist = series[key] = _Histogram()
+        hist.observe(seconds)
+
+    @contextmanager
+    def time(self, name: str, **labels: object) -> Iterator[None]:
+        """Observe la durée du bloc (aussi quand il lève)."""
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - t0, **labels)
+
+    def register(self, name: str, fn: Callable[[], Iterable[Sample]]) -> None:
+        """Série lue à l'exposition : fn() -> [(labels, valeur), ...]."""
+        self._callbacks.setdefault(name, []).append(fn)
+
+    def value(self, name: str, **labels: object) -> float:
+        return self._counters.get(name, {}).get(_key(labels), 0.0)
+
+    def histogram(self, name: str, **labels: object) -> tuple[int, float]:
+        """(count, sum) d'un histogramme, (0, 0.0) s'il n'a rien observé."""
+        hist = self._histograms.get(name, {}).get(_key(labels))
+        return (hist.count, hist.sum) if hist else (0, 0.0)
+
+    def reset(self) -> None:
+        self._counters.clear()
+        self._histograms.clear()
+        self._callbacks.clear()
+
+    def _header(self, lines: list[str], name: str, default_kind: str) -> None:
+        kind, help_text = self._help.get(name, (default_kind, ""))
+        if help_text:
+            lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+
+    def render(self) -> str:
+        lines: list[str] = []
+        for name, series in sorted(self._counters.items()):
+            self._header(lines, name, "counter")
+            for key, v in sorted(series.items()):
+                lines.append(f"{name}{_fmt_labels(key)} {_fmt_value(v)}")
+        for name, hists in sorted(self._histograms.items()):
+            self._header(lines, name, "histogram")
+            for key, hist in sorted(hists.items()):
+                cumulative = 0
+                for bound, n in zip(BUCKETS, hist.counts, strict=True):
+                    cumulative += n
+                    le = _fmt_labels((*key, ("le", _fmt_value(bound))))
+                    lines.append(f"{name}_bucket{le} {cumulative}")
+                lines.append(f"{name}_bucket{_fmt_labels((*key, ('le', '+Inf')))} {hist.count}")
+                lines.append(f"{name}_sum{_fmt_labels(key)} {hist.sum!r}")
+                lines.append(f"{name}_count{_fmt_labels(key)} {hist.count}")
+        for name, fns in sorted(self._callbacks.items()):
+            samples: list[Sample] = []
+            for fn in fns:
+                try:
+                    samples.extend(fn())
+                except Exception as e:
+                    print(f"[metrics] collector {name} error: {e}")
+            self._header(lines, name, "gauge")
+            for labels, v in samples:
+                lines.append(f"{name}{_fmt_labels(_key(labels))} {_fmt_value(v)}")
+        return "\n".join(lines) + "\n"
+
+
+METRICS = Metrics()
+
+METRICS.describe(
+    "killbot_http_requests_total", "counter", "Requêtes HTTP sortantes par service, route, status"
+)
+METRICS.describe("killbot_http_request_seconds", "histogram", "Latence des requêtes HTTP sortantes")
+METRICS.describe("killbot_stage_seconds", "histogram", "Latence par étape de process_ref")
+METRICS.describe("killbot_discord_send_seconds", "histogram", "Latence des envois Discord")
+METRICS.describe("killbot_discord_sends_total", "counter", "Envois Discord par résultat")
+METRICS.describe("killbot_cache_hits_total", "counter", "Lectures de cache trouvées")
+METRICS.describe("killbot_cache_misses_total", "counter", "Lectures de cache manquées")
+METRICS.describe("killbot_cache_entries", "gauge", "Entrées en cache")
+METRICS.describe("killbot_kill_index_size", "gauge", "Kills connus de l'index, par tenant")
+METRICS.describe("killbot_outbound_pending", "gauge", "Posts en attente d'envoi, par tenant")
+
+
+# Horodatages des dernières requêtes par service (débit par minute de /stats)
+_RECENT: dict[str, deque[float]] = {}
+RECENT_MAX = 10_000
+
+
+def record_http(service: str, path: str, status: int | str, seconds: float) -> None:
+    route = route_of(path)
+    METRICS.inc("killbot_http_requests_total", service=service, route=route, status=status)
+    METRICS.observe("killbot_http_request_seconds", seconds, service=service, route=route)
+    _RECENT.setdefault(service, deque(maxlen=RECENT_MAX)).append(time.monotonic())
+    probe_call(service)
+
+
+def requests_per_minute() -> dict[str, int]:
+    """Requêtes des 60 dernières secondes, par service (esi, zkill)."""
+    cutoff = time.monotonic() - 60.0
+    out: dict[str, int] = {}
+    for service, stamps in _RECENT.items():
+        while stamps and stamps[0] < cutoff:
+            stamps.popleft()
+        out[service] = len(stamps)
+    return out
+
+
+async def _handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+    try:
+        request_line = await asyncio.wait_for(reader.readline(), timeout=5.0)
+        # En-têtes ignorés (lus jusqu'à la ligne vide)
+        while (await asyncio.wait_for(reader.readline(), timeout=5.0)).strip():
+            pass
+        parts = request_line.decode("latin-1").split()
+        path = parts[1] if len(parts) > 1 else ""
+        if path.split("?", 1)[0] == "/metrics":
+            status, body = "200 OK", METRICS.render().encode()
+            ctype = "text/plain; version=0.0.4; charset=utf-8"
+        else:
+            status, body, ctype = "404 Not Found", b"not found\n", "text/plain"
+        writer.write(
+            f"HTTP/1.1 {status}\r\nContent-Type: {ctype}\r\n"
+            f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body
+        )
+        await writer.drain()
+    except (TimeoutError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+
+
+async def serve_metrics(host: str, port: int) -> asyncio.Server:
+    """Sert GET /metrics (format texte Prometheus) sur host:port."""
+    server = await asyncio.start_server(_handle, host, port)
+    print(f"[metrics] serving http://{host}:{port}/metrics")
+    return server
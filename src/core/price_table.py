@@ -0,0 +1,220 @@
+from __future__ import annotations
+
+import asyncio
+import mmap
+import os
+import struct
+import threading
+from array import array
+from bisect import bisect_left
+from collections.abc import Iterable
+from typing import Any, BinaryIO
+
+# En-tête de 16 octets (colonnes alignées sur 8) : magic, version, nombre de lignes
+_HEADER = struct.Struct("=4sIQ")
+MAGIC = b"KBPT"
+VERSION = 1
+# Délai de regroupement des réécritures (comme JSONStore)
+WRITE_DELAY_S = 0.5
+
+
+class PriceTable:
+    """Table de prix binaire, triée par type_id et mappée en mémoire.
+
+    Trois colonnes contiguës (ordre natif de la machine) : type_id (int64),
+    prix (float64), mise à jour (epoch, float64). Le chargement ne lit que
+    l'en-tête ; la recherche est une dichotomie sur la colonne des type_id.
+    Une mise à jour d'un type_id existant s'écrit en place dans le mapping ;
+    un nouveau type_id va dans une table mémoire (`_overlay`), fusionnée dans
+    le fichier par une réécriture regroupée (WRITE_DELAY_S) faite dans un
+    thread, puis remappée. Le fichier peut être ouvert en lecture seule par
+    d'autres process. Un fichier invalide (crash pendant une ancienne
+    écriture) est mis de côté et la table repart vide."""
+
+    def __init__(self, path: str, *, readonly: bool = False):
+        self.path = path
+        self.readonly = readonly
+        self._file: BinaryIO | None = None
+        self._mm: mmap.mmap | None = None
+        self._views: list[memoryview] = []
+        # Colonnes : vues memoryview sur le mapping (array vide tant que rien n'est mappé)
+        self.ids: Any = array("q")
+        self.prices: Any = array("d")
+        self.updated: Any = array("d")
+        # Nouveaux type_ids pas encore dans le fichier, et réécriture en cours
+        self._overlay: dict[int, tuple[float, float]] = {}
+        self._task: asyncio.Task | None = None
+        self._writing = False
+        self._io_lock = threading.Lock()
+        if os.path.exists(path):
+            try:
+                self._map()
+            except (ValueError, struct.error) as e:
+                self._discard(e)
+
+    def __len__(self) -> int:
+        return len(self.ids) + sum(1 for t in self._overlay if self._index(t) < 0)
+
+    def _discard(self, error: Exception) -> None:
+        if self.readonly:
+            print(f"[prices] unreadable price table {self.path}: {error}")
+            return
+        aside = f"{self.path}.corrupt"
+        print(f"[prices] invalid price table {self.path} ({error}), moved to {aside}")
+        os.replace(self.path, aside)
+
+    def _map(self) -> None:
+        self.close()
+        f = open(self.path, "rb" if self.readonly else "r+b")
+        try:
+            access = mmap.ACCESS_READ if self.readonly else mmap.ACCESS_WRITE
+            mm = mmap.mmap(f.fileno(), 0, access=access)
+        except BaseException:
+            f.close()
+            raise
+        magic, version, n = _HEADER.unpack_from(mm, 0)
+        if magic != MAGIC or version != VERSION or len(mm) != _HEADER.size + 24 * n:
+            mm.close()
+            f.close()
+            raise ValueError(f"invalid price table: {self.path}")
+        self._file, self._mm = f, mm
+        raw = memoryview(mm)
+        off = _HEADER.size
+        self.ids = raw[off : off + 8 * n].cast("q")
+        self.prices = raw[off + 8 * n : off + 16 * n].cast("d")
+        self.updated = raw[off + 16 * n : off + 24 * n].cast("d")
+        self._views = [raw, self.ids, self.prices, self.updated]
+
+    def close(self) -> None:
+        # Les vues doivent être libérées avant de fermer le mapping
+        for view in reversed(self._views):
+            view.release()
+        self._views = []
+        self.ids, self.prices, self.updated = array("q"), array("d"), array("d")
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _index(self, type_id: int) -> int:
+        i = bisect_left(self.ids, type_id)
+        return i if i < len(self.ids) and self.ids[i] == type_id else -1
+
+    def get(self, type_id: int) -> tuple[float, float] | None:
+        """(prix, epoch de mise à jour) ou None si inconnu."""
+        entry = self._overlay.get(type_id)
+        if entry is not None:
+            return entry
+        i = self._index(type_id)
+        return (self.prices[i], self.updated[i]) if i >= 0 else None
+
+    def stale(self, cutoff: float) -> list[int]:
+        """type_ids mis à jour avant `cutoff` (un seul passage sur les colonnes)."""
+        out = [
+            t
+            for t, u in zip(self.ids, self.updated)
+            if u < cutoff and (t not in self._overlay or self._overlay[t][1] < cutoff)
+        ]
+        known = set(out)
+        out += [t for t, (_, u) in self._overlay.items() if u < cutoff and t not in known]
+        return out
+
+    def set(self, type_id: int, price: float, updated: float) -> None:
+        self.set_many([(type_id, price, updated)])
+
+    def set_many(self, rows: Iterable[tuple[int, float, float]]) -> None:
+        if self.readonly:
+            raise PermissionError(f"price table opened read-only: {self.path}")
+        for type_id, price, updated in rows:
+            i = -1 if self._writing else self._index(type_id)
+            if i >= 0 and type_id not in self._overlay:
+                self.prices[i] = float(price)
+                self.updated[i] = float(updated)
+            else:
+                # Nouveau type_id, ou mapping en cours de remplacement
+                self._overlay[int(type_id)] = (float(price), float(updated))
+        # Mapping partagé : les écritures en place sont dans le page cache et
+        # survivent à un crash du process (pas de msync, comme le JSONStore)
+        if self._overlay:
+            self._schedule()
+
+    def _schedule(self) -> None:
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            written = dict(self._overlay)  # scripts, import initial : écriture directe
+            self._replace(self._merge(written), written)
+            return
+        if self._task is None or self._task.done():
+            self._task = loop.create_task(self._flush_later())
+
+    async def flush(self) -> None:
+        """Attend que les nouveaux type_ids soient dans le fichier."""
+        while self._task is not None and not self._task.done():
+            await asyncio.shield(self._task)
+
+    async def _flush_later(self) -> None:
+        try:
+            await asyncio.sleep(WRITE_DELAY_S)
+            while self._overlay:
+                # Mapping figé pendant la fusion : les mises à jour vont dans _overlay
+                self._writing = True
+                written = dict(self._overlay)
+                try:
+                    await asyncio.to_thread(self._write_merged, written)
+                    self._replace(None, written)
+                except Exception as e:
+                    print(f"[prices] write error for {self.path}: {e}")
+                    return
+                finally:
+                    self._writing = False
+        except asyncio.CancelledError:
+            # Arrêt de la boucle : on écrit ce qui reste avant de sortir
+            if self._overlay:
+                written = dict(self._overlay)
+                self._replace(self._merge(written), written)
+            raise
+
+    def _merge(self, new: dict[int, tuple[float, float]]) -> tuple[array, array, array]:
+        """Colonnes du mapping fusionnées avec `new`, triées par type_id."""
+        merged = {t: (p, u) for t, p, u in zip(self.ids, self.prices, self.updated)}
+        merged.update(new)
+        ids = array("q", sorted(merged))
+        prices = array("d", (merged[t][0] for t in ids))
+        updated = array("d", (merged[t][1] for t in ids))
+        return ids, prices, updated
+
+    def _write_merged(self, new: dict[int, tuple[float, float]]) -> None:
+        # Thread : fusion et écriture du fichier temporaire, hors boucle
+        with self._io_lock:
+            _write_tmp(self.path, *self._merge(new))
+
+    def _replace(
+        self,
+        columns: tuple[array, array, array] | None,
+        written: dict[int, tuple[float, float]],
+    ) -> None:
+        with self._io_lock:
+            if columns is not None:
+                _write_tmp(self.path, *columns)
+            self.close()
+            os.replace(f"{self.path}.tmp", self.path)
+        self._map()
+        # Entrées modifiées pendant l'écriture : gardées pour la suivante
+        for type_id, entry in written.items():
+            if self._overlay.get(type_id) == entry:
+                del self._overlay[type_id]
+
+
+def _write_tmp(path: str, ids: array, prices: array, updated: array) -> None:
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(f"{path}.tmp", "wb") as f:
+        f.write(_HEADER.pack(MAGIC, VERSION, len(ids)))
+        f.write(ids.tobytes())
+        f.write(prices.tobytes())
+        f.write(updated.tobytes())
+        # Sur disque avant os.replace : un crash ne laisse jamais un fichier vide
+        f.flush()
+        os.fsync(f.fileno())
@@ -1,28 +1,73 @@
-from datetime import datetime, timedelta
+import os
+import time
+from datetime import UTC, datetime, timedelta
 
 from src.config import settings
+from src.core.price_table import PriceTable
+from src.core.probe import probe_cache
+from src.core.sqlite_store import SQLiteStore
 from src.core.store import JSONStore
 
 
+def _epoch(iso: str) -> float:
+    # updated_at historique : isoformat() naïf en UTC
+    ts = datetime.fromisoformat(iso)
+    return (ts if ts.tzinfo else ts.replace(tzinfo=UTC)).timestamp()
+
+
 class PricesCache:
-    def __init__(self, path: str):
+    def __init__(self, path: str, *, db: SQLiteStore | None = None):
+        # db : backend SQLite (lecture indexée par type_id, écriture d'une ligne).
+        # Sinon : table binaire mappée (prices.bin à côté de prices.json),
+        # alimentée une fois depuis l'ancien prices.json s'il existe.
         self.ttl = timedelta(days=settings.PRICE_TTL_DAYS)
-        self.store = JSONStore(path, {})
+        self.db = db
+        self.table: PriceTable | None = None
+        if db is None:
+            self.table = PriceTable(os.path.splitext(path)[0] + ".bin")
+            if not len(self.table) and os.path.exists(path):
+                self._import_json(path)
+        self.hits = 0
+        self.misses = 0
+
+    def _import_json(self, path: str) -> None:
+        assert self.table is not None
+        rows = [
+            (int(t), float(e["avg_price"]), _epoch(e["updated_at"]))
+            for t, e in JSONStore(path, {}).read().items()
+            if isinstance(e, dict) and "avg_price" in e and "updated_at" in e
+        ]
+        if rows:
+            self.table.set_many(rows)
+            stale = len(self.table.stale(time.time() - self.ttl.total_seconds()))
+            print(f"[prices] imported {len(rows)} prices from {path} ({stale} stale)")
+
+    def __len__(self) -> int:
+        if self.db is not None:
+            return self.db.prices_count()
+        assert self.table is not None
+        return len(self.table)
+
+    def _entry(self, type_id: int) -> tuple[float, float] | None:
+        if self.db is not None:
+            entry = self.db.price_get(type_id)
+            return (entry[0], _epoch(entry[1])) if entry else None
+        assert self.table is not None
+        return self.table.get(type_id)
 
     def get(self, type_id: int) -> float | None:
-        data = self.store.read()
-        entry = data.get(str(type_id))
-        if not entry:
-            return None
-        ts = datetime.fromisoformat(entry["updated_at"])
-        if datetime.utcnow() - ts > self.ttl:
+        entry = self._entry(type_id)
+        if not entry or time.time() - entry[1] > self.ttl.total_seconds():
+            self.misses += 1
+            probe_cache("prices", False)
             return None
-        return float(entry["avg_price"])
+        self.hits += 1
+        probe_cache("prices", True)
+        return entry[0]
 
     def set(self, type_id: int, avg_price: float):
-        data = self.store.read()
-        data[str(type_id)] = {
-            "avg_price": avg_price,
-            "updated_at": datetime.utcnow().isoformat(),
-        }
-        self.store.write(data)
+        if self.db is not None:
+            self.db.prices_set([(type_id, avg_price, datetime.utcnow().isoformat())])
+            return
+        assert self.table is not None
+        self.table.set(type_id, avg_price, time.time())
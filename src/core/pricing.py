@@ -1,3 +1,6 @@
+import asyncio
+from collections.abc import Iterable
+
 from src.core.models import Killmail
 from src.core.prices_cache import PricesCache
 from src.esi.market import fetch_price
@@ -36,3 +39,19 @@ async def compute_killmail_drop(km: Killmail, prices: PricesCache) -> float:
         if qty_drop > 0:
             total_drop += qty_drop * await get_price(item.item_type_id, prices)
     return total_drop
+
+
+async def prewarm_prices(
+    type_ids: Iterable[int], prices: PricesCache, *, concurrency: int = 4
+) -> None:
+    """Charge en parallèle les prix manquants (une seule requête par type_id)."""
+    sem = asyncio.Semaphore(concurrency)
+
+    async def _one(type_id: int) -> None:
+        async with sem:
+            try:
+                await get_price(type_id, prices)
+            except Exception as e:
+                print(f"[pricing] prewarm error for type {type_id}: {e}")
+
+    await asyncio.gather(*(_one(t) for t in set(type_ids) if prices.get(t) is None))
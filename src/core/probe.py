@@ -0,0 +1,81 @@
+from __future__ import annotations
+
+import time
+from collections import Counter
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+
+# Sonde active et étape en cours : propagées aux tâches créées dans le bloc
+# (contexte asyncio), donc le trafic concurrent du scheduler n'est pas compté
+_PROBE: ContextVar[Probe | None] = ContextVar("probe", default=None)
+_STEP: ContextVar[str] = ContextVar("probe_step", default="other")
+
+
+@dataclass
+class ProbeStep:
+    seconds: float = 0.0
+    calls: Counter[str] = field(default_factory=Counter)  # service amont -> requêtes
+    hits: Counter[str] = field(default_factory=Counter)  # cache -> hits
+    misses: Counter[str] = field(default_factory=Counter)  # cache -> misses
+
+
+class Probe:
+    """Mesure d'un passage dans le pipeline, étape par étape : temps mural,
+    requêtes amont (ESI, zKill) et accès aux caches (diagnostics /test_post_*)."""
+
+    def __init__(self) -> None:
+        self.steps: dict[str, ProbeStep] = {}
+        self.failed: str | None = None
+
+    def step(self, name: str) -> ProbeStep:
+        s = self.steps.get(name)
+        if s is None:
+            s = self.steps[name] = ProbeStep()
+        return s
+
+    @contextmanager
+    def active(self) -> Iterator[Probe]:
+        token = _PROBE.set(self)
+        try:
+            yield self
+        finally:
+            _PROBE.reset(token)
+
+    @contextmanager
+    def measure(self, name: str) -> Iterator[None]:
+        token = _STEP.set(name)
+        t0 = time.perf_counter()
+        try:
+            yield
+        except BaseException:
+            self.failed = self.failed or name
+            raise
+        finally:
+            self.step(name).seconds += time.perf_counter() - t0
+            _STEP.reset(token)
+
+
+@contextmanager
+def probe_step(name: str) -> Iterator[None]:
+    """Étape mesurée si une sonde est active (sinon sans effet)."""
+    probe = _PROBE.get()
+    if probe is None:
+        yield
+        return
+    with probe.measure(name):
+        yield
+
+
+def probe_call(service: str) -> None:
+    probe = _PROBE.get()
+    if probe is not None:
+        probe.step(_STEP.get()).calls[service] += 1
+
+
+def probe_cache(cache: str, hit: bool) -> None:
+    probe = _PROBE.get()
+    if probe is not None:
+        s = probe.step(_STEP.get())
+        (s.hits if hit else s.misses)[cache] += 1
@@ -1,11 +1,15 @@
 from __future__ import annotations
 
-from collections.abc import Awaitable, Callable, Iterable
+import asyncio
+from collections.abc import Awaitable, Callable, Iterable, Iterator
+from contextlib import contextmanager
 from dataclasses import dataclass
 from typing import Any
 
-import discord
-
+from src.core.latency import TRACES
+from src.core.metrics import METRICS
+from src.core.models import Attacker, Killmail
+from src.core.probe import probe_step
 from src.esi.killmails import fetch_killmail_details
 
 
@@ -13,27 +17,14 @@ def _lookup(name_map: dict[int, str], key: int | None) -> str | None:
     return name_map.get(key) if key else None
 
 
-@dataclass
-class PipelineContext:
-    # Services
-    esi: Any
-    prices: Any
-    channel: discord.abc.Messageable
-    settings: Any
-    # Helpers (callbacks)
-    resolve_names: Callable[[Any, Iterable[int]], Awaitable[list[dict]]]
-    get_region_id_for_system: Callable[[Any, int], Awaitable[int | None]]
-    compute_killmail_value: Callable[[Any, Any], Awaitable[float]]
-    compute_killmail_drop: Callable[[Any, Any], Awaitable[float]]
-    build_embed_insight5: Callable[..., Any]
-
+def _final_blow(km: Killmail) -> Attacker | None:
+    return next(
+        (a for a in km.attackers if a.final_blow), km.attackers[0] if km.attackers else None
+    )
 
-async def process_ref(ctx: PipelineContext, killmail_id: int, killmail_hash: str) -> None:
-    """Pipeline unique: ESI -> noms -> pricing -> embed -> post."""
-    km = await fetch_killmail_details(ctx.esi, killmail_id, killmail_hash)
-    is_kill = any(a.corporation_id == int(ctx.settings.CORPORATION_ID) for a in km.attackers)
 
-    # IDs à résoudre
+def _name_ids(km: Killmail) -> set[int]:
+    """IDs à résoudre pour l'embed (hors région)."""
     ids: set[int] = set()
     if km.victim.character_id:
         ids.add(km.victim.character_id)
@@ -41,7 +32,7 @@ async def process_ref(ctx: PipelineContext, killmail_id: int, killmail_hash: str
     if km.victim.alliance_id:
         ids.add(km.victim.alliance_id)
 
-    fb = next((a for a in km.attackers if a.final_blow), km.attackers[0] if km.attackers else None)
+    fb = _final_blow(km)
     if fb:
         if fb.character_id:
             ids.add(fb.character_id)
@@ -54,62 +45,294 @@ async def process_ref(ctx: PipelineContext, killmail_id: int, killmail_hash: str
 
     ids.add(km.victim.ship_type_id)
     ids.add(km.solar_system_id)
+    return ids
+
+
+# Histogramme de latence par étape de process_ref (voir src/core/metrics.py)
+STAGE = "killbot_stage_seconds"
+
+
+@contextmanager
+def _stage(name: str) -> Iterator[None]:
+    """Étape de process_ref : histogramme STAGE, et sonde de diagnostic si
+    active (src/core/probe.py)."""
+    with METRICS.time(STAGE, stage=name), probe_step(name):
+        yield
+
+
+@dataclass
+class PipelineContext:
+    # Services
+    esi: Any
+    prices: Any
+    outbound: Any
+    settings: Any
+    # Helpers (callbacks)
+    resolve_names: Callable[[Any, Iterable[int]], Awaitable[list[dict]]]
+    get_region_id_for_system: Callable[[Any, int], Awaitable[int | None]]
+    compute_killmail_value: Callable[[Any, Any], Awaitable[float]]
+    compute_killmail_drop: Callable[[Any, Any], Awaitable[float]]
+    build_embed_insight5: Callable[..., Any]
+    prewarm_prices: Callable[[Iterable[int], Any], Awaitable[None]] | None = None
+    # Noms déjà en cache, sans appel réseau (post provisoire)
+    peek_names: Callable[[Iterable[int]], dict[int, str]] | None = None
+    # Corporation suivie (tenant) ; défaut : settings.CORPORATION_ID
+    corporation_id: int | None = None
+    # outbound est un RoutedOutbound : submit() reçoit les faits du kill
+    routed: bool = False
+    # Archive locale des kills enrichis (src/core/archive.py), None = pas d'archive
+    archive: Any = None
+
+
+async def prewarm_refs(ctx: PipelineContext, refs: Iterable[tuple[int, str]]) -> None:
+    """Pré-chauffe les caches (détails, régions, noms, prix) pour un lot de refs.
+
+    Tout est fait en parallèle et en requêtes groupées, pour que process_ref
+    ne fasse ensuite plus que des lectures de cache. Tolérant aux erreurs :
+    process_ref refera l'appel manquant."""
+    refs = list(refs)
+    if not refs:
+        return
+    results = await asyncio.gather(
+        *(fetch_killmail_details(ctx.esi, km_id, km_hash) for km_id, km_hash in refs),
+        return_exceptions=True,
+    )
+    kms = [km for km in results if isinstance(km, Killmail)]
+    if not kms:
+        return
 
-    region_id = await ctx.get_region_id_for_system(ctx.esi, km.solar_system_id)
+    ids: set[int] = set()
+    regions = await asyncio.gather(
+        *(ctx.get_region_id_for_system(ctx.esi, s) for s in {km.solar_system_id for km in kms}),
+        return_exceptions=True,
+    )
+    ids |= {r for r in regions if isinstance(r, int)}
+    for km in kms:
+        ids |= _name_ids(km)
+    try:
+        await ctx.resolve_names(ctx.esi, ids)
+    except Exception as e:
+        print(f"[processor] prewarm resolve_names error: {e}")
+
+    if ctx.prewarm_prices is not None:
+        type_ids = {km.victim.ship_type_id for km in kms}
+        for km in kms:
+            type_ids |= {it.item_type_id for it in km.victim.items}
+        await ctx.prewarm_prices(type_ids, ctx.prices)
+
+
+def _names_kwargs(km: Killmail, name_map: dict[int, str], region_id: int | None) -> dict:
+    """Noms de l'embed (avec repli sur les IDs quand un nom manque)."""
+    fb = _final_blow(km)
     region_name = "Unknown Region"
+    if region_id:
+        region_name = name_map.get(region_id, region_name)
+    return {
+        "victim_name": _lookup(name_map, km.victim.character_id),
+        "victim_corp_name": _lookup(name_map, km.victim.corporation_id),
+        "victim_all_name": _lookup(name_map, km.victim.alliance_id),
+        "final_name": _lookup(name_map, fb.character_id if fb else None),
+        "final_corp_name": _lookup(name_map, fb.corporation_id if fb else None),
+        "final_all_name": _lookup(name_map, fb.alliance_id if fb else None),
+        "system_name": name_map.get(km.solar_system_id, f"System {km.solar_system_id}"),
+        "region_name": region_name,
+        "ship_name": name_map.get(km.victim.ship_type_id, f"Type {km.victim.ship_type_id}"),
+        "final_ship_name": _lookup(name_map, fb.ship_type_id if fb else None),
+        "region_id": region_id,
+    }
+
+
+async def enrich_killmail(ctx: PipelineContext, km: Killmail) -> dict:
+    """Région, noms et valeurs : arguments de build_embed_insight5 (et de
+    kill_record pour l'archive)."""
+    ids = _name_ids(km)
+    with _stage("region"):
+        region_id = await ctx.get_region_id_for_system(ctx.esi, km.solar_system_id)
     if region_id:
         ids.add(region_id)
 
     # Noms (tolérance aux erreurs)
     name_map: dict[int, str] = {}
     try:
-        names = await ctx.resolve_names(ctx.esi, ids)  # [{"id":..., "name":...}]
+        with _stage("names"):
+            names = await ctx.resolve_names(ctx.esi, ids)  # [{"id":..., "name":...}]
         for e in names:
             _id = e.get("id")
             _nm = e.get("name")
             if isinstance(_id, int) and isinstance(_nm, str):
                 name_map[_id] = _nm
-
-        system_name = name_map.get(km.solar_system_id, f"System {km.solar_system_id}")
-        ship_name = name_map.get(km.victim.ship_type_id, f"Type {km.victim.ship_type_id}")
-        final_ship_name = _lookup(name_map, fb.ship_type_id if fb else None)
-        victim_name = _lookup(name_map, km.victim.character_id)
-        victim_corp_name = _lookup(name_map, km.victim.corporation_id)
-        victim_all_name = _lookup(name_map, km.victim.alliance_id)
-        if region_id:
-            region_name = name_map.get(region_id, region_name)
     except Exception as e:
         import traceback
 
-        print(f"[processor] resolve_names error for killmail {killmail_id}: {e}")
+        print(f"[processor] resolve_names error for killmail {km.killmail_id}: {e}")
         print(f"[processor] traceback:\n{traceback.format_exc()}")
-        system_name = f"System {km.solar_system_id}"
-        ship_name = f"Type {km.victim.ship_type_id}"
-        final_ship_name = None
-        victim_name = None
-        victim_corp_name = None
-        victim_all_name = None
 
     # Pricing
-    total_value = await ctx.compute_killmail_value(km, ctx.prices)
-    dropped_value = await ctx.compute_killmail_drop(km, ctx.prices)
+    with _stage("pricing"):
+        total_value = await ctx.compute_killmail_value(km, ctx.prices)
+        dropped_value = await ctx.compute_killmail_drop(km, ctx.prices)
+    TRACES.enriched(km.killmail_id)
+    return {
+        **_names_kwargs(km, name_map, region_id),
+        "total_value": total_value,
+        "dropped_value": dropped_value,
+    }
+
+
+async def _enrich_and_record(
+    ctx: PipelineContext, km: Killmail, record: asyncio.Future | None
+) -> dict:
+    """Enrichit le kill et résout `record` avec sa ligne d'archive (None si
+    l'enrichissement échoue) : l'appelant l'archive une fois le post accepté."""
+    try:
+        kwargs = await enrich_killmail(ctx, km)
+    except BaseException:
+        if record is not None and not record.done():
+            record.set_result(None)
+        raise
+    if record is not None and not record.done():
+        record.set_result(kill_record(ctx, km, kwargs) if ctx.archive is not None else None)
+    return kwargs
+
+
+def _is_kill(ctx: PipelineContext, km: Killmail) -> bool:
+    corp_id = ctx.corporation_id or int(ctx.settings.CORPORATION_ID)
+    return any(a.corporation_id == corp_id for a in km.attackers)
+
+
+def _render(ctx: PipelineContext, km: Killmail, kwargs: dict) -> Any:
+    return ctx.build_embed_insight5(km, is_kill=_is_kill(ctx, km), **kwargs)
+
+
+def kill_facts(ctx: PipelineContext, km: Killmail, kwargs: dict) -> dict[str, Any]:
+    """Faits évalués par les règles de routage (une fois par kill)."""
+    return {
+        "is_kill": _is_kill(ctx, km),
+        "total_value": kwargs.get("total_value"),
+        "ship_type_id": km.victim.ship_type_id,
+        "region_id": kwargs.get("region_id"),
+        "system_id": km.solar_system_id,
+        "solo": km.involved_count() == 1,
+    }
+
+
+def kill_record(ctx: PipelineContext, km: Killmail, kwargs: dict) -> dict[str, Any]:
+    """Ligne d'archive d'un kill enrichi (IDs et valeurs, sans les noms) ;
+    `attackers` alimente les index de /search."""
+    fb = _final_blow(km)
+    return {
+        "killmail_id": km.killmail_id,
+        "killmail_hash": km.killmail_hash,
+        "time": int(km.killmail_time.timestamp()),
+        "solar_system_id": km.solar_system_id,
+        "region_id": kwargs.get("region_id"),
+        "ship_type_id": km.victim.ship_type_id,
+        "victim_character_id": km.victim.character_id,
+        "victim_corporation_id": km.victim.corporation_id,
+        "victim_alliance_id": km.victim.alliance_id,
+        "final_character_id": fb.character_id if fb else None,
+        "final_corporation_id": fb.corporation_id if fb else None,
+        "final_alliance_id": fb.alliance_id if fb else None,
+        "final_ship_type_id": fb.ship_type_id if fb else None,
+        "total_value": kwargs.get("total_value"),
+        "dropped_value": kwargs.get("dropped_value"),
+        "is_kill": _is_kill(ctx, km),
+        # Pour les index de /search (hors colonnes de l'archive)
+        "attackers": [
+            (a.character_id, a.corporation_id, a.alliance_id, a.ship_type_id) for a in km.attackers
+        ],
+    }
+
+
+def submit_killmail(
+    ctx: PipelineContext,
+    km: Killmail,
+    kwargs: dict,
+    *,
+    meta: dict[str, Any] | None,
+    editable: bool = False,
+) -> asyncio.Future:
+    # Rendu une seule fois, quel que soit le nombre de channels ciblés
+    extra: dict[str, Any] = {"editable": True} if editable else {}
+    with _stage("render"):
+        if ctx.routed:
+            extra["facts"] = kill_facts(ctx, km, kwargs)
+        return ctx.outbound.submit(_render(ctx, km, kwargs), meta=meta, **extra)
+
+
+def _with_record(
+    meta: dict[str, Any] | None, record: asyncio.Future | None
+) -> dict[str, Any] | None:
+    if meta is None or record is None or not record.done() or record.result() is None:
+        return meta
+    return {**meta, "record": record.result()}
+
+
+# Références fortes vers les complétions de posts provisoires (sinon GC possible)
+_completions: set[asyncio.Task] = set()
+
+
+async def _complete_provisional(
+    ctx: PipelineContext, km: Killmail, enrich: asyncio.Task, delivery: asyncio.Future
+) -> None:
+    try:
+        kwargs = await enrich
+    except Exception as e:
+        print(
+            f"[processor] enrichment error for killmail {km.killmail_id}"
+            f" (provisional post kept): {e}"
+        )
+        ctx.outbound.forget(delivery)
+        return
+    await ctx.outbound.edit(delivery, _render(ctx, km, kwargs))
+
+
+async def process_ref(
+    ctx: PipelineContext,
+    killmail_id: int,
+    killmail_hash: str,
+    *,
+    meta: dict[str, Any] | None = None,
+    record: asyncio.Future | None = None,
+) -> asyncio.Future:
+    """Pipeline unique: ESI -> noms -> pricing -> embed -> file d'envoi.
+
+    Retourne le Future de l'envoi Discord (résolu quand le message est accepté).
+    `meta` rend l'envoi durable (outbox) et est rendu au redémarrage.
+    `record` reçoit la ligne d'archive du kill (None sans archive) : rien
+    n'est archivé ici, l'appelant le fait après acceptation du post. Quand elle
+    est prête avant l'envoi, elle est aussi jointe aux `meta` (clé "record")
+    pour qu'un post rejoué depuis l'outbox soit archivé à son tour.
+
+    Avec DISCORD_PROVISIONAL_POST, si l'enrichissement ne finit pas dans la
+    fenêtre de grâce, un embed provisoire (noms en cache, "valuing…") est posté
+    dès les détails du kill connus, puis édité une fois noms et valeurs prêts."""
+    with _stage("details"):
+        km = await fetch_killmail_details(ctx.esi, killmail_id, killmail_hash)
+    TRACES.details(killmail_id, km.killmail_time)
+    provisional = getattr(ctx.settings, "DISCORD_PROVISIONAL_POST", False)
+    if ctx.routed and getattr(ctx.outbound, "needs_enrichment", False):
+        provisional = False  # règles sur la valeur/région : routage après enrichissement
+    if not provisional:
+        kwargs = await _enrich_and_record(ctx, km, record)
+        return submit_killmail(ctx, km, kwargs, meta=_with_record(meta, record))
+
+    enrich = asyncio.create_task(_enrich_and_record(ctx, km, record))
+    grace = max(0, int(getattr(ctx.settings, "DISCORD_PROVISIONAL_GRACE_MS", 0))) / 1000
+    done, _ = await asyncio.wait({enrich}, timeout=grace)
+    if done:
+        # Caches chauds : le post final part directement, sans édition
+        return submit_killmail(ctx, km, enrich.result(), meta=_with_record(meta, record))
 
-    # Embed + post
-    embed = ctx.build_embed_insight5(
+    name_map = ctx.peek_names(_name_ids(km)) if ctx.peek_names is not None else {}
+    delivery = submit_killmail(
+        ctx,
         km,
-        victim_name=victim_name,
-        victim_corp_name=victim_corp_name,
-        victim_all_name=victim_all_name,
-        final_name=(fb and fb.character_id and name_map.get(fb.character_id)) or None,
-        final_corp_name=(fb and fb.corporation_id and name_map.get(fb.corporation_id)) or None,
-        final_all_name=(fb and fb.alliance_id and name_map.get(fb.alliance_id)) or None,
-        system_name=system_name,
-        region_name=region_name,
-        ship_name=ship_name,
-        final_ship_name=final_ship_name,
-        total_value=total_value,
-        is_kill=is_kill,
-        region_id=region_id,
-        dropped_value=dropped_value,
+        {**_names_kwargs(km, name_map, None), "total_value": None, "dropped_value": None},
+        meta=meta,
+        editable=True,
     )
-    await ctx.channel.send(embed=embed)
+    task = asyncio.create_task(_complete_provisional(ctx, km, enrich, delivery))
+    _completions.add(task)
+    task.add_done_callback(_completions.discard)
+    return delivery
@@ -0,0 +1,94 @@
+from __future__ import annotations
+
+import asyncio
+import cProfile
+import io
+import pstats
+import time
+import tracemalloc
+
+# Événements comptés par une capture : cycles de poll ESI ou runs de process_ref
+TARGETS = ("poll", "process")
+MAX_COUNT = 50
+TOP_FUNCTIONS = 40
+TOP_ALLOCATIONS = 25
+
+
+class ProfileCapture:
+    """Capture cProfile + tracemalloc le temps des N prochains événements.
+
+    Le profiler est global au thread de la boucle : pendant la capture, tout
+    ce qui tourne (polls, zKill, envois) est mesuré, la fenêtre est seulement
+    délimitée par les N événements `target`. Hors capture, tick() ne coûte
+    qu'un test d'attribut."""
+
+    def __init__(self) -> None:
+        self.active: _Session | None = None
+
+    def start(self, target: str, count: int) -> asyncio.Future:
+        """Démarre une capture ; le Future renvoie le rapport texte."""
+        if target not in TARGETS:
+            raise ValueError(f"target must be one of {', '.join(TARGETS)}")
+        if self.active is not None:
+            raise RuntimeError("a profile capture is already running")
+        self.active = _Session(target, max(1, min(MAX_COUNT, count)))
+        return self.active.done
+
+    def tick(self, target: str) -> None:
+        session = self.active
+        if session is None or session.target != target:
+            return
+        session.seen += 1
+        if session.seen >= session.count:
+            self.stop()
+
+    def stop(self) -> None:
+        """Termine la capture en cours (aussi sur timeout : rapport partiel)."""
+        session, self.active = self.active, None
+        if session is not None:
+            session.finish()
+
+
+class _Session:
+    def __init__(self, target: str, count: int):
+        self.target = target
+        self.count = count
+        self.seen = 0
+        self.done: asyncio.Future = asyncio.get_running_loop().create_future()
+        self._t0 = time.perf_counter()
+        # tracemalloc déjà actif (PYTHONTRACEMALLOC) : on ne l'arrête pas
+        self._own_tracemalloc = not tracemalloc.is_tracing()
+        if self._own_tracemalloc:
+            tracemalloc.start()
+        self._profile = cProfile.Profile()
+        self._profile.enable()
+
+    def finish(self) -> None:
+        self._profile.disable()
+        snapshot = tracemalloc.take_snapshot()
+        if self._own_tracemalloc:
+            tracemalloc.stop()
+        if not self.done.done():
+            self.done.set_result(self._report(snapshot))
+
+    def _report(self, snapshot: tracemalloc.Snapshot) -> str:
+        out = io.StringIO()
+        elapsed = time.perf_counter() - self._t0
+        out.write(f"profile: {self.seen}/{self.count} {self.target} event(s) in {elapsed:.1f}s\n\n")
+        out.write(f"== top {TOP_FUNCTIONS} functions by cumulative time ==\n")
+        stats = pstats.Stats(self._profile, stream=out)
+        stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(TOP_FUNCTIONS)
+
+        out.write(f"\n== top {TOP_ALLOCATIONS} allocation sites (live at end of capture) ==\n")
+        snapshot = snapshot.filter_traces(
+            [
+                tracemalloc.Filter(False, tracemalloc.__file__),
+                tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+            ]
+        )
+        for stat in snapshot.statistics("lineno")[:TOP_ALLOCATIONS]:
+            out.write(f"{stat}\n")
+        return out.getvalue()
+
+
+PROFILER = ProfileCapture()
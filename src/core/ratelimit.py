@@ -0,0 +1,31 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from collections import deque
+
+
+class RateLimiter:
+    """Fenêtre glissante : au plus `rate` acquisitions par `per` secondes.
+
+    Chaque consommateur (pipeline live, backfill) a sa propre instance : un
+    gros rattrapage ne consomme jamais le budget du polling."""
+
+    def __init__(self, rate: int, per: float = 1.0):
+        self.rate = max(1, int(rate))
+        self.per = per
+        self._stamps: deque[float] = deque()
+        self._lock = asyncio.Lock()
+
+    def _trim(self, now: float) -> None:
+        while self._stamps and self._stamps[0] <= now - self.per:
+            self._stamps.popleft()
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            now = time.monotonic()
+            self._trim(now)
+            if len(self._stamps) >= self.rate:
+                await asyncio.sleep(self.per - (now - self._stamps[0]))
+                self._trim(time.monotonic())
+            self._stamps.append(time.monotonic())
@@ -0,0 +1,160 @@
+from __future__ import annotations
+
+from array import array
+from bisect import bisect_left, insort
+from heapq import merge
+from typing import Any
+
+from src.core.columns import append_columns, read_columns, truncate_columns
+
+# Critères de /search et rôle dans le kill -> code du champ indexé
+FIELDS: dict[tuple[str, str], int] = {
+    ("pilot", "victim"): 1,
+    ("pilot", "attacker"): 2,
+    ("corp", "victim"): 3,
+    ("corp", "attacker"): 4,
+    ("alliance", "victim"): 5,
+    ("alliance", "attacker"): 6,
+    ("ship", "victim"): 7,
+    ("ship", "attacker"): 8,
+    ("system", "victim"): 9,  # le lieu du kill, quel que soit le rôle demandé
+}
+CRITERIA = ("pilot", "corp", "alliance", "ship", "system")
+ROLES = ("any", "victim", "attacker")
+# Une entrée de posting sur disque : terme (champ << 32 | ID) et killmail
+POSTING_COLUMNS = {"term": "q", "killmail_id": "q"}
+_VICTIM = {
+    "pilot": "victim_character_id",
+    "corp": "victim_corporation_id",
+    "alliance": "victim_alliance_id",
+    "ship": "ship_type_id",
+    "system": "solar_system_id",
+}
+# Repli sans liste d'attaquants (ancienne archive) : le coup final seulement
+_FINAL = {
+    "pilot": "final_character_id",
+    "corp": "final_corporation_id",
+    "alliance": "final_alliance_id",
+    "ship": "final_ship_type_id",
+}
+
+
+def _term(code: int, entity: int) -> int:
+    return code << 32 | entity
+
+
+def kill_terms(record: dict[str, Any]) -> set[int]:
+    """Termes indexés d'un kill (ligne processor.kill_record) : victime,
+    chaque attaquant (`attackers` : tuples personnage/corp/alliance/vaisseau)
+    et système."""
+    terms = {
+        _term(FIELDS[(name, "victim")], int(record[key]))
+        for name, key in _VICTIM.items()
+        if record.get(key)
+    }
+    attackers = record.get("attackers")
+    if attackers is None:
+        attackers = [tuple(record.get(key) for key in _FINAL.values())]
+    for attacker in attackers:
+        for name, entity in zip(_FINAL, attacker, strict=True):
+            if entity:
+                terms.add(_term(FIELDS[(name, "attacker")], int(entity)))
+    return terms
+
+
+def _contains(posting: array[Any], km_id: int) -> bool:
+    i = bisect_left(posting, km_id)
+    return i < len(posting) and posting[i] == km_id
+
+
+class SearchIndex:
+    """Index inversés (personnage, corp, alliance, vaisseau, système) ->
+    killmail IDs, tenus à jour à chaque kill archivé.
+
+    Chaque posting list est un array trié de killmail IDs ; une recherche à
+    plusieurs critères parcourt la plus courte depuis la fin (IDs les plus
+    récents) et teste l'appartenance aux autres par dichotomie, en s'arrêtant
+    dès `limit` résultats. Sur disque : un journal en ajout seul de paires
+    (terme, killmail), écrit avec l'archive."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.postings: dict[int, array[Any]] = {}
+        self.pending: list[tuple[int, int]] = []
+        self._load()
+
+    def __len__(self) -> int:
+        return sum(map(len, self.postings.values()))
+
+    def _load(self) -> None:
+        cols = read_columns(self.directory, POSTING_COLUMNS)
+        truncate_columns(self.directory, POSTING_COLUMNS, len(cols["term"]))
+        lists: dict[int, list[int]] = {}
+        for term, km_id in zip(cols["term"], cols["killmail_id"], strict=True):
+            lists.setdefault(term, []).append(km_id)
+        for term, ids in lists.items():
+            ids.sort()  # rattrapages (backfill) : ordre d'arrivée sur disque
+            self.postings[term] = array("q", ids)
+
+    def add(self, record: dict[str, Any]) -> None:
+        km_id = int(record["killmail_id"])
+        for term in kill_terms(record):
+            posting = self.postings.get(term)
+            if posting is None:
+                self.postings[term] = array("q", [km_id])
+            elif posting[-1] < km_id:
+                posting.append(km_id)  # cas du live : ID plus récent
+            else:
+                insort(posting, km_id)
+            self.pending.append((term, km_id))
+
+    def take(self) -> list[tuple[int, int]]:
+        pending, self.pending = self.pending, []
+        return pending
+
+    def write(self, pending: list[tuple[int, int]]) -> None:
+        if pending:
+            append_columns(
+                self.directory,
+                POSTING_COLUMNS,
+                {"term": (t for t, _ in pending), "killmail_id": (k for _, k in pending)},
+            )
+
+    def query(self, criteria: dict[str, int], *, role: str = "any", limit: int = 10) -> list[int]:
+        """Killmail IDs (plus récents d'abord) satisfaisant tous les critères.
+
+        `criteria` : {critère de CRITERIA: ID} ; `role` s'applique aux critères
+        personnage/corp/alliance/vaisseau ("any" = victime ou attaquant)."""
+        if role not in ROLES:
+            raise ValueError(f"unknown role {role!r} (expected {', '.join(ROLES)})")
+        if not criteria:
+            return []
+        alternatives: list[list[array[Any]]] = []
+        for name, entity in criteria.items():
+            if name not in CRITERIA:
+                raise ValueError(f"unknown criterion {name!r} (expected {', '.join(CRITERIA)})")
+            if name == "system":
+                roles: tuple[str, ...] = ("victim",)
+            else:
+                roles = ("victim", "attacker") if role == "any" else (role,)
+            alts = [
+                posting
+                for r in roles
+                if (posting := self.postings.get(_term(FIELDS[(name, r)], int(entity))))
+            ]
+            if not alts:
+                return []
+            alternatives.append(alts)
+        alternatives.sort(key=lambda alts: sum(map(len, alts)))
+        driver, others = alternatives[0], alternatives[1:]
+        out: list[int] = []
+        previous = None
+        for km_id in merge(*(reversed(p) for p in driver), reverse=True):
+            if km_id == previous:
+                continue
+            previous = km_id
+            if all(any(_contains(p, km_id) for p in alts) for alts in others):
+                out.append(km_id)
+                if len(out) >= limit:
+                    break
+        return out
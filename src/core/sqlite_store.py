@@ -0,0 +1,233 @@
+from __future__ import annotations
+
+import json
+import os
+import sqlite3
+import time
+from collections.abc import Iterable, Iterator
+from contextlib import contextmanager
+from typing import Any
+
+DB_FILENAME = "killbot.sqlite3"
+SCHEMA_VERSION = 1
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS kills (
+    tenant TEXT NOT NULL,
+    id INTEGER NOT NULL,
+    hash TEXT NOT NULL,
+    posted_at REAL NOT NULL,
+    PRIMARY KEY (tenant, id, hash)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS prices (
+    type_id INTEGER PRIMARY KEY,
+    avg_price REAL NOT NULL,
+    updated_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS names (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    category TEXT,
+    seen_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS names_seen_at ON names (seen_at);
+CREATE TABLE IF NOT EXISTS state (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS zkb_submissions (
+    id INTEGER NOT NULL,
+    hash TEXT NOT NULL,
+    status INTEGER NOT NULL,
+    submitted_at REAL NOT NULL,
+    PRIMARY KEY (id, hash)
+) WITHOUT ROWID;
+"""
+
+
+class SQLiteStore:
+    """Stockage SQLite unique (mode WAL) : index des kills (par tenant), prix,
+    noms, état du scheduler et soumissions zKill.
+
+    Lectures indexées et écritures par ligne (ou par lot dans une seule
+    transaction) : le coût ne grandit plus avec l'historique, contrairement
+    aux documents JSON réécrits en entier. Les appels sont synchrones et
+    courts ; une seule connexion, utilisée depuis la boucle asyncio."""
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        self._conn.execute(
+            "INSERT OR IGNORE INTO state (key, value) VALUES ('schema_version', ?)",
+            (json.dumps(SCHEMA_VERSION),),
+        )
+
+    def close(self) -> None:
+        self._conn.close()
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        """Lot d'écritures atomique (un seul fsync en WAL)."""
+        self._conn.execute("BEGIN")
+        try:
+            yield self._conn
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+        self._conn.execute("COMMIT")
+
+    # --- index des kills ---
+
+    def kills_load(self, tenant: str) -> list[tuple[int, str]]:
+        rows = self._conn.execute("SELECT id, hash FROM kills WHERE tenant = ?", (tenant,))
+        return [(int(i), str(h)) for i, h in rows]
+
+    def kills_add(self, tenant: str, keys: Iterable[tuple[int, str]]) -> None:
+        now = time.time()
+        with self.transaction() as c:
+            c.executemany(
+                "INSERT OR IGNORE INTO kills (tenant, id, hash, posted_at) VALUES (?, ?, ?, ?)",
+                ((tenant, int(i), str(h), now) for i, h in keys),
+            )
+
+    def kills_expire_below(self, tenant: str, watermark: int) -> int:
+        cur = self._conn.execute(
+            "DELETE FROM kills WHERE tenant = ? AND id < ?", (tenant, int(watermark))
+        )
+        return cur.rowcount
+
+    # --- prix ---
+
+    def price_get(self, type_id: int) -> tuple[float, str] | None:
+        row = self._conn.execute(
+            "SELECT avg_price, updated_at FROM prices WHERE type_id = ?", (int(type_id),)
+        ).fetchone()
+        return (float(row[0]), str(row[1])) if row else None
+
+    def prices_set(self, rows: Iterable[tuple[int, float, str]]) -> None:
+        with self.transaction() as c:
+            c.executemany(
+                "INSERT OR REPLACE INTO prices (type_id, avg_price, updated_at) VALUES (?, ?, ?)",
+                ((int(t), float(p), str(u)) for t, p, u in rows),
+            )
+
+    def prices_count(self) -> int:
+        return int(self._conn.execute("SELECT COUNT(*) FROM prices").fetchone()[0])
+
+    # --- noms ---
+
+    def names_put(self, entries: Iterable[dict]) -> None:
+        now = time.time()
+        with self.transaction() as c:
+            c.executemany(
+                "INSERT OR REPLACE INTO names (id, name, category, seen_at) VALUES (?, ?, ?, ?)",
+                (
+                    (int(e["id"]), str(e["name"]), e.get("category"), now)
+                    for e in entries
+                    if "id" in e and "name" in e
+                ),
+            )
+
+    def names_recent(self, limit: int) -> list[dict]:
+        """Les `limit` noms vus le plus récemment, du plus ancien au plus récent."""
+        rows = self._conn.execute(
+            "SELECT id, name, category FROM names ORDER BY seen_at DESC LIMIT ?", (int(limit),)
+        ).fetchall()
+        return [
+            {"id": int(i), "name": n, **({"category": c} if c else {})}
+            for i, n, c in reversed(rows)
+        ]
+
+    # --- état (documents JSON par clé) ---
+
+    def state_get(self, key: str, default: Any = None) -> Any:
+        row = self._conn.execute("SELECT value FROM state WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def state_set(self, key: str, value: Any) -> None:
+        self._conn.execute(
+            "INSERT OR REPLACE INTO state (key, value) VALUES (?, ?)", (key, json.dumps(value))
+        )
+
+    # --- soumissions zKill ---
+
+    def zkb_submitted(self, km_id: int, km_hash: str) -> bool:
+        row = self._conn.execute(
+            "SELECT 1 FROM zkb_submissions WHERE id = ? AND hash = ? AND status < 400",
+            (int(km_id), str(km_hash)),
+        ).fetchone()
+        return row is not None
+
+    def zkb_record(self, km_id: int, km_hash: str, status: int) -> None:
+        self._conn.execute(
+            "INSERT OR REPLACE INTO zkb_submissions (id, hash, status, submitted_at)"
+            " VALUES (?, ?, ?, ?)",
+            (int(km_id), str(km_hash), int(status), time.time()),
+        )
+
+
+# Une connexion par fichier (partagée entre tenants et caches)
+_STORES: dict[str, SQLiteStore] = {}
+
+
+def open_store(data_dir: str) -> SQLiteStore:
+    path = os.path.join(data_dir, DB_FILENAME)
+    store = _STORES.get(path)
+    if store is None:
+        store = _STORES[path] = SQLiteStore(path)
+    return store
+
+
+def migrate_json(
+    store: SQLiteStore, *, tenant: str, index_path: str, prices_path: str, state_path: str
+) -> dict[str, int]:
+    """Import unique des fichiers JSON existants (index, prix, snapshot).
+
+    Idempotent : marqué fait dans la table state par tenant (les prix ne sont
+    importés qu'une fois, par le premier tenant). Les fichiers JSON sont
+    laissés en place (retour arrière possible avec STORAGE_BACKEND=json)."""
+    done_key = f"migrated:{tenant}"
+    if store.state_get(done_key):
+        return {}
+    counts = {"kills": 0, "prices": 0, "names": 0, "state": 0}
+
+    index = _read_json(index_path, [])
+    keys = [(int(x["id"]), str(x["hash"])) for x in index if "id" in x and "hash" in x]
+    store.kills_add(tenant, keys)
+    counts["kills"] = len(keys)
+
+    if not store.state_get("migrated:prices"):
+        prices = _read_json(prices_path, {})
+        rows = [
+            (int(t), float(e["avg_price"]), str(e["updated_at"]))
+            for t, e in prices.items()
+            if isinstance(e, dict) and "avg_price" in e and "updated_at" in e
+        ]
+        store.prices_set(rows)
+        counts["prices"] = len(rows)
+        store.state_set("migrated:prices", True)
+
+    snap = _read_json(state_path, {})
+    if isinstance(snap, dict) and snap:
+        names = (snap.get("caches") or {}).get("names") or []
+        store.names_put(names)
+        counts["names"] = len(names)
+        store.state_set(f"snapshot:{tenant}", snap)
+        counts["state"] = 1
+
+    store.state_set(done_key, True)
+    if any(counts.values()):
+        print(f"[storage] migrated JSON files to SQLite for {tenant}: {counts}")
+    return counts
+
+
+def _read_json(path: str, default: Any) -> Any:
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return default
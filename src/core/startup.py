@@ -0,0 +1,53 @@
+from __future__ import annotations
+
+import time
+
+# Référence : premier import de ce module (tout début de src.bot)
+_T0 = time.perf_counter()
+
+
+class StartupTimer:
+    """Chronométrage des phases de démarrage (imports, stores, gateway, 1er poll).
+
+    Chaque phase est horodatée par rapport au lancement ; les phases peuvent se
+    chevaucher (le poll peut démarrer avant la gateway), le rapport les liste
+    dans l'ordre où elles se sont terminées."""
+
+    def __init__(self, t0: float = _T0):
+        self.t0 = t0
+        self.marks: list[tuple[str, float]] = []
+        self.reported = False
+        # Phases attendues avant d'afficher le rapport (voir wait_for)
+        self.required: set[str] = set()
+
+    def wait_for(self, *phases: str) -> None:
+        """Déclare des phases à attendre avant le rapport (ex. la gateway)."""
+        self.required.update(phases)
+
+    def mark(self, phase: str) -> float:
+        """Marque la fin d'une phase (une seule fois par nom). Retourne t depuis t0."""
+        elapsed = time.perf_counter() - self.t0
+        if not any(name == phase for name, _ in self.marks):
+            self.marks.append((phase, elapsed))
+        return elapsed
+
+    def report(self) -> str:
+        lines = ["[startup] timing breakdown:"]
+        prev = 0.0
+        for name, at in self.marks:
+            lines.append(f"[startup]   {name:<16} +{(at - prev) * 1000:8.1f} ms  (t={at:.3f}s)")
+            prev = at
+        return "\n".join(lines)
+
+    def report_once(self, *required: str) -> None:
+        """Affiche le rapport une seule fois, dès que toutes les phases
+        `required` et celles de wait_for() sont marquées (à appeler depuis
+        chacune d'elles)."""
+        done = {name for name, _ in self.marks}
+        if self.reported or not done.issuperset(self.required.union(required)):
+            return
+        self.reported = True
+        print(self.report())
+
+
+STARTUP = StartupTimer()
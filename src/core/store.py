@@ -1,26 +1,100 @@
+import asyncio
+import copy
 import json
 import os
+import threading
 from typing import Any
 
+import orjson
+
+# Délai de regroupement des écritures (une rafale de kills = une écriture)
+WRITE_DELAY_S = 0.5
+
+_NOTHING = object()
+
 
 class JSONStore:
-    """Safe JSON file store with atomic writes."""
+    """Safe JSON file store with atomic writes.
+
+    Le fichier est lu une fois ; `read()` sert la copie mémoire. `save()` ne
+    fait aucune I/O dans la boucle : l'écriture est regroupée (WRITE_DELAY_S)
+    puis sérialisée et écrite dans un thread (fichier temporaire, fsync,
+    os.replace). `save()` prend possession de `data` : l'appelant passe une
+    copie qu'il ne modifie plus."""
 
     def __init__(self, path: str, default: Any):
         self.path = path
         self.default = default
+        self._data: Any = _NOTHING
+        self._pending: Any = _NOTHING
+        self._task: asyncio.Task | None = None
+        # Numéro de version : une écriture plus ancienne n'écrase jamais une récente
+        self._seq = 0
+        self._written = 0
+        self._io_lock = threading.Lock()
         if not os.path.exists(path):
             self.write(default)
 
     def read(self) -> Any:
+        if self._data is _NOTHING:
+            try:
+                with open(self.path, encoding="utf-8") as f:
+                    self._data = json.load(f)
+            except Exception:
+                return copy.deepcopy(self.default)
+        return self._data
+
+    def save(self, data: Any) -> None:
+        """Met à jour la copie mémoire et programme l'écriture en arrière-plan.
+        Sans boucle asyncio active (arrêt, scripts), écrit immédiatement."""
         try:
-            with open(self.path, encoding="utf-8") as f:
-                return json.load(f)
-        except Exception:
-            return self.default
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.write(data)
+            return
+        self._data = data
+        self._seq += 1
+        self._pending = (self._seq, data)
+        if self._task is None or self._task.done():
+            self._task = loop.create_task(self._flush_later())
+
+    async def flush(self) -> None:
+        """Attend que l'écriture en attente soit sur disque."""
+        while self._task is not None and not self._task.done():
+            await asyncio.shield(self._task)
+
+    async def _flush_later(self) -> None:
+        try:
+            await asyncio.sleep(WRITE_DELAY_S)
+            while self._pending is not _NOTHING:
+                pending, self._pending = self._pending, _NOTHING
+                try:
+                    await asyncio.to_thread(self._write_file, *pending)
+                except Exception as e:
+                    print(f"[store] write error for {self.path}: {e}")
+        except asyncio.CancelledError:
+            # Arrêt de la boucle : on écrit ce qui reste avant de sortir
+            pending, self._pending = self._pending, _NOTHING
+            if pending is not _NOTHING:
+                self._write_file(*pending)
+            raise
 
     def write(self, data: Any) -> None:
-        tmp = f"{self.path}.tmp"
-        with open(tmp, "w", encoding="utf-8") as f:
-            json.dump(data, f, indent=2)
-        os.replace(tmp, self.path)
+        """Écriture immédiate et synchrone (démarrage / arrêt)."""
+        self._data = data
+        self._pending = _NOTHING
+        self._seq += 1
+        self._write_file(self._seq, data)
+
+    def _write_file(self, seq: int, data: Any) -> None:
+        payload = orjson.dumps(data, option=orjson.OPT_INDENT_2)
+        with self._io_lock:
+            if seq < self._written:
+                return
+            self._written = seq
+            tmp = f"{self.path}.tmp"
+            with open(tmp, "wb") as f:
+                f.write(payload)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self.path)
@@ -0,0 +1,94 @@
+from __future__ import annotations
+
+import json
+import os
+from dataclasses import dataclass, field
+from typing import Any
+
+DATA_DIR = "data"
+
+
+@dataclass
+class Tenant:
+    """Une corporation suivie : son token, son channel et ses fichiers d'état.
+
+    Les caches (prix, noms, univers, détails de killmails) sont partagés entre
+    tenants ; l'index, l'outbox et le snapshot sont propres à chacun."""
+
+    name: str
+    corporation_id: int
+    refresh_token: str
+    channel_id: int = 0
+    webhook_url: str = ""
+    data_dir: str = DATA_DIR
+    # Tokens supplémentaires (autres directeurs) pollés en décalé de phase
+    extra_refresh_tokens: list[str] = field(default_factory=list)
+    # Règles de routage vers d'autres channels (voir src/botui/routing.py)
+    routes: list[dict] = field(default_factory=list)
+
+    def path(self, filename: str) -> str:
+        return os.path.join(self.data_dir, filename)
+
+
+def load_tenants(settings: Any) -> list[Tenant]:
+    """Tenants déclarés dans TENANTS_FILE, sinon un tenant unique issu du .env.
+
+    TENANTS_FILE est une liste JSON d'objets {name, corporation_id,
+    refresh_token, channel_id | webhook_url, extra_refresh_tokens?, routes?}.
+    Chaque tenant a ses fichiers dans data/tenants/<name>/ ; le tenant unique
+    garde ceux de data/ (et ses routes viennent de ROUTES_FILE)."""
+    path = getattr(settings, "TENANTS_FILE", "")
+    if not path:
+        return [
+            Tenant(
+                name="default",
+                corporation_id=int(settings.CORPORATION_ID or 0),
+                refresh_token=settings.EVE_REFRESH_TOKEN,
+                channel_id=int(settings.DISCORD_CHANNEL_ID or 0),
+                webhook_url=getattr(settings, "DISCORD_WEBHOOK_URL", ""),
+                extra_refresh_tokens=_split_tokens(
+                    getattr(settings, "EVE_EXTRA_REFRESH_TOKENS", "")
+                ),
+                routes=_load_routes(getattr(settings, "ROUTES_FILE", "")),
+            )
+        ]
+
+    with open(path, encoding="utf-8") as f:
+        raw = json.load(f)
+    if not isinstance(raw, list) or not raw:
+        raise ValueError(f"{path}: expected a non-empty JSON list of tenants")
+
+    tenants: list[Tenant] = []
+    for entry in raw:
+        name = str(entry.get("name") or entry["corporation_id"])
+        if any(t.name == name for t in tenants):
+            raise ValueError(f"{path}: duplicate tenant name {name!r}")
+        if not entry.get("channel_id") and not entry.get("webhook_url") and not entry.get("routes"):
+            raise ValueError(f"{path}: tenant {name!r} needs a channel_id or a webhook_url")
+        tenants.append(
+            Tenant(
+                name=name,
+                corporation_id=int(entry["corporation_id"]),
+                refresh_token=str(entry["refresh_token"]),
+                channel_id=int(entry.get("channel_id") or 0),
+                webhook_url=str(entry.get("webhook_url") or ""),
+                data_dir=os.path.join(DATA_DIR, "tenants", name),
+                extra_refresh_tokens=[str(t) for t in entry.get("extra_refresh_tokens") or []],
+                routes=list(entry.get("routes") or []),
+            )
+        )
+    return tenants
+
+
+def _split_tokens(raw: str) -> list[str]:
+    return [t.strip() for t in raw.split(",") if t.strip()]
+
+
+def _load_routes(path: str) -> list[dict]:
+    if not path:
+        return []
+    with open(path, encoding="utf-8") as f:
+        routes = json.load(f)
+    if not isinstance(routes, list):
+        raise ValueError(f"{path}: expected a JSON list of routes")
+    return routes
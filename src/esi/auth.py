@@ -11,7 +11,7 @@ import httpx
 
 from src.config import settings
 
-LOGIN_BASE = "https://login.eveonline.com"
+LOGIN_BASE = settings.SSO_BASE_URL.rstrip("/")
 REDIRECT_URI = f"http://localhost:{settings.CALLBACK_PORT}/callback"
 SCOPE = "esi-killmails.read_corporation_killmails.v1"
 
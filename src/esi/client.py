@@ -8,9 +8,10 @@ import httpx
 from tenacity import retry, retry_if_exception, stop_after_attempt, wait_exponential_jitter
 
 from src.config import settings
+from src.core.metrics import record_http
 
-ESI_BASE = "https://esi.evetech.net"
-LOGIN_BASE = "https://login.eveonline.com"
+ESI_BASE = settings.ESI_BASE_URL.rstrip("/")
+LOGIN_BASE = settings.SSO_BASE_URL.rstrip("/")
 
 
 def _build_esi_headers(user_agent: str | None = None) -> dict[str, str]:
@@ -46,24 +47,63 @@ class ESIError(Exception):
     pass
 
 
+# Budget d'erreurs ESI (en-têtes X-ESI-Error-Limit-*), mis à jour à chaque réponse
+ERROR_LIMIT: dict[str, float | None] = {"remain": None, "reset_at": None}
+
+
+def _track_error_limit(resp: httpx.Response) -> None:
+    remain = resp.headers.get("X-ESI-Error-Limit-Remain")
+    if remain is None:
+        return
+    reset = resp.headers.get("X-ESI-Error-Limit-Reset")
+    ERROR_LIMIT["remain"] = float(remain)
+    ERROR_LIMIT["reset_at"] = time.time() + float(reset) if reset else None
+
+
+def new_esi_http_client() -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        http2=True,
+        timeout=httpx.Timeout(10.0, connect=10.0),
+        headers=_build_esi_headers(),
+        base_url=ESI_BASE,
+    )
+
+
 class AsyncESIClient:
-    def __init__(self):
+    def __init__(self, *, refresh_token: str | None = None, http: httpx.AsyncClient | None = None):
+        """`refresh_token` : token du tenant (défaut : EVE_REFRESH_TOKEN).
+        `http` : pool de connexions partagé entre plusieurs clients (tenants)."""
         self._token = TokenBucket()
-        self._client = httpx.AsyncClient(
-            http2=True,
-            timeout=httpx.Timeout(10.0, connect=10.0),
-            headers=_build_esi_headers(),
-            base_url=ESI_BASE,
-        )
+        self._refresh_token = refresh_token
+        self._owns_client = http is None
+        self._client = http or new_esi_http_client()
+
+    @property
+    def refresh_token(self) -> str | None:
+        """Refresh token propre au client (None : celui du .env)."""
+        return self._refresh_token
+
+    def _effective_refresh_token(self) -> str:
+        return self._refresh_token or settings.EVE_REFRESH_TOKEN
 
     async def aclose(self):
-        await self._client.aclose()
+        if self._owns_client:
+            await self._client.aclose()
+
+    def token_state(self) -> tuple[str | None, float]:
+        """(access_token, expire_at epoch) courant, pour le snapshot de redémarrage."""
+        return self._token.access_token, self._token.expire_at
+
+    def restore_token(self, access_token: str, expire_at: float) -> None:
+        """Réutilise un access_token encore valide (snapshot de redémarrage)."""
+        self._token.access_token = access_token
+        self._token.expire_at = expire_at
 
     async def _ensure_token(self) -> None:
         if self._token.is_valid():
             return
         if (
-            not settings.EVE_REFRESH_TOKEN
+            not self._effective_refresh_token()
             or not settings.EVE_CLIENT_ID
             or not settings.EVE_CLIENT_SECRET
         ):
@@ -71,7 +111,7 @@ class AsyncESIClient:
 
         data = {
             "grant_type": "refresh_token",
-            "refresh_token": settings.EVE_REFRESH_TOKEN,
+            "refresh_token": self._effective_refresh_token(),
         }
         basic = base64.b64encode(
             f"{settings.EVE_CLIENT_ID}:{settings.EVE_CLIENT_SECRET}".encode()
@@ -108,7 +148,14 @@ class AsyncESIClient:
         hdrs = {"Authorization": f"Bearer {self._token.access_token}"}
         if headers:
             hdrs.update(headers)
-        resp = await self._client.request(method, url, headers=hdrs, **kwargs)
+        t0 = time.perf_counter()
+        try:
+            resp = await self._client.request(method, url, headers=hdrs, **kwargs)
+        except httpx.RequestError:
+            record_http("esi", url, "error", time.perf_counter() - t0)
+            raise
+        record_http("esi", url, resp.status_code, time.perf_counter() - t0)
+        _track_error_limit(resp)
 
         # Gestion basique 429/5xx avec raise pour activer tenacity
         if resp.status_code in (429, 500, 502, 503, 504):
@@ -1,18 +1,21 @@
 from __future__ import annotations
 
 import asyncio
-import time
 from datetime import datetime
 from typing import Any, cast
 
 import httpx
 
+from src.core.caches import LRUCache
 from src.core.models import Killmail, KillmailRef
+from src.core.ratelimit import RateLimiter
 from src.esi.client import AsyncESIClient
 
-# Rate limiter pour fetch_killmail_details: 3 requêtes par seconde
-_last_detail_requests: list[float] = []
-_detail_lock = asyncio.Lock()
+# Détails de killmail : immuables (id + hash), partagés entre pré-chauffe et pipeline
+KILLMAIL_CACHE = LRUCache(maxsize=1_000, name="killmails")
+
+# Rate limiter du pipeline live pour fetch_killmail_details : 3 requêtes par seconde
+DETAILS_LIMITER = RateLimiter(3, 1.0)
 
 
 async def fetch_recent_killmails(
@@ -86,25 +89,15 @@ async def fetch_recent_killmails(
     raise Exception(f"Failed to fetch recent killmails after {max_retries} attempts")
 
 
-async def fetch_killmail_details(client: AsyncESIClient, km_id: int, km_hash: str) -> Killmail:
-    # Rate limiting: max 3 requêtes par seconde
-    async with _detail_lock:
-        now = time.time()
-        # Garder seulement les requêtes de la dernière seconde
-        while _last_detail_requests and _last_detail_requests[0] < now - 1.0:
-            _last_detail_requests.pop(0)
-
-        # Si on a déjà 3 requêtes dans la dernière seconde, attendre
-        if len(_last_detail_requests) >= 3:
-            sleep_time = 1.0 - (now - _last_detail_requests[0])
-            if sleep_time > 0:
-                await asyncio.sleep(sleep_time)
-            # Nettoyer à nouveau après le sleep
-            now = time.time()
-            while _last_detail_requests and _last_detail_requests[0] < now - 1.0:
-                _last_detail_requests.pop(0)
+async def fetch_killmail_details(
+    client: AsyncESIClient, km_id: int, km_hash: str, *, limiter: RateLimiter | None = None
+) -> Killmail:
+    cached = KILLMAIL_CACHE.get((km_id, km_hash))
+    if cached is not None:
+        return cached
 
-        _last_detail_requests.append(time.time())
+    # Rate limiting : budget du pipeline live, sauf limiter dédié (backfill)
+    await (limiter or DETAILS_LIMITER).acquire()
 
     # Retry avec Retry-After en cas de 429
     max_retries = 3
@@ -127,6 +120,7 @@ async def fetch_killmail_details(client: AsyncESIClient, km_id: int, km_hash: st
                 # ESI: "2025-09-10T12:33:06Z"
                 t = str(data.get("killmail_time", ""))
                 km.killmail_time = _dt.fromisoformat(t.replace("Z", "+00:00"))
+            KILLMAIL_CACHE.set((km_id, km_hash), km)
             return km
 
         except httpx.HTTPStatusError as e:
@@ -1,20 +1,83 @@
 from __future__ import annotations
 
+import asyncio
 from collections.abc import Iterable
 from typing import Any, cast
 
+from src.core.caches import LRUCache
 from src.esi.client import AsyncESIClient
 
+# Noms et systèmes -> région : immuables côté ESI, gardés en mémoire (partagés)
+NAME_CACHE = LRUCache(maxsize=50_000, name="names")
+REGION_CACHE = LRUCache(maxsize=10_000, name="regions")
+# POST /universe/names/ : 1000 IDs maximum par requête
+NAMES_MAX_IDS = 1000
+
 
 async def resolve_names(client: AsyncESIClient, ids: Iterable[int]) -> list[dict]:
     ids_list = list({int(x) for x in ids if x is not None})
     if not ids_list:
         return []
-    data: Any = await client.post_json("/latest/universe/names/", json=ids_list)
+    result: list[dict] = []
+    missing: list[int] = []
+    for i in ids_list:
+        cached = NAME_CACHE.get(i)
+        if cached is not None:
+            result.append(cached)
+        else:
+            missing.append(i)
+    if not missing:
+        return result
+    chunks = await asyncio.gather(
+        *(
+            client.post_json("/latest/universe/names/", json=missing[i : i + NAMES_MAX_IDS])
+            for i in range(0, len(missing), NAMES_MAX_IDS)
+        )
+    )
     # L'API renvoie une liste de dicts
-    if isinstance(data, list):
-        return cast(list[dict], data)
-    return []
+    for data in chunks:
+        if isinstance(data, list):
+            for e in cast(list[dict], data):
+                if isinstance(e.get("id"), int):
+                    NAME_CACHE.set(e["id"], e)
+                result.append(e)
+    return result
+
+
+def peek_names(ids: Iterable[int]) -> dict[int, str]:
+    """Noms déjà en cache, sans appel ESI (id -> name)."""
+    out: dict[int, str] = {}
+    for i in ids:
+        entry = NAME_CACHE.get(i) if i in NAME_CACHE else None
+        if entry is not None and isinstance(entry.get("name"), str):
+            out[i] = entry["name"]
+    return out
+
+
+# Catégories de /universe/names/ -> clés de la réponse de /universe/ids/
+_IDS_KEYS = {
+    "character": "characters",
+    "corporation": "corporations",
+    "alliance": "alliances",
+    "inventory_type": "inventory_types",
+    "solar_system": "systems",
+}
+
+
+async def find_id(client: AsyncESIClient, name: str, category: str) -> int | None:
+    """ID d'un nom exact (insensible à la casse) : cache des noms d'abord,
+    puis un POST /universe/ids/ (le résultat est mis en cache)."""
+    wanted = name.strip().lower()
+    for _, entry in NAME_CACHE.items():
+        if entry.get("category") == category and str(entry.get("name", "")).lower() == wanted:
+            return int(entry["id"])
+    data: Any = await client.post_json("/latest/universe/ids/", json=[name.strip()])
+    matches = data.get(_IDS_KEYS[category]) if isinstance(data, dict) else None
+    for e in matches or []:
+        if isinstance(e.get("id"), int):
+            NAME_CACHE.set(e["id"], {**e, "category": category})
+            return int(e["id"])
+    return None
 
 
 async def get_system(client: AsyncESIClient, system_id: int) -> dict:
@@ -32,10 +95,16 @@ async def get_constellation(client: AsyncESIClient, constellation_id: int) -> di
 
 
 async def get_region_id_for_system(client: AsyncESIClient, system_id: int) -> int | None:
+    cached = REGION_CACHE.get(system_id)
+    if cached is not None:
+        return int(cached)
     sys = await get_system(client, system_id)
     constellation_id = sys.get("constellation_id")
     if not constellation_id:
         return None
     const = await get_constellation(client, int(constellation_id))
     rid = const.get("region_id")
-    return int(rid) if rid is not None else None
+    if rid is None:
+        return None
+    REGION_CACHE.set(system_id, int(rid))
+    return int(rid)
@@ -0,0 +1,26 @@
+# src/headless.py
+from __future__ import annotations
+
+import asyncio
+
+from src.config import settings
+from src.core.startup import STARTUP
+from src.core.tenants import load_tenants
+from src.scheduler.loop import start_scheduler
+
+
+async def run_headless() -> None:
+    """Runtime sans gateway : le scheduler poste via les webhooks Discord.
+
+    Pas de client discord.py (heartbeats, reconnexions, on_ready) : seul le
+    chemin HTTP des posts est actif. Les slash commands ne sont pas
+    disponibles dans ce mode."""
+    save_snapshot = None
+    try:
+        save_snapshot = await start_scheduler(None, load_tenants(settings))
+        STARTUP.mark("scheduler started")
+        print("[headless] posting through Discord webhooks (no gateway)")
+        await asyncio.Event().wait()
+    finally:
+        if save_snapshot is not None:
+            save_snapshot()
@@ -0,0 +1,442 @@
+"""Backfill historique : parcourt l'historique zKill d'une corporation (pages
+ou intervalle de dates), enrichit les kills par lots et les écrit dans
+l'archive locale (src/core/archive.py), éventuellement aussi dans le channel.
+
+Reprise : un checkpoint est écrit après chaque page ; relancer le même
+backfill repart de la page suivante. Budget propre : limiter ESI dédié
+(BACKFILL_RATE_PER_SECOND), client ESI et connexions zKill séparés, pause
+quand le budget d'erreurs ESI est bas, un seul post en file à la fois.
+
+CLI (bot arrêté, ou pour un tenant sans backfill en cours) :
+    python -m src.scheduler.backfill --pages 1-20
+    python -m src.scheduler.backfill --since 2025-01-01 --until 2025-03-31
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import dataclasses
+import os
+import time
+from dataclasses import asdict, dataclass
+from datetime import UTC, date, datetime
+from typing import Any
+
+import httpx
+
+from src.config import settings
+from src.core.archive import ARCHIVE_DIR, LEGACY_ARCHIVE_FILE, KillArchive, open_archive
+from src.core.models import Killmail
+from src.core.processor import (
+    PipelineContext,
+    enrich_killmail,
+    kill_record,
+    prewarm_refs,
+    submit_killmail,
+)
+from src.core.ratelimit import RateLimiter
+from src.core.store import JSONStore
+from src.esi.client import ERROR_LIMIT, AsyncESIClient
+from src.esi.killmails import fetch_killmail_details
+from src.zkb.zkill import KillmailRef, fetch_killrefs_page
+
+CHECKPOINT_FILE = "backfill.json"
+# Kills enrichis par lot (détails en parallèle, noms et prix groupés)
+BATCH = 20
+# zKill : une page toutes les 2 s au plus, indépendamment du cycle live
+ZKB_PAGE_INTERVAL_S = 2.0
+# Garde-fou en mode dates : pages max par mois
+MAX_PAGES_PER_MONTH = 100
+# Sous ce budget d'erreurs ESI, le backfill attend la remise à zéro
+MIN_ERROR_BUDGET = 50
+
+Segment = tuple[int | None, int | None]
+
+
+@dataclass
+class BackfillJob:
+    """Ce qu'il faut rattraper : pages first..last de l'historique, ou bien
+    les mois couvrant since..until (filtrés ensuite sur killmail_time)."""
+
+    corporation_id: int
+    first_page: int = 1
+    last_page: int = 10
+    since: date | None = None
+    until: date | None = None
+    post: bool = False
+
+    def segments(self) -> list[Segment]:
+        """(année, mois) du plus récent au plus ancien ; (None, None) en mode pages."""
+        if self.since is None:
+            return [(None, None)]
+        until = self.until or datetime.now(UTC).date()
+        months: list[Segment] = []
+        y, m = until.year, until.month
+        while (y, m) >= (self.since.year, self.since.month):
+            months.append((y, m))
+            y, m = (y, m - 1) if m > 1 else (y - 1, 12)
+        return months
+
+    def page_range(self) -> tuple[int, int]:
+        if self.since is None:
+            return self.first_page, self.last_page
+        return 1, MAX_PAGES_PER_MONTH
+
+    def in_range(self, km: Killmail) -> bool:
+        if self.since is None:
+            return True
+        day = km.killmail_time.astimezone(UTC).date()
+        return self.since <= day and (self.until is None or day <= self.until)
+
+    def key(self) -> dict[str, Any]:
+        """Identité du job dans le checkpoint (reprise si identique)."""
+        return {
+            "corporation_id": self.corporation_id,
+            "pages": [self.first_page, self.last_page] if self.since is None else None,
+            "since": self.since.isoformat() if self.since else None,
+            "until": self.until.isoformat() if self.until else None,
+        }
+
+    def describe(self) -> str:
+        if self.since is None:
+            return f"pages {self.first_page}-{self.last_page}"
+        return f"{self.since} → {self.until or 'today'}"
+
+
+def parse_job(
+    corporation_id: int, *, pages: str = "", since: str = "", until: str = "", post: bool = False
+) -> BackfillJob:
+    """Job depuis les paramètres de /backfill ou de la CLI (ValueError si invalide)."""
+    job = BackfillJob(int(corporation_id), post=post)
+    if since:
+        job.since = date.fromisoformat(since)
+        job.until = date.fromisoformat(until) if until else None
+        if job.until is not None and job.until < job.since:
+            raise ValueError("until must be after since")
+    elif until:
+        raise ValueError("until requires since")
+    elif pages:
+        first, _, last = pages.partition("-")
+        job.first_page, job.last_page = int(first), int(last or first)
+        if not 1 <= job.first_page <= job.last_page:
+            raise ValueError("pages must look like 1-10")
+    return job
+
+
+@dataclass
+class BackfillProgress:
+    # Position : segment courant et dernière page terminée (0 = aucune)
+    segment: int = 0
+    page: int = 0
+    pages: int = 0
+    archived: int = 0
+    posted: int = 0
+    skipped: int = 0
+    errors: int = 0
+    done: bool = False
+
+
+class Backfill:
+    def __init__(
+        self,
+        ctx: PipelineContext,
+        job: BackfillJob,
+        *,
+        archive: KillArchive,
+        checkpoint: JSONStore,
+        idx: Any = None,
+        limiter: RateLimiter | None = None,
+    ):
+        """`ctx` : contexte pipeline avec un client ESI propre au backfill ;
+        `idx` : KillIndex du tenant (évite de reposter un kill déjà posté)."""
+        self.ctx = ctx
+        self.job = job
+        self.archive = archive
+        self.checkpoint = checkpoint
+        self.idx = idx
+        self.limiter = limiter or RateLimiter(
+            int(getattr(settings, "BACKFILL_RATE_PER_SECOND", 2)), 1.0
+        )
+        self._zkb_limiter = RateLimiter(1, ZKB_PAGE_INTERVAL_S)
+        self.progress = BackfillProgress()
+        self.error: str | None = None
+        self.task: asyncio.Task | None = None
+
+    @property
+    def running(self) -> bool:
+        return self.task is not None and not self.task.done()
+
+    def resume(self) -> bool:
+        """Reprend la position du checkpoint s'il décrit le même job, inachevé."""
+        saved = self.checkpoint.read()
+        if not isinstance(saved, dict) or saved.get("job") != self.job.key():
+            return False
+        progress = BackfillProgress(**saved.get("progress", {}))
+        if progress.done:
+            return False
+        self.progress = progress
+        return True
+
+    async def _save_checkpoint(self) -> None:
+        # Kills de la page sur disque avant le checkpoint : un arrêt entre les
+        # deux ne saute jamais une page non archivée à la reprise
+        await self.archive.flush()
+        self.checkpoint.save({"job": self.job.key(), "progress": asdict(self.progress)})
+        await self.checkpoint.flush()
+
+    async def run(self) -> BackfillProgress:
+        p = self.progress
+        segments = self.job.segments()
+        first, last = self.job.page_range()
+        seg_i, page = p.segment, p.page + 1 if p.page else first
+        print(f"[backfill] corp {self.job.corporation_id}: {self.job.describe()} from page {page}")
+        nxt: asyncio.Task | None = None
+        async with httpx.AsyncClient(http2=True, timeout=httpx.Timeout(10.0)) as zkb:
+            try:
+                while seg_i < len(segments):
+                    seg = segments[seg_i]
+                    current = nxt or asyncio.create_task(self._listing(zkb, seg, page))
+                    # Page suivante listée pendant le traitement de celle-ci
+                    nxt = (
+                        asyncio.create_task(self._listing(zkb, seg, page + 1))
+                        if page < last
+                        else None
+                    )
+                    refs = await current
+                    if refs:
+                        await self._process_page(refs)
+                        p.pages += 1
+                    if not refs or page >= last:
+                        # Fin du segment (page vide ou dernière page demandée)
+                        if nxt is not None:
+                            nxt.cancel()
+                            nxt = None
+                        seg_i, page = seg_i + 1, first
+                        p.segment, p.page = seg_i, 0
+                    else:
+                        p.segment, p.page = seg_i, page
+                        page += 1
+                    await self._save_checkpoint()
+                    print(
+                        f"[backfill] page {p.pages} done: {p.archived} archived,"
+                        f" {p.posted} posted, {p.skipped} skipped, {p.errors} errors"
+                    )
+            finally:
+                if nxt is not None:
+                    nxt.cancel()
+        p.done = True
+        await self._save_checkpoint()
+        print(f"[backfill] corp {self.job.corporation_id} done: {p.archived} kills archived")
+        return p
+
+    async def _listing(self, zkb: httpx.AsyncClient, seg: Segment, page: int) -> list[KillmailRef]:
+        await self._zkb_limiter.acquire()
+        year, month = seg
+        return await fetch_killrefs_page(zkb, self.job.corporation_id, page, year=year, month=month)
+
+    async def _wait_error_budget(self) -> None:
+        # Le budget d'erreurs ESI est partagé avec le live : on lui laisse la marge
+        remain, reset_at = ERROR_LIMIT.get("remain"), ERROR_LIMIT.get("reset_at")
+        if remain is None or remain >= MIN_ERROR_BUDGET or not reset_at:
+            return
+        delay = reset_at - time.time()
+        if delay > 0:
+            print(f"[backfill] ESI error budget low ({remain:.0f}), pausing {delay:.0f}s")
+            await asyncio.sleep(delay + 1)
+
+    async def _process_page(self, refs: list[KillmailRef]) -> None:
+        p = self.progress
+        # zKill liste le plus récent d'abord : archivage du plus ancien au plus récent
+        todo = [r for r in reversed(refs) if r.killmail_id not in self.archive]
+        p.skipped += len(refs) - len(todo)
+        for i in range(0, len(todo), BATCH):
+            batch = todo[i : i + BATCH]
+            await self._wait_error_budget()
+            results = await asyncio.gather(
+                *(
+                    fetch_killmail_details(
+                        self.ctx.esi, r.killmail_id, r.killmail_hash, limiter=self.limiter
+                    )
+                    for r in batch
+                ),
+                return_exceptions=True,
+            )
+            kms: list[Killmail] = []
+            for ref, res in zip(batch, results, strict=True):
+                if isinstance(res, Killmail):
+                    kms.append(res)
+                else:
+                    p.errors += 1
+                    print(f"[backfill] details error for killmail {ref.killmail_id}: {res}")
+            in_range = [km for km in kms if self.job.in_range(km)]
+            p.skipped += len(kms) - len(in_range)
+            # Détails déjà en cache : régions, noms et prix en requêtes groupées
+            await prewarm_refs(self.ctx, [(km.killmail_id, km.killmail_hash) for km in in_range])
+            enriched = [(km, await enrich_killmail(self.ctx, km)) for km in in_range]
+            # Lot archivé avant les posts : un post refusé ne le fait pas perdre
+            p.archived += self.archive.add_many(
+                [kill_record(self.ctx, km, kwargs) for km, kwargs in enriched]
+            )
+            if not self.job.post:
+                continue
+            for km, kwargs in enriched:
+                try:
+                    await self._post(km, kwargs)
+                except Exception as e:
+                    p.errors += 1
+                    print(f"[backfill] post error for killmail {km.killmail_id}: {e}")
+
+    async def _post(self, km: Killmail, kwargs: dict) -> None:
+        """Un post à la fois (attente de l'envoi) : le live n'attend jamais
+        derrière une file de kills historiques."""
+        idx = self.idx
+        if idx is not None and not await idx.reserve(km.killmail_id, km.killmail_hash):
+            return
+        try:
+            await submit_killmail(self.ctx, km, kwargs, meta=None)
+        except Exception:
+            if idx is not None:
+                await idx.release(km.killmail_id, km.killmail_hash)
+            raise
+        if idx is not None:
+            await idx.commit(km.killmail_id, km.killmail_hash)
+        self.progress.posted += 1
+
+    def summary(self) -> str:
+        p = self.progress
+        if self.running:
+            state = "running"
+        elif p.done:
+            state = "done"
+        elif self.error:
+            state = f"failed ({self.error})"
+        else:
+            state = "stopped (resumable)"
+        segments = self.job.segments()
+        where = ""
+        if not p.done and self.job.since is not None and p.segment < len(segments):
+            y, m = segments[p.segment]
+            where = f", month {y}-{m:02d}"
+        return (
+            f"Backfill corp {self.job.corporation_id} ({self.job.describe()}) : {state}\n"
+            f"- {p.pages} page(s){where}, {p.archived} archived, {p.posted} posted,"
+            f" {p.skipped} skipped, {p.errors} error(s)"
+        )
+
+
+# Backfill courant ou dernier backfill, par tenant (lu par /backfill status)
+JOBS: dict[str, Backfill] = {}
+
+
+def start_backfill(runtime: Any, job: BackfillJob, *, restart: bool = False) -> Backfill:
+    """Lance un backfill en tâche de fond pour un tenant du scheduler, avec
+    son propre client ESI (pool de connexions séparé du polling)."""
+    current = JOBS.get(runtime.name)
+    if current is not None and current.running:
+        raise RuntimeError(f"a backfill is already running for {runtime.name}")
+    if runtime.ctx is None or runtime.tenant is None:
+        raise RuntimeError("scheduler not started")
+    tenant = runtime.tenant
+    esi = AsyncESIClient(refresh_token=tenant.refresh_token or None)
+    bf = Backfill(
+        dataclasses.replace(runtime.ctx, esi=esi),
+        job,
+        archive=runtime.ctx.archive or open_archive(tenant.path(ARCHIVE_DIR)),
+        checkpoint=JSONStore(tenant.path(CHECKPOINT_FILE), {}),
+        idx=runtime.idx,
+    )
+    if not restart and bf.resume():
+        print(f"[backfill] resuming after page {bf.progress.pages} ({runtime.name})")
+
+    async def _run() -> None:
+        try:
+            await bf.run()
+        except asyncio.CancelledError:
+            print(f"[backfill] stopped ({runtime.name}), resumable from the checkpoint")
+            raise
+        except Exception as e:
+            bf.error = str(e)
+            print(f"[backfill] error ({runtime.name}): {e}")
+        finally:
+            await esi.aclose()
+
+    bf.task = asyncio.create_task(_run())
+    JOBS[runtime.name] = bf
+    return bf
+
+
+def stop_backfill(name: str) -> bool:
+    bf = JOBS.get(name)
+    if bf is None or bf.task is None or not bf.running:
+        return False
+    bf.task.cancel()
+    return True
+
+
+async def _main(args: argparse.Namespace) -> int:
+    from src.botui.embeds import build_embed_insight5
+    from src.core.prices_cache import PricesCache
+    from src.core.pricing import compute_killmail_drop, compute_killmail_value, prewarm_prices
+    from src.core.sqlite_store import open_store
+    from src.core.tenants import DATA_DIR, load_tenants
+    from src.esi.universe import get_region_id_for_system, resolve_names
+
+    tenants = load_tenants(settings)
+    tenant = next((t for t in tenants if t.name == args.tenant), None) if args.tenant else None
+    tenant = tenant or tenants[0]
+    job = parse_job(tenant.corporation_id, pages=args.pages, since=args.since, until=args.until)
+
+    db = open_store(DATA_DIR) if getattr(settings, "STORAGE_BACKEND", "json") == "sqlite" else None
+    esi = AsyncESIClient(refresh_token=tenant.refresh_token or None)
+    ctx = PipelineContext(
+        esi=esi,
+        prices=PricesCache(os.path.join(DATA_DIR, "prices.json"), db=db),
+        outbound=None,
+        settings=settings,
+        resolve_names=resolve_names,
+        get_region_id_for_system=get_region_id_for_system,
+        compute_killmail_value=compute_killmail_value,
+        compute_killmail_drop=compute_killmail_drop,
+        build_embed_insight5=build_embed_insight5,
+        prewarm_prices=prewarm_prices,
+        corporation_id=tenant.corporation_id,
+    )
+    bf = Backfill(
+        ctx,
+        job,
+        archive=open_archive(
+            tenant.path(ARCHIVE_DIR), legacy_jsonl=tenant.path(LEGACY_ARCHIVE_FILE)
+        ),
+        checkpoint=JSONStore(tenant.path(CHECKPOINT_FILE), {}),
+    )
+    if not args.restart and bf.resume():
+        print(f"[backfill] resuming after page {bf.progress.pages}")
+    try:
+        await bf.run()
+    finally:
+        await bf.archive.flush()
+        await esi.aclose()
+    print(bf.summary())
+    return 0
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Backfill the local archive from zKill history")
+    parser.add_argument("--pages", default="1-10", help="zKill history pages, e.g. 1-20")
+    parser.add_argument("--since", default="", help="first day (YYYY-MM-DD), instead of pages")
+    parser.add_argument("--until", default="", help="last day (YYYY-MM-DD), default today")
+    parser.add_argument("--tenant", default="", help="tenant name (default: the first one)")
+    parser.add_argument("--restart", action="store_true", help="ignore the saved checkpoint")
+    args = parser.parse_args(argv)
+    try:
+        return asyncio.run(_main(args))
+    except ValueError as e:
+        parser.error(str(e))
+    except KeyboardInterrupt:
+        print("[backfill] interrupted, resumable from the checkpoint")
+    return 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -8,3 +8,27 @@ def should_rewrite_cleanup_index(
     zkb_snapshot_ok: bool,
 ) -> bool:
     return esi_snapshot_ok and (not zkb_enabled or zkb_snapshot_ok)
+
+
+def expiry_watermark(
+    *,
+    esi_low_id: int | None,
+    zkb_enabled: bool,
+    zkb_low_id: int | None,
+) -> int | None:
+    """ID en dessous duquel un kill ne peut plus réapparaître dans aucune source.
+
+    esi_low_id / zkb_low_id : plus petit killmail_id de la dernière liste reçue
+    (ESI « recent », pages zKill). Les deux sources renvoient les kills les plus
+    récents d'abord : tout ce qui est sous le minimum est sorti des deux fenêtres.
+    None tant qu'une source active n'a encore rien fourni (pas d'expiration)."""
+    if not should_rewrite_cleanup_index(
+        esi_snapshot_ok=esi_low_id is not None,
+        zkb_enabled=zkb_enabled,
+        zkb_snapshot_ok=zkb_low_id is not None,
+    ):
+        return None
+    assert esi_low_id is not None
+    if zkb_enabled and zkb_low_id is not None:
+        return min(esi_low_id, zkb_low_id)
+    return esi_low_id
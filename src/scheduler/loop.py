@@ -2,147 +2,691 @@ from __future__ import annotations
 
 import asyncio
 import os
+import time
+from collections.abc import Callable
+from dataclasses import dataclass, field
+from typing import Any
 
 import discord
 import httpx
 
 from src.botui.embeds import build_embed_insight5
+from src.botui.outbound import ChannelUnavailable, Outbound, is_retryable_error
+from src.botui.routing import PostQueue, Route, RoutedOutbound, compile_routes
+from src.botui.webhook import WebhookChannel
 from src.config import settings
+from src.core.archive import ARCHIVE_DIR, LEGACY_ARCHIVE_FILE, open_archive
+from src.core.latency import TRACES
+from src.core.looplag import LOOP_LAG
+from src.core.metrics import METRICS, serve_metrics
 from src.core.prices_cache import PricesCache
-from src.core.pricing import compute_killmail_drop, compute_killmail_value
-from src.core.processor import PipelineContext, process_ref
+from src.core.pricing import compute_killmail_drop, compute_killmail_value, prewarm_prices
+from src.core.processor import PipelineContext, prewarm_refs, process_ref
+from src.core.profiler import PROFILER
+from src.core.sqlite_store import SQLiteStore, migrate_json, open_store
+from src.core.startup import STARTUP
 from src.core.store import JSONStore
-from src.esi.client import AsyncESIClient
-from src.esi.killmails import fetch_recent_killmails
-from src.esi.universe import get_region_id_for_system, resolve_names
-from src.scheduler.cleanup_policy import should_rewrite_cleanup_index
+from src.core.tenants import Tenant
+from src.esi.client import AsyncESIClient, new_esi_http_client
+from src.esi.killmails import KILLMAIL_CACHE, fetch_recent_killmails
+from src.esi.universe import (
+    NAME_CACHE,
+    REGION_CACHE,
+    get_region_id_for_system,
+    peek_names,
+    resolve_names,
+)
+from src.scheduler import snapshot
+from src.scheduler.cleanup_policy import expiry_watermark
+from src.scheduler.state import SchedulerState
+from src.zkb import poster
 from src.zkb.poster import post_main
-from src.zkb.runner import maybe_run_zkb_after_esi
-from src.zkb.zkill import fetch_corporation_killrefs
+from src.zkb.runner import run_zkb_cycle, zkb_interval_seconds
 
 KILLS_INDEX_PATH = os.path.join("data", "kills_index.json")
 PRICES_PATH = os.path.join("data", "prices.json")
+OUTBOX_PATH = os.path.join("data", "outbox.jsonl")
+# Route du channel principal du tenant (DISCORD_CHANNEL_ID / webhook)
+MAIN_ROUTE = "main"
+# Refs pré-chauffées par tranche : la 1re tranche est postée sans attendre le reste
+PREWARM_CHUNK = 10
+# Échecs tolérés par kill (pipeline ou post) avant abandon jusqu'au redémarrage
+MAX_ATTEMPTS = 3
 
-# on_ready() est rappelé à chaque reconnexion Discord gateway.
-# Sans ce guard, chaque reconnexion crée des poll_task/cleanup_task en double
+# Garde-fou : le scheduler ne doit démarrer qu'une fois par process.
+# Sans ce guard, un second appel crée des poll_task/cleanup_task en double
 # → les mêmes kills sont postés N fois en parallèle.
 _scheduler_started = False
+# Serveur /metrics (METRICS_PORT) : référence forte pour la durée du process
+_metrics_server: asyncio.Server | None = None
+# Cache de prix partagé (lu par /stats)
+PRICES: PricesCache | None = None
 
 
 class KillIndex:
-    def __init__(self, path: str):
+    """Index des kills postés. Le fichier JSON est lu une fois au démarrage ;
+    les tests d'appartenance se font sur un set mémoire tenu sous _lock et
+    les écritures partent en arrière-plan (JSONStore.save)."""
+
+    def __init__(self, path: str, *, db: SQLiteStore | None = None, tenant: str = "default"):
+        """`db` : backend SQLite (STORAGE_BACKEND=sqlite), une ligne par kill
+        au lieu de réécrire tout le fichier JSON à chaque ajout."""
         self.path = path
-        self.store = JSONStore(path, [])
+        self._db = db
+        self._tenant = tenant
         self._lock = asyncio.Lock()
+        self._entries: list[dict]
+        if db is None:
+            self.store: JSONStore | None = JSONStore(path, [])
+            self._entries = list(self.store.read())
+        else:
+            self.store = None
+            self._entries = [{"id": i, "hash": h, "posted": True} for i, h in db.kills_load(tenant)]
+        self._known: set[tuple[int, str]] = {(int(x["id"]), str(x["hash"])) for x in self._entries}
+        # Kills en cours de traitement (ESI ou zKill), pas encore postés
+        self._inflight: set[tuple[int, str]] = set()
+        # Échecs par kill : au-delà de MAX_ATTEMPTS il n'est plus réservé
+        self._failures: dict[tuple[int, str], int] = {}
 
     async def load(self) -> list[dict]:
-        return self.store.read()
+        return list(self._entries)
+
+    def __len__(self) -> int:
+        return len(self._known)
+
+    def inflight(self) -> int:
+        """Kills réservés, en cours de traitement ou d'envoi."""
+        return len(self._inflight)
 
     async def add_if_absent(self, km_id: int, km_hash: str) -> bool:
         async with self._lock:
-            arr = self.store.read()
-            for x in arr:
-                if int(x.get("id")) == km_id and str(x.get("hash")) == km_hash:
-                    return False
-            arr.append({"id": km_id, "hash": km_hash, "posted": True})
-            self.store.write(arr)
+            key = (km_id, km_hash)
+            if key in self._known:
+                return False
+            self._known.add(key)
+            self._entries.append({"id": km_id, "hash": km_hash, "posted": True})
+            self._persist_add(key)
             return True
 
-    async def rewrite_with(self, current_set: set[tuple[int, str]]):
+    def _persist_add(self, key: tuple[int, str]) -> None:
+        if self._db is not None:
+            self._db.kills_add(self._tenant, [key])
+        else:
+            assert self.store is not None
+            self.store.save(list(self._entries))
+
+    async def reserve(self, km_id: int, km_hash: str) -> bool:
+        """Réserve un kill pour traitement. False s'il est déjà posté ou déjà
+        réservé par l'autre source (ESI/zKill), ou abandonné après
+        MAX_ATTEMPTS échecs."""
+        async with self._lock:
+            key = (km_id, km_hash)
+            if key in self._inflight or key in self._known:
+                return False
+            if self._failures.get(key, 0) >= MAX_ATTEMPTS:
+                return False
+            self._inflight.add(key)
+            return True
+
+    async def release(self, km_id: int, km_hash: str) -> None:
+        """Libère une réservation après un échec (le kill sera retenté)."""
+        async with self._lock:
+            self._inflight.discard((km_id, km_hash))
+
+    async def fail(self, km_id: int, km_hash: str) -> bool:
+        """Libère une réservation après un échec et le compte. False si le
+        kill a épuisé ses MAX_ATTEMPTS essais (il ne sera plus retenté)."""
+        async with self._lock:
+            key = (km_id, km_hash)
+            self._inflight.discard(key)
+            self._failures[key] = n = self._failures.get(key, 0) + 1
+            return n < MAX_ATTEMPTS
+
+    async def commit(self, km_id: int, km_hash: str) -> None:
+        """Marque un kill réservé comme posté."""
+        await self.add_if_absent(km_id, km_hash)
         async with self._lock:
-            arr = self.store.read()
-            arr2 = [x for x in arr if (x.get("id"), x.get("hash")) in current_set]
-            self.store.write(arr2)
+            self._inflight.discard((km_id, km_hash))
+            self._failures.pop((km_id, km_hash), None)
+
+    async def expire_below(self, watermark: int) -> int:
+        """Supprime les entrées d'ID < watermark (sorties des fenêtres ESI/zKill).
+        Opération purement locale ; n'écrit que si quelque chose a expiré."""
+        async with self._lock:
+            self._failures = {k: n for k, n in self._failures.items() if k[0] >= watermark}
+            keep = [x for x in self._entries if int(x["id"]) >= watermark]
+            removed = len(self._entries) - len(keep)
+            if removed:
+                self._entries = keep
+                self._known = {(int(x["id"]), str(x["hash"])) for x in keep}
+                if self._db is not None:
+                    self._db.kills_expire_below(self._tenant, watermark)
+                else:
+                    assert self.store is not None
+                    self.store.save(list(keep))
+            return removed
 
     async def known_set(self) -> set[tuple[int, str]]:
         async with self._lock:
-            arr = self.store.read()
-            return {(int(x.get("id")), str(x.get("hash"))) for x in arr}
+            return set(self._known)
 
 
-async def start_scheduler(discord_client: discord.Client, channel_id: int):
-    global _scheduler_started
-    if _scheduler_started:
-        print("[scheduler] already running — skipping duplicate start (Discord reconnect)")
+# Références fortes vers les tâches de finalisation (sinon GC possible)
+_finalizers: set[asyncio.Task] = set()
+
+
+@dataclass
+class TenantRuntime:
+    """État courant d'un tenant, lu par /stats et les commandes d'admin."""
+
+    name: str
+    idx: KillIndex
+    outbound: PostQueue
+    routes: list[Route]
+    last_poll_s: float | None = None
+    last_poll_at: float | None = None
+    # Prochain poll par token (slot) : epoch
+    next_poll_at: dict[int, float] = field(default_factory=dict)
+    # Contexte pipeline et fichiers du tenant (backfill, diagnostics)
+    ctx: PipelineContext | None = None
+    tenant: Tenant | None = None
+
+
+RUNTIME: dict[str, TenantRuntime] = {}
+
+
+async def _finalize_post(
+    outbound: PostQueue,
+    idx: KillIndex,
+    km_id: int,
+    km_hash: str,
+    delivery: asyncio.Future,
+    *,
+    source: str,
+    on_failure: Callable[[], None] | None = None,
+    archive: Any = None,
+    record: asyncio.Future | None = None,
+) -> None:
+    try:
+        await delivery
+    except Exception as e:
+        # Post refusé : on libère la réservation, le kill sera retenté tant
+        # qu'il n'a pas épuisé ses essais et que l'erreur est transitoire
+        print(f"[post] error for killmail {km_id}: {e}")
+        if not await idx.fail(km_id, km_hash):
+            print(f"[post] giving up on killmail {km_id} after {MAX_ATTEMPTS} attempts")
+        elif on_failure is not None and is_retryable_error(e):
+            on_failure()
         return
-    _scheduler_started = True
+    TRACES.posted(km_id)
+    if source == "esi":
+        post_main(km_id, km_hash)
+    # Marquer comme traité APRÈS le post Discord, puis seulement retirer de
+    # l'outbox : un redémarrage entre les deux voit le kill dans l'index
+    await idx.commit(km_id, km_hash)
+    outbound.ack(delivery)
+    # Archivé seulement une fois le post accepté ; la ligne d'un post
+    # provisoire arrive à la fin de l'enrichissement (None s'il a échoué)
+    if archive is not None and record is not None:
+        row = await record
+        if row is not None:
+            archive.add(row)
+
+
+async def handle_ref(
+    ctx: PipelineContext,
+    idx: KillIndex,
+    km_id: int,
+    km_hash: str,
+    *,
+    source: str,
+    on_failure: Callable[[], None] | None = None,
+) -> bool:
+    """Réserve -> pipeline -> file d'envoi. Partagé par ESI et zKill.
+
+    Le kill reste réservé jusqu'à l'acceptation du post Discord, puis est
+    marqué dans l'index. Retourne False s'il était déjà connu, en cours, ou
+    abandonné (MAX_ATTEMPTS échecs, loggé). on_failure est appelé si le post
+    échoue après coup sur une erreur transitoire (réservation libérée)."""
+    if not await idx.reserve(km_id, km_hash):
+        return False
+    TRACES.seen(km_id, source)
+    record = asyncio.get_running_loop().create_future() if ctx.archive is not None else None
+    try:
+        delivery = await process_ref(
+            ctx,
+            km_id,
+            km_hash,
+            meta={"km_id": km_id, "km_hash": km_hash, "source": source},
+            record=record,
+        )
+    except Exception as e:
+        if await idx.fail(km_id, km_hash):
+            raise
+        print(f"[process] giving up on killmail {km_id} after {MAX_ATTEMPTS} attempts: {e}")
+        return False
+    finally:
+        PROFILER.tick("process")
+    _track_delivery(
+        ctx.outbound,
+        idx,
+        km_id,
+        km_hash,
+        delivery,
+        source=source,
+        on_failure=on_failure,
+        archive=ctx.archive,
+        record=record,
+    )
+    return True
+
+
+def _track_delivery(
+    outbound: PostQueue,
+    idx: KillIndex,
+    km_id: int,
+    km_hash: str,
+    delivery: asyncio.Future,
+    *,
+    source: str,
+    on_failure: Callable[[], None] | None = None,
+    archive: Any = None,
+    record: asyncio.Future | None = None,
+) -> None:
+    task = asyncio.create_task(
+        _finalize_post(
+            outbound,
+            idx,
+            km_id,
+            km_hash,
+            delivery,
+            source=source,
+            on_failure=on_failure,
+            archive=archive,
+            record=record,
+        )
+    )
+    _finalizers.add(task)
+    task.add_done_callback(_finalizers.discard)
 
-    # Channel
+
+async def restore_outbox(outbound: PostQueue, idx: KillIndex, *, archive: Any = None) -> int:
+    """Re-soumet les posts restés dans l'outbox au dernier arrêt, sans refaire
+    ESI/pricing. Les kills concernés restent réservés jusqu'à leur envoi, puis
+    sont archivés depuis la ligne jointe aux meta (clé "record").
+
+    Livraison at-least-once : un arrêt entre l'envoi Discord et l'écriture dans
+    l'index re-poste le kill ; une fois l'index écrit, l'entrée est abandonnée."""
+    restored = 0
+    for record in outbound.restore():
+        meta = record.get("meta") or {}
+        km_id, km_hash = int(meta.get("km_id", 0)), str(meta.get("km_hash", ""))
+        if not km_id or not await idx.reserve(km_id, km_hash):
+            # Déjà dans l'index (arrêt entre idx.commit et l'ack de l'outbox)
+            outbound.discard(record)
+            continue
+        delivery = outbound.requeue(record)
+        row: asyncio.Future = asyncio.get_running_loop().create_future()
+        row.set_result(meta.get("record"))
+        _track_delivery(
+            outbound,
+            idx,
+            km_id,
+            km_hash,
+            delivery,
+            source=str(meta.get("source", "esi")),
+            archive=archive,
+            record=row,
+        )
+        restored += 1
+    return restored
+
+
+async def _resolve_channel(
+    discord_client: discord.Client, channel_id: int
+) -> discord.abc.Messageable | None:
     channel = discord_client.get_channel(channel_id)
     if not isinstance(
         channel, (discord.TextChannel, discord.Thread, discord.VoiceChannel)
     ) and hasattr(discord_client, "fetch_channel"):
+        # REST : disponible dès le login, sans attendre la gateway
         channel = await discord_client.fetch_channel(channel_id)  # type: ignore[assignment]
     if not isinstance(channel, discord.abc.Messageable):
-        print("Channel introuvable ou non postable.")
+        return None
+    return channel
+
+
+async def start_scheduler(
+    discord_client: discord.Client | None, tenants: list[Tenant]
+) -> Callable[[], None] | None:
+    """Démarre le pipeline sans attendre on_ready (appelé depuis setup_hook).
+
+    Un jeu de tâches par tenant (corporation) : poll ESI, zKill, cleanup. Les
+    caches (prix, noms, univers, détails de killmails) et le pool HTTP ESI
+    sont partagés ; les polls sont décalés de POLL_INTERVAL_SECONDS / N entre
+    tenants pour lisser la charge. Sans client Discord (mode headless), les
+    tenants postent via leur webhook.
+
+    Retourne la sauvegarde du snapshot d'état (None si STATE_SNAPSHOT_ENABLE
+    est désactivé), à appeler à l'arrêt du process.
+
+    Polling, enrichissement et pré-chauffe des caches commencent tout de suite ;
+    les embeds prêts sont bufferisés dans l'Outbound jusqu'à ce que le channel
+    soit résolu, puis postés dans l'ordre."""
+    global _scheduler_started
+    if _scheduler_started:
+        print("[scheduler] already running — skipping duplicate start")
+        return None
+    _scheduler_started = True
+    # Temps de boucle bloquée (I/O ou CPU synchrones) : /stats, /metrics, logs
+    LOOP_LAG.start()
+
+    global PRICES
+    # STORAGE_BACKEND=sqlite : un fichier data/killbot.sqlite3 (WAL) pour
+    # index, prix, noms, état et soumissions zKill, migré depuis les JSON
+    db: SQLiteStore | None = None
+    if getattr(settings, "STORAGE_BACKEND", "json") == "sqlite":
+        db = open_store(os.path.dirname(PRICES_PATH))
+        poster.attach_storage(db)
+    prices = PRICES = PricesCache(PRICES_PATH, db=db)
+    await _start_metrics(prices)
+    http = new_esi_http_client() if len(tenants) > 1 else None
+    savers: list[Callable[[], None]] = []
+    for i, tenant in enumerate(tenants):
+        offset = settings.POLL_INTERVAL_SECONDS * i / len(tenants)
+        save = await _start_tenant(
+            discord_client,
+            tenant,
+            prices=prices,
+            http=http,
+            db=db,
+            offset=offset,
+            tag=len(tenants) > 1,
+        )
+        if save is not None:
+            savers.append(save)
+    if len(tenants) > 1:
+        print(f"[scheduler] {len(tenants)} tenants started: {', '.join(t.name for t in tenants)}")
+    STARTUP.mark("store loading")
+
+    if not savers:
+        return None
+
+    def save_all() -> None:
+        for save in savers:
+            save()
+
+    return save_all
+
+
+async def _start_metrics(prices: PricesCache) -> None:
+    """Expose /metrics si METRICS_PORT est renseigné (désactivé par défaut)."""
+    global _metrics_server
+    port = int(getattr(settings, "METRICS_PORT", 0) or 0)
+    if port <= 0:
         return
+    caches: dict[str, Any] = {
+        "prices": prices,
+        "names": NAME_CACHE,
+        "regions": REGION_CACHE,
+        "killmails": KILLMAIL_CACHE,
+    }
+    METRICS.register(
+        "killbot_cache_hits_total", lambda: [({"cache": k}, c.hits) for k, c in caches.items()]
+    )
+    METRICS.register(
+        "killbot_cache_misses_total",
+        lambda: [({"cache": k}, c.misses) for k, c in caches.items()],
+    )
+    METRICS.register(
+        "killbot_cache_entries",
+        lambda: [({"cache": k}, len(c)) for k, c in caches.items() if k != "prices"],
+    )
+    try:
+        _metrics_server = await serve_metrics(getattr(settings, "METRICS_HOST", "127.0.0.1"), port)
+    except OSError as e:
+        # Port occupé : le bot tourne sans métriques plutôt que de s'arrêter
+        print(f"[metrics] cannot listen on port {port}: {e}")
+
+
+async def _start_tenant(
+    discord_client: discord.Client | None,
+    tenant: Tenant,
+    *,
+    prices: PricesCache,
+    http: httpx.AsyncClient | None,
+    db: SQLiteStore | None,
+    offset: float,
+    tag: bool,
+) -> Callable[[], None] | None:
+    """Stores, contexte et tâches d'un tenant ; démarre son 1er poll après `offset` s."""
+    os.makedirs(tenant.data_dir, exist_ok=True)
+    prefix = f"[{tenant.name}] " if tag else ""
+    # Une file d'envoi (et une outbox) par channel cible : le channel principal
+    # reçoit tout, les routes (règles compilées) seulement les kills retenus
+    targets = compile_routes(tenant.routes)
+    if tenant.channel_id or tenant.webhook_url or not targets:
+        targets.insert(
+            0,
+            Route(
+                name=MAIN_ROUTE,
+                channel_id=tenant.channel_id,
+                webhook_url=tenant.webhook_url,
+                predicate=lambda facts: True,
+                needs_enrichment=False,
+            ),
+        )
+    for route in targets:
+        outbox = OUTBOX_PATH if route.name == MAIN_ROUTE else f"outbox-{route.name}.jsonl"
+        route.outbound = Outbound(
+            window_s=settings.DISCORD_BATCH_WINDOW_MS / 1000,
+            max_embeds=settings.DISCORD_BATCH_MAX_EMBEDS,
+            path=tenant.path(os.path.basename(outbox)),
+        )
+        route.outbound.start()
+    outbound: PostQueue
+    if tenant.routes:
+        outbound = RoutedOutbound(targets)
+    else:
+        assert targets[0].outbound is not None
+        outbound = targets[0].outbound
 
     # Stores / clients
-    idx = KillIndex(KILLS_INDEX_PATH)
-    prices = PricesCache(PRICES_PATH)
-    esi = AsyncESIClient()
+    index_path = tenant.path(os.path.basename(KILLS_INDEX_PATH))
+    state_path = tenant.path(os.path.basename(snapshot.STATE_PATH))
+    if db is not None:
+        migrate_json(
+            db,
+            tenant=tenant.name,
+            index_path=index_path,
+            prices_path=PRICES_PATH,
+            state_path=state_path,
+        )
+    idx = KillIndex(index_path, db=db, tenant=tenant.name)
+    archive = open_archive(tenant.path(ARCHIVE_DIR), legacy_jsonl=tenant.path(LEGACY_ARCHIVE_FILE))
+    restored = await restore_outbox(outbound, idx, archive=archive)
+    runtime = RUNTIME[tenant.name] = TenantRuntime(tenant.name, idx, outbound, targets)
+    METRICS.register("killbot_kill_index_size", lambda: [({"tenant": tenant.name}, len(idx))])
+    METRICS.register(
+        "killbot_outbound_pending", lambda: [({"tenant": tenant.name}, outbound.pending())]
+    )
+    if restored:
+        print(f"{prefix}[scheduler] {restored} post(s) restored from outbox")
+    if http is None and tenant.extra_refresh_tokens:
+        http = new_esi_http_client()  # pool partagé entre les tokens du tenant
+    esi = AsyncESIClient(refresh_token=tenant.refresh_token or None, http=http)
+    corporation_id = tenant.corporation_id
 
-    # 👉 ETag gardé seulement en mémoire (aucun fichier sur disque)
-    last_etag: str | None = None
+    # 👉 ETag, watermarks et curseurs en mémoire ; persistés seulement si
+    # STATE_SNAPSHOT_ENABLE (redémarrage à chaud : 304 + caches chauds)
+    state = SchedulerState()
+    save_snapshot: Callable[[], None] | None = None
+    if getattr(settings, "STATE_SNAPSHOT_ENABLE", False):
+        save_snapshot = snapshot.install(
+            state, esi, settings, path=state_path, db=db, key=tenant.name
+        )
 
     # Contexte pipeline partagé (ESI + zKill)
     ctx = PipelineContext(
         esi=esi,
         prices=prices,
-        channel=channel,
+        outbound=outbound,
         settings=settings,
         resolve_names=resolve_names,
         get_region_id_for_system=get_region_id_for_system,
         compute_killmail_value=compute_killmail_value,
         compute_killmail_drop=compute_killmail_drop,
         build_embed_insight5=build_embed_insight5,
+        prewarm_prices=prewarm_prices,
+        peek_names=peek_names,
+        corporation_id=corporation_id,
+        routed=isinstance(outbound, RoutedOutbound),
+        archive=archive,
     )
+    runtime.ctx, runtime.tenant = ctx, tenant
+
+    async def channel_task(route: Route) -> None:
+        assert route.outbound is not None
+        out = route.outbound
+        webhook = WebhookChannel(route.webhook_url) if route.webhook_url else None
+        target = "webhook" if webhook is not None else f"channel {route.channel_id}"
+        if route.name != MAIN_ROUTE:
+            target = f"route {route.name} ({target})"
+        delay = 5.0
+        while True:
+            try:
+                channel: Any
+                if webhook is not None:
+                    await webhook.check()
+                    channel = webhook
+                elif discord_client is not None:
+                    channel = await _resolve_channel(discord_client, route.channel_id)
+                else:
+                    raise ChannelUnavailable("no webhook_url configured (headless mode)")
+                if channel is None:
+                    raise ChannelUnavailable(f"{target} is not a postable channel")
+                out.attach(channel)
+                if out.pending():
+                    print(f"{prefix}[scheduler] {target} ready, flushing {out.pending()} posts")
+                return
+            except (discord.NotFound, discord.Forbidden, ChannelUnavailable) as e:
+                # Erreur de configuration : inutile de retenter ni de bufferiser
+                # indéfiniment. L'outbox est conservée pour le prochain démarrage ;
+                # la collecte s'arrête quand plus aucun channel n'est utilisable.
+                dropped = out.close(e)
+                stop = outbound.closed
+                if stop:
+                    for t in producers:
+                        t.cancel()
+                print(
+                    f"{prefix}[scheduler] FATAL: cannot post to {target} ({e}); "
+                    + ("polling stopped, " if stop else "")
+                    + f"{dropped} post(s) kept in outbox for next start"
+                )
+                return
+            except Exception as e:
+                print(f"[scheduler] channel resolve error: {e}")
+            await asyncio.sleep(delay)
+            delay = min(300.0, delay * 2)
 
-    async def poll_task():
-        nonlocal last_etag
+    # Un poller par token : ESI met en cache la liste "recent" par token, des
+    # tokens décalés en phase voient donc un nouveau kill plus tôt. Chaque
+    # poller a son ETag (celui du 1er est state.last_etag, snapshoté)
+    pollers = [esi] + [
+        AsyncESIClient(refresh_token=token, http=http) for token in tenant.extra_refresh_tokens
+    ]
+    extra_etags: list[str | None] = [None] * len(tenant.extra_refresh_tokens)
+
+    def _get_etag(slot: int) -> str | None:
+        return state.last_etag if slot == 0 else extra_etags[slot - 1]
+
+    def _set_etag(slot: int, etag: str | None) -> None:
+        if slot == 0:
+            state.last_etag = etag
+        else:
+            extra_etags[slot - 1] = etag
+
+    def _invalidate_etag() -> None:
+        # Un post ESI a échoué après coup : forcer un corps complet au prochain
+        # poll (de chaque token) pour que le kill libéré soit retenté
+        for slot in range(len(pollers)):
+            _set_etag(slot, None)
+
+    async def poll_task(client: AsyncESIClient, slot: int):
+        # Décalage de phase entre tenants puis entre tokens d'un même tenant,
+        # puis cadence fixe (comme zkb_task) : la durée d'un poll ne décale
+        # pas les suivants et les phases restent espacées
+        interval = settings.POLL_INTERVAL_SECONDS
+        loop = asyncio.get_running_loop()
+        next_at = loop.time() + offset + slot * interval / len(pollers)
         while True:
+            runtime.next_poll_at[slot] = time.time() + max(0.0, next_at - loop.time())
+            await asyncio.sleep(max(0.0, next_at - loop.time()))
+            next_at += interval
+            started = time.perf_counter()
             try:
                 # ETag en mémoire envoyé via If-None-Match par fetch_recent_killmails
                 status, new_etag, refs = await fetch_recent_killmails(
-                    esi, int(settings.CORPORATION_ID), etag=last_etag
+                    client, corporation_id, etag=_get_etag(slot)
                 )
 
-                if status == "not_modified":
-                    # Rien de neuf côté ESI — on peut déclencher zKill selon la cadence
-                    await maybe_run_zkb_after_esi(
-                        settings=settings,
-                        corporation_id=int(settings.CORPORATION_ID),
-                        idx=idx,
-                        process_ref=lambda km_id, km_hash: process_ref(ctx, km_id, km_hash),
-                    )
-
-                elif status == "ok":
-                    # Mettre à jour l'ETag uniquement en mémoire
-                    last_etag = new_etag
-
-                    # Les killmails sont déjà triés par ID décroissant (plus récent d'abord)
-                    # Inverser pour traiter du plus ancien au plus récent
+                if status == "ok":
+                    if refs:
+                        state.esi_low_id = min(r.killmail_id for r in refs)
+
+                    # Traitement du plus vieux au plus récent (ESI renvoie les plus
+                    # récents d'abord), par tranches : la pré-chauffe groupée
+                    # (détails, noms, prix) de la tranche suivante tourne en
+                    # tâche de fond pendant que la tranche courante est postée
                     known = await idx.known_set()
+                    # Vu dès le listing : la pré-chauffe et le rate-limit des
+                    # détails comptent dans la latence du pipeline
+                    for r in refs:
+                        if (r.killmail_id, r.killmail_hash) not in known:
+                            TRACES.seen(r.killmail_id, "esi")
+                    chunks = [
+                        list(reversed(refs))[i : i + PREWARM_CHUNK]
+                        for i in range(0, len(refs), PREWARM_CHUNK)
+                    ]
+
+                    def _prewarm(chunk) -> asyncio.Task:
+                        return asyncio.create_task(
+                            prewarm_refs(
+                                ctx,
+                                [
+                                    (r.killmail_id, r.killmail_hash)
+                                    for r in chunk
+                                    if (r.killmail_id, r.killmail_hash) not in known
+                                ],
+                            )
+                        )
 
-                    # Traiter en flux inversé (du plus vieux au plus récent)
-                    for ref in reversed(refs):
-                        # Ne traiter que les killmails pas encore dans l'index
-                        if (ref.killmail_id, ref.killmail_hash) not in known:
+                    failed = False
+                    warm = _prewarm(chunks[0]) if chunks else None
+                    for n, chunk in enumerate(chunks):
+                        try:
+                            if warm is not None:
+                                await warm
+                        except Exception as e:
+                            print(f"[poll] prewarm error: {e}")
+                        warm = _prewarm(chunks[n + 1]) if n + 1 < len(chunks) else None
+                        for ref in chunk:
                             try:
-                                await process_ref(ctx, ref.killmail_id, ref.killmail_hash)
-                                post_main(ref.killmail_id, ref.killmail_hash)
-                                # Marquer comme traité APRÈS le post Discord
-                                await idx.add_if_absent(ref.killmail_id, ref.killmail_hash)
+                                await handle_ref(
+                                    ctx,
+                                    idx,
+                                    ref.killmail_id,
+                                    ref.killmail_hash,
+                                    source="esi",
+                                    on_failure=_invalidate_etag,
+                                )
                             except Exception as e:
+                                failed = True
                                 print(f"[process] error for killmail {ref.killmail_id}: {e}")
 
-                    # Puis zKill selon la cadence
-                    await maybe_run_zkb_after_esi(
-                        settings=settings,
-                        corporation_id=int(settings.CORPORATION_ID),
-                        idx=idx,
-                        process_ref=lambda km_id, km_hash: process_ref(ctx, km_id, km_hash),
-                    )
+                    # ETag mis à jour seulement si tout est passé : sinon le
+                    # prochain poll reçoit un 304 et ne retente jamais l'échec
+                    _set_etag(slot, None if failed else new_etag)
             except httpx.HTTPStatusError:
                 # Erreurs HTTP déjà loggées dans killmails.py
                 pass
@@ -152,61 +696,72 @@ async def start_scheduler(discord_client: discord.Client, channel_id: int):
 
                 print(f"[poll] unexpected error: {e}")
                 print(f"[poll] traceback:\n{traceback.format_exc()}")
-            await asyncio.sleep(settings.POLL_INTERVAL_SECONDS)
+            if not STARTUP.reported:
+                STARTUP.mark("first poll")
+                STARTUP.report_once("first poll")
+            PROFILER.tick("poll")
+            runtime.last_poll_s = time.perf_counter() - started
+            runtime.last_poll_at = time.time()
+            # Poll plus long que l'intervalle : on repart de maintenant
+            if next_at < loop.time():
+                next_at = loop.time() + interval
 
-    async def cleanup_task():
-        # Attendre avant la première exécution pour ne pas concurrencer poll_task
-        await asyncio.sleep(settings.CLEANUP_INTERVAL_MINUTES * 60)
+    def _on_zkb_listing(low_id: int) -> None:
+        state.zkb_low_id = low_id
 
+    async def zkb_task():
+        # Cadence propre, indépendante de la durée des cycles ESI (pas de dérive)
+        interval = zkb_interval_seconds(settings)
+        loop = asyncio.get_running_loop()
+        next_at = loop.time() + offset + interval
         while True:
-            try:
-                zkb_enabled = bool(getattr(settings, "ZKB_ENABLE", False))
-                esi_snapshot_ok = False
-                zkb_snapshot_ok = not zkb_enabled
+            await asyncio.sleep(max(0.0, next_at - loop.time()))
+            next_at += interval
+            await run_zkb_cycle(
+                settings=settings,
+                corporation_id=corporation_id,
+                handle_ref=lambda km_id, km_hash: handle_ref(
+                    ctx, idx, km_id, km_hash, source="zkb"
+                ),
+                on_listing=_on_zkb_listing,
+            )
+            # Cycle plus long que l'intervalle : on repart de maintenant
+            if next_at < loop.time():
+                next_at = loop.time() + interval
 
-                # ESI: snapshot (force_body=True pour bypass 304 et resynchroniser l'index)
-                status, _etag, refs = await fetch_recent_killmails(
-                    esi, int(settings.CORPORATION_ID), etag=None, force_body=True
+    async def cleanup_task():
+        # Expiration locale par watermark d'ID : aucun appel réseau, aucun snapshot
+        while True:
+            await asyncio.sleep(settings.CLEANUP_INTERVAL_MINUTES * 60)
+            try:
+                watermark = expiry_watermark(
+                    esi_low_id=state.esi_low_id,
+                    zkb_enabled=bool(getattr(settings, "ZKB_ENABLE", False)),
+                    zkb_low_id=state.zkb_low_id,
                 )
-                current: set[tuple[int, str]] = set()
-                if status == "ok":
-                    current |= {(r.killmail_id, r.killmail_hash) for r in refs}
-                    esi_snapshot_ok = True
-
-                # zKill: union pour garder les kills zKill-only
-                if zkb_enabled:
-                    try:
-                        zkb_refs = await fetch_corporation_killrefs(
-                            int(settings.CORPORATION_ID),
-                            pages=int(getattr(settings, "ZKB_PAGES", 1)),
-                        )
-                        for r in zkb_refs:
-                            km_id = r["killmail_id"] if isinstance(r, dict) else r.killmail_id
-                            km_hash = r["killmail_hash"] if isinstance(r, dict) else r.killmail_hash
-                            current.add((int(km_id), str(km_hash)))
-                        zkb_snapshot_ok = True
-                    except Exception as e:
-                        print(f"[cleanup][zkb] error: {e}")
-
-                if should_rewrite_cleanup_index(
-                    esi_snapshot_ok=esi_snapshot_ok,
-                    zkb_enabled=zkb_enabled,
-                    zkb_snapshot_ok=zkb_snapshot_ok,
-                ):
-                    await idx.rewrite_with(current)
-                else:
-                    missing = []
-                    if not esi_snapshot_ok:
-                        missing.append("esi")
-                    if zkb_enabled and not zkb_snapshot_ok:
-                        missing.append("zkb")
-                    print(
-                        "[cleanup] skipped index rewrite: incomplete snapshot "
-                        f"({'+'.join(missing)})"
-                    )
+                if watermark is None:
+                    print("[cleanup] skipped: no complete listing yet (esi/zkb)")
+                    continue
+                removed = await idx.expire_below(watermark)
+                if removed:
+                    print(f"[cleanup] expired {removed} index entries below {watermark}")
             except Exception as e:
                 print(f"[cleanup] error: {e}")
-            await asyncio.sleep(settings.CLEANUP_INTERVAL_MINUTES * 60)
 
-    asyncio.create_task(poll_task())
+    async def snapshot_task(save: Callable[[], None]):
+        while True:
+            await asyncio.sleep(max(30, int(settings.STATE_SNAPSHOT_INTERVAL_SECONDS)))
+            save()
+
+    # Producteurs de posts, arrêtés si le channel est définitivement inutilisable
+    producers: list[asyncio.Task] = [
+        asyncio.create_task(poll_task(client, slot)) for slot, client in enumerate(pollers)
+    ]
+    if settings.ZKB_ENABLE:
+        producers.append(asyncio.create_task(zkb_task()))
+    for route in targets:
+        asyncio.create_task(channel_task(route))
     asyncio.create_task(cleanup_task())
+    if save_snapshot is not None:
+        asyncio.create_task(snapshot_task(save_snapshot))
+    return save_snapshot
@@ -0,0 +1,126 @@
+from __future__ import annotations
+
+import hashlib
+import os
+import time
+from collections.abc import Callable
+from datetime import UTC, datetime
+from typing import Any
+
+from src.core.sqlite_store import SQLiteStore
+from src.core.store import JSONStore
+from src.esi.universe import NAME_CACHE, REGION_CACHE
+from src.scheduler.state import SchedulerState
+
+STATE_PATH = os.path.join("data", "state.json")
+SNAPSHOT_VERSION = 1
+# Taille max des listes de cache persistées (les plus récemment utilisées)
+WARM_NAMES_LIMIT = 5_000
+
+
+def _token_fingerprint(refresh_token: str) -> str:
+    # On ne réutilise un access_token que pour le même refresh_token
+    return hashlib.sha256(refresh_token.encode()).hexdigest()[:16]
+
+
+def _refresh_token(esi: Any, settings: Any) -> str:
+    # Token propre au client (tenant), sinon celui du .env
+    return getattr(esi, "refresh_token", None) or settings.EVE_REFRESH_TOKEN
+
+
+def capture(state: SchedulerState, esi: Any, settings: Any) -> dict:
+    access_token, expire_at = esi.token_state()
+    return {
+        "version": SNAPSHOT_VERSION,
+        "saved_at": datetime.now(UTC).isoformat(),
+        "scheduler": state.to_dict(),
+        "token": {
+            "access_token": access_token,
+            "expire_at": expire_at,
+            "refresh": _token_fingerprint(_refresh_token(esi, settings)),
+        },
+        "caches": {
+            "names": [v for _k, v in NAME_CACHE.items(WARM_NAMES_LIMIT)],
+            "regions": [[k, v] for k, v in REGION_CACHE.items()],
+        },
+    }
+
+
+def restore(data: Any, state: SchedulerState, esi: Any, settings: Any) -> bool:
+    """Réapplique un snapshot. False s'il est absent ou d'une autre version."""
+    if not isinstance(data, dict) or data.get("version") != SNAPSHOT_VERSION:
+        return False
+
+    restored = SchedulerState.from_dict(data.get("scheduler") or {})
+    for k, v in restored.to_dict().items():
+        setattr(state, k, v)
+
+    tok = data.get("token") or {}
+    expire_at = float(tok.get("expire_at") or 0.0)
+    if (
+        tok.get("access_token")
+        and tok.get("refresh") == _token_fingerprint(_refresh_token(esi, settings))
+        and expire_at > time.time()
+    ):
+        esi.restore_token(tok["access_token"], expire_at)
+
+    caches = data.get("caches") or {}
+    NAME_CACHE.update((e["id"], e) for e in caches.get("names", []) if "id" in e)
+    REGION_CACHE.update((int(s), int(r)) for s, r in caches.get("regions", []))
+    return True
+
+
+class _SnapshotStore:
+    def __init__(self, path: str, db: SQLiteStore | None, key: str):
+        self._db = db
+        self._key = f"snapshot:{key}"
+        self._json = JSONStore(path, {}) if db is None else None
+
+    def read(self) -> Any:
+        if self._json is not None:
+            return self._json.read()
+        assert self._db is not None
+        data = self._db.state_get(self._key, {})
+        if isinstance(data, dict) and data:
+            data.setdefault("caches", {})["names"] = self._db.names_recent(WARM_NAMES_LIMIT)
+        return data
+
+    def write(self, data: dict) -> None:
+        if self._json is not None:
+            self._json.save(data)  # en arrière-plan si la boucle tourne
+            return
+        assert self._db is not None
+        caches = dict(data.get("caches") or {})
+        self._db.names_put(caches.pop("names", []))
+        self._db.state_set(self._key, {**data, "caches": caches})
+
+
+def install(
+    state: SchedulerState,
+    esi: Any,
+    settings: Any,
+    path: str = STATE_PATH,
+    *,
+    db: SQLiteStore | None = None,
+    key: str = "default",
+) -> Callable[[], None]:
+    """Restaure le snapshot au démarrage et renvoie la fonction de sauvegarde
+    (appelée périodiquement et à l'arrêt). Elle ne lève jamais.
+
+    Avec `db` (SQLite), le snapshot est une ligne de la table state et les
+    noms vont dans la table names (upsert) au lieu du document JSON."""
+    store = _SnapshotStore(path, db, key)
+    if restore(store.read(), state, esi, settings):
+        print(
+            f"[snapshot] restored (etag={'yes' if state.last_etag else 'no'}, "
+            f"names={len(NAME_CACHE)}, regions={len(REGION_CACHE)})"
+        )
+
+    def save() -> None:
+        try:
+            store.write(capture(state, esi, settings))
+            print("[snapshot] saved")
+        except Exception as e:
+            print(f"[snapshot] save error: {e}")
+
+    return save
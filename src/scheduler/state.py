@@ -0,0 +1,23 @@
+from __future__ import annotations
+
+from dataclasses import asdict, dataclass, fields
+from typing import Any
+
+
+@dataclass
+class SchedulerState:
+    """État mémoire du scheduler partagé entre poll, zKill et cleanup."""
+
+    last_etag: str | None = None
+    # Curseurs par source : plus petit killmail_id de la dernière liste reçue
+    # (watermarks de cleanup, restaurés au redémarrage)
+    esi_low_id: int | None = None
+    zkb_low_id: int | None = None
+
+    def to_dict(self) -> dict[str, Any]:
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> SchedulerState:
+        known = {f.name for f in fields(cls)}
+        return cls(**{k: v for k, v in data.items() if k in known})
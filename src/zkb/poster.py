@@ -1,13 +1,24 @@
 from __future__ import annotations
 
 import asyncio
+import time
 
 import httpx
 
 from src.config import settings
+from src.core.metrics import record_http
+from src.core.sqlite_store import SQLiteStore
 
 POST_URL = "https://zkillboard.com/post/"
 
+# Journal des soumissions (STORAGE_BACKEND=sqlite) : évite de resoumettre un kill
+_submissions: SQLiteStore | None = None
+
+
+def attach_storage(db: SQLiteStore | None) -> None:
+    global _submissions
+    _submissions = db
+
 
 def _build_headers(user_agent: str | None) -> dict[str, str]:
     ua = user_agent or settings.ZKB_POST_USER_AGENT
@@ -36,7 +47,11 @@ async def _post_worker(
         data = {"killmailurl": killmail_url}
 
         async with httpx.AsyncClient(timeout=15.0, headers=headers) as client:
+            t0 = time.perf_counter()
             resp = await client.post(POST_URL, data=data)
+            record_http("zkill", POST_URL, resp.status_code, time.perf_counter() - t0)
+            if _submissions is not None:
+                _submissions.zkb_record(killmail_id, killmail_hash, resp.status_code)
 
             # 302 = déjà présent / redirection côté zKill => on considère comme succès
             if resp.status_code == 302:
@@ -66,6 +81,8 @@ def post_main(killmail_id: int, killmail_hash: str, *, user_agent: str | None =
     """
     if not getattr(settings, "ZKB_POST_ENABLE", False):
         return
+    if _submissions is not None and _submissions.zkb_submitted(killmail_id, killmail_hash):
+        return
     try:
         asyncio.get_running_loop()
         asyncio.create_task(_post_worker(killmail_id, killmail_hash, user_agent=user_agent))
@@ -5,39 +5,60 @@ from typing import Any
 
 from .zkill import fetch_corporation_killrefs
 
-_ZKB_COUNTER = 0  # cadence 1 fois sur N cycles ESI
 
+def zkb_interval_seconds(settings: Any) -> int:
+    """Intervalle propre au cycle zKill.
 
-async def maybe_run_zkb_after_esi(
+    ZKB_INTERVAL_SECONDS s'il est défini, sinon l'ancienne cadence
+    « 1 fois sur ZKB_EVERY_N cycles ESI » convertie en secondes."""
+    explicit = int(getattr(settings, "ZKB_INTERVAL_SECONDS", 0) or 0)
+    if explicit > 0:
+        return explicit
+    every_n = max(1, int(getattr(settings, "ZKB_EVERY_N", 3)))
+    return max(1, int(getattr(settings, "POLL_INTERVAL_SECONDS", 120))) * every_n
+
+
+async def run_zkb_cycle(
     *,
     settings: Any,
     corporation_id: int,
-    idx: Any,
-    process_ref: Callable[[int, str], Awaitable[None]],
-) -> None:
-    """À appeler après un cycle ESI réussi. Déclenche zKill 1 fois sur N et
-    passe chaque (id, hash) au pipeline partagé via process_ref."""
-    global _ZKB_COUNTER
-    _ZKB_COUNTER += 1
+    handle_ref: Callable[[int, str], Awaitable[bool]],
+    on_listing: Callable[[int], None] | None = None,
+) -> int:
+    """Un cycle zKill indépendant de la boucle ESI.
 
+    Chaque (id, hash) est passé à handle_ref, qui réserve le kill dans le
+    KillIndex partagé (False si déjà connu ou en cours côté ESI). Au plus
+    ZKB_MAX_PER_CYCLE kills sont traités par cycle (0 = illimité), du plus
+    ancien au plus récent. on_listing reçoit le plus petit killmail_id de la
+    liste (watermark de cleanup). Retourne le nombre de kills traités."""
     if not getattr(settings, "ZKB_ENABLE", False):
-        return
-    every_n = int(getattr(settings, "ZKB_EVERY_N", 3))
-    if every_n <= 0 or (_ZKB_COUNTER % every_n) != 0:
-        return
+        return 0
+    budget = int(getattr(settings, "ZKB_MAX_PER_CYCLE", 0) or 0)
 
+    processed = 0
     try:
         zkb_refs = await fetch_corporation_killrefs(
             int(corporation_id),
             pages=int(getattr(settings, "ZKB_PAGES", 1)),
         )
-        for ref in zkb_refs:
+        if on_listing is not None and zkb_refs:
+            on_listing(min(int(r["killmail_id"]) for r in zkb_refs))
+        # zKill renvoie le plus récent d'abord
+        for ref in reversed(zkb_refs):
+            if budget > 0 and processed >= budget:
+                print(f"[zKill] budget reached ({budget}), remaining refs deferred")
+                break
             km_id = ref["killmail_id"] if isinstance(ref, dict) else ref.killmail_id
             km_hash = ref["killmail_hash"] if isinstance(ref, dict) else ref.killmail_hash
-            if await idx.add_if_absent(int(km_id), str(km_hash)):
-                await process_ref(int(km_id), str(km_hash))
+            try:
+                if await handle_ref(int(km_id), str(km_hash)):
+                    processed += 1
+            except Exception as e:
+                print(f"[zKill] error for killmail {km_id}: {e}")
     except Exception as e:
         import traceback
 
         print(f"[zKill] error: {e}")
         print(f"[zKill] traceback:\n{traceback.format_exc()}")
+    return processed
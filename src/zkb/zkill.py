@@ -1,8 +1,13 @@
 from __future__ import annotations
 
+import time
+
 import httpx
 
-ZKB_BASE = "https://zkillboard.com/api"
+from src.config import settings
+from src.core.metrics import record_http
+
+ZKB_BASE = settings.ZKB_BASE_URL.rstrip("/")
 USER_AGENT = "Besra-Killbot/1.0 (+https://zkillboard.com)"  # ✅ la '}' supprimée
 
 
@@ -27,53 +32,77 @@ class KillmailRef(dict):
         return str(self["killmail_hash"])
 
 
+def _parse_refs(data: object) -> list[KillmailRef]:
+    results: list[KillmailRef] = []
+    if not isinstance(data, list):
+        return results
+    for it in data:
+        km_id = it.get("killmail_id") or it.get("killID") or it.get("killId") or it.get("killid")
+        zkb_hash = (it.get("zkb") or {}).get("hash") or it.get("hash")
+
+        if km_id and zkb_hash:
+            results.append(KillmailRef(int(km_id), str(zkb_hash)))
+    return results
+
+
+async def _get_page(s: httpx.AsyncClient, url: str) -> list[KillmailRef]:
+    """Une page de l'API zKill ([] si 404 ou vide)."""
+    headers = {
+        "Accept": "application/json",
+        "User-Agent": USER_AGENT,
+    }
+    t0 = time.perf_counter()
+    try:
+        resp = await s.get(url, headers=headers)
+    except httpx.RequestError:
+        record_http("zkill", url, "error", time.perf_counter() - t0)
+        raise
+    record_http("zkill", url, resp.status_code, time.perf_counter() - t0)
+
+    if resp.status_code == 404:
+        return []
+
+    if resp.status_code != 200:
+        print(f"[zKill] HTTP {resp.status_code} for {url}")
+        print(f"[zKill]   Response headers: {dict(resp.headers)}")
+        try:
+            print(f"[zKill]   Response body: {resp.text[:500]}")
+        except Exception:
+            pass
+
+    resp.raise_for_status()
+    return _parse_refs(resp.json())
+
+
 async def fetch_corporation_killrefs(
     corporation_id: int,
     *,
     pages: int = 1,
     timeout_s: float = 10.0,
 ) -> list[KillmailRef]:
-    headers = {
-        "Accept": "application/json",
-        "User-Agent": USER_AGENT,
-    }
-
     results: list[KillmailRef] = []
 
     async with httpx.AsyncClient(
         http2=True, timeout=httpx.Timeout(timeout_s, connect=timeout_s)
     ) as s:
         for page in range(1, max(1, pages) + 1):
-            url = f"{ZKB_BASE}/corporationID/{corporation_id}/page/{page}/"
-            resp = await s.get(url, headers=headers)
-
-            if resp.status_code == 404:
+            refs = await _get_page(s, f"{ZKB_BASE}/corporationID/{corporation_id}/page/{page}/")
+            if not refs:
                 break
+            results.extend(refs)
 
-            if resp.status_code != 200:
-                print(f"[zKill] HTTP {resp.status_code} for {url}")
-                print(f"[zKill]   Response headers: {dict(resp.headers)}")
-                try:
-                    print(f"[zKill]   Response body: {resp.text[:500]}")
-                except Exception:
-                    pass
-
-            resp.raise_for_status()
-            data = resp.json()
-
-            if not isinstance(data, list) or not data:
-                break
-
-            for it in data:
-                km_id = (
-                    it.get("killmail_id")
-                    or it.get("killID")
-                    or it.get("killId")
-                    or it.get("killid")
-                )
-                zkb_hash = (it.get("zkb") or {}).get("hash") or it.get("hash")
+    return results
 
-                if km_id and zkb_hash:
-                    results.append(KillmailRef(int(km_id), str(zkb_hash)))
 
-    return results
+async def fetch_killrefs_page(
+    s: httpx.AsyncClient,
+    corporation_id: int,
+    page: int,
+    *,
+    year: int | None = None,
+    month: int | None = None,
+) -> list[KillmailRef]:
+    """Une page de l'historique d'une corporation (plus récent d'abord),
+    éventuellement restreinte à un mois. Utilisé par le backfill."""
+    period = f"year/{year}/month/{month}/" if year and month else ""
+    return await _get_page(s, f"{ZKB_BASE}/corporationID/{corporation_id}/{period}page/{page}/")
@@ -0,0 +1,230 @@
+"""Microbenchmarks des chemins chauds du pipeline.
+
+Usage :
+    python tests/benchmarks/bench_hotpaths.py [--quick] [--json out.json]
+                                              [--compare baseline.json] [--threshold 1.25]
+
+Résultats lisibles par machine (--json) : un fichier par release, comparé au
+suivant avec --compare (code de sortie 1 si un bench régresse au-delà du seuil).
+Pas collecté par pytest (nom en bench_*)."""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from collections.abc import Callable
+from importlib import metadata
+from pathlib import Path
+from typing import Any
+
+ROOT = Path(__file__).resolve().parents[2]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from src.botui.embeds import build_embed_insight5  # noqa: E402
+from src.core.models import Killmail  # noqa: E402
+from src.core.prices_cache import PricesCache  # noqa: E402
+from src.core.pricing import compute_killmail_value  # noqa: E402
+from src.scheduler.loop import KillIndex  # noqa: E402
+
+FIXTURES = ROOT / "tests" / "fixtures"
+SCHEMA_VERSION = 1
+
+
+def load_fixture(name: str) -> dict:
+    return json.loads((FIXTURES / name).read_text(encoding="utf-8"))
+
+
+def killmail_fixture() -> dict:
+    data = load_fixture("killmail_with_items.json")
+    # Le hash vient de la ref (ESI ne le renvoie pas dans le corps)
+    data.setdefault("killmail_hash", "0" * 40)
+    return data
+
+
+def large_killmail(attackers: int = 1_200, items: int = 300) -> dict:
+    """Killmail générée à partir de la fixture : N attaquants, M items."""
+    base = killmail_fixture()
+    template = base["attackers"][0]
+    base["attackers"] = [
+        {
+            **template,
+            "character_id": 90_000_000 + i,
+            "corporation_id": 98_000_000 + i % 50,
+            "final_blow": i == 0,
+        }
+        for i in range(attackers)
+    ]
+    item_template = base["victim"]["items"][0]
+    base["victim"]["items"] = [
+        {
+            **item_template,
+            "item_type_id": 2_000 + i,
+            "quantity_destroyed": i % 3,
+            "quantity_dropped": (i + 1) % 2,
+        }
+        for i in range(items)
+    ]
+    return base
+
+
+def _embed_kwargs() -> dict[str, Any]:
+    return {
+        "victim_name": "Victim",
+        "victim_corp_name": "Victim Corp",
+        "victim_all_name": "Victim Alliance",
+        "final_name": "Attacker",
+        "final_corp_name": "Attacker Corp",
+        "final_all_name": None,
+        "system_name": "Jita",
+        "region_name": "The Forge",
+        "ship_name": "Rifter",
+        "final_ship_name": "Tristan",
+        "total_value": 123_456_789.0,
+        "dropped_value": 1_234_567.0,
+        "is_kill": True,
+        "region_id": 10000002,
+    }
+
+
+def measure(fn: Callable[[], Any], *, repeat: int, min_time: float) -> dict[str, float]:
+    """Temps par appel (ns) : nombre d'itérations calibré sur min_time, puis
+    `repeat` mesures dont on garde min et médiane."""
+    number = 1
+    while True:
+        t0 = time.perf_counter()
+        for _ in range(number):
+            fn()
+        if time.perf_counter() - t0 >= min_time or number >= 1 << 20:
+            break
+        number *= 2
+    runs = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        for _ in range(number):
+            fn()
+        runs.append((time.perf_counter() - t0) / number * 1e9)
+    return {
+        "min_ns": min(runs),
+        "median_ns": statistics.median(runs),
+        "ops_per_s": 1e9 / min(runs),
+        "number": number,
+        "repeat": repeat,
+    }
+
+
+def run(quick: bool = False) -> dict[str, Any]:
+    repeat, min_time = (3, 0.02) if quick else (7, 0.2)
+    loop = asyncio.new_event_loop()
+    tmp = tempfile.TemporaryDirectory()
+    results: dict[str, dict[str, float]] = {}
+
+    def bench(name: str, fn: Callable[[], Any]) -> None:
+        results[name] = measure(fn, repeat=repeat, min_time=min_time)
+        r = results[name]
+        print(f"{name:<44} {r['min_ns'] / 1000:12.1f} µs  ({r['ops_per_s']:,.0f} op/s)")
+
+    try:
+        small = killmail_fixture()
+        large = large_killmail()
+        bench("model_validate[fixture]", lambda: Killmail.model_validate(small))
+        bench("model_validate[1200 att, 300 items]", lambda: Killmail.model_validate(large))
+
+        # Prix : cache chaud (tous les type_ids déjà connus)
+        prices = PricesCache(str(Path(tmp.name) / "prices.json"))
+        km_large = Killmail.model_validate(large)
+        type_ids = {km_large.victim.ship_type_id} | {
+            it.item_type_id for it in km_large.victim.items
+        }
+        for t in type_ids:
+            prices.set(t, 1000.0 + t)
+        bench(
+            "compute_killmail_value[warm, 300 items]",
+            lambda: loop.run_until_complete(compute_killmail_value(km_large, prices)),
+        )
+        bench("PricesCache.get", lambda: prices.get(2_150))
+        counter = iter(range(10**9))
+        bench("PricesCache.set", lambda: prices.set(50_000 + next(counter) % 500, 1.0))
+
+        # KillIndex à 10k entrées : kill déjà connu, puis nouveau kill (écriture)
+        index_path = Path(tmp.name) / "kills_index.json"
+        index_path.write_text(
+            json.dumps([{"id": i, "hash": f"h{i}", "posted": True} for i in range(10_000)])
+        )
+        idx = KillIndex(str(index_path))
+        bench(
+            "KillIndex.add_if_absent[10k, known]",
+            lambda: loop.run_until_complete(idx.add_if_absent(5_000, "h5000")),
+        )
+        fresh = iter(range(10_000, 10**9))
+        bench(
+            "KillIndex.add_if_absent[10k, new]",
+            lambda: loop.run_until_complete(idx.add_if_absent(next(fresh), "new")),
+        )
+
+        km_small = Killmail.model_validate(small)
+        kwargs = _embed_kwargs()
+        bench("build_embed_insight5[fixture]", lambda: build_embed_insight5(km_small, **kwargs))
+        bench(
+            "build_embed_insight5[1200 att, 300 items]",
+            lambda: build_embed_insight5(km_large, **kwargs),
+        )
+    finally:
+        loop.close()
+        tmp.cleanup()
+
+    try:
+        version = metadata.version("killmailbot")
+    except metadata.PackageNotFoundError:
+        version = "unknown"
+    return {
+        "schema": SCHEMA_VERSION,
+        "version": version,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "results": results,
+    }
+
+
+def compare(current: dict, baseline: dict, threshold: float) -> list[str]:
+    """Benchs plus lents que baseline × threshold (sur le min, le plus stable)."""
+    regressions = []
+    for name, cur in current["results"].items():
+        base = baseline.get("results", {}).get(name)
+        if not base:
+            continue
+        ratio = cur["min_ns"] / base["min_ns"]
+        flag = "REGRESSION" if ratio > threshold else ""
+        print(f"{name:<44} x{ratio:5.2f} vs {baseline.get('version', '?')} {flag}")
+        if flag:
+            regressions.append(name)
+    return regressions
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--quick", action="store_true", help="moins de répétitions (CI)")
+    parser.add_argument("--json", help="écrit les résultats dans ce fichier")
+    parser.add_argument("--compare", help="résultats JSON d'une release précédente")
+    parser.add_argument("--threshold", type=float, default=1.25)
+    args = parser.parse_args(argv)
+
+    report = run(quick=args.quick)
+    if args.json:
+        Path(args.json).write_text(json.dumps(report, indent=2), encoding="utf-8")
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text(encoding="utf-8"))
+        if compare(report, baseline, args.threshold):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
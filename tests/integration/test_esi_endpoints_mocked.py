@@ -37,3 +37,27 @@ async def test_fetch_price_short_series(monkeypatch):
     # Peu de jours => moyenne pondérée de ce qui existe
     # tolérance large car c'est un test de plage
     assert 35_000 <= price <= 50_000
+
+
+@pytest.mark.asyncio
+async def test_resolve_names_chunks_requests(monkeypatch):
+    from src.esi.universe import NAME_CACHE, NAMES_MAX_IDS, resolve_names
+
+    calls: list[int] = []
+
+    async def fake_post_json(self, url, json=None, **kwargs):
+        assert "/universe/names/" in url
+        calls.append(len(json))
+        return [{"id": i, "name": f"n{i}", "category": "character"} for i in json]
+
+    monkeypatch.setattr(AsyncESIClient, "post_json", fake_post_json)
+    NAME_CACHE.clear()
+    client = AsyncESIClient()
+    try:
+        names = await resolve_names(client, range(1, 2 * NAMES_MAX_IDS + 2))
+    finally:
+        await client.aclose()
+        NAME_CACHE.clear()
+
+    assert sorted(calls) == [1, NAMES_MAX_IDS, NAMES_MAX_IDS]
+    assert len(names) == 2 * NAMES_MAX_IDS + 1
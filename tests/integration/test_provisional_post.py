@@ -0,0 +1,156 @@
+import asyncio
+import types
+from datetime import datetime
+
+import discord
+
+from src.botui.embeds import VALUING_PLACEHOLDER, build_embed_insight5
+from src.botui.outbound import ChannelUnavailable, Outbound
+from src.core import processor
+from src.core.archive import KillArchive
+from src.core.models import Attacker, Killmail, Victim
+from src.core.processor import PipelineContext, process_ref
+from src.scheduler import loop
+from src.scheduler.loop import KillIndex
+
+KM = Killmail(
+    killmail_id=129783397,
+    killmail_hash="deadbeef",
+    killmail_time=datetime.fromisoformat("2025-09-10T12:33:06+00:00"),
+    solar_system_id=30004563,
+    victim=Victim(corporation_id=98420562, ship_type_id=11129, damage_taken=463, items=[]),
+    attackers=[Attacker(corporation_id=1, ship_type_id=20125, final_blow=True, damage_done=463)],
+)
+
+
+class Channel:
+    def __init__(self):
+        self.sent: list[list[str]] = []
+        self.edited: list[list[str]] = []
+
+    async def send(self, *, embeds: list[discord.Embed]):
+        self.sent.append([e.fields[1].value for e in embeds])
+        channel = self
+
+        class _Msg:
+            async def edit(self, *, embeds):
+                channel.edited.append([e.fields[1].value for e in embeds])
+
+        return _Msg()
+
+
+def make_ctx(outbound, *, price_delay: float):
+    async def fetch(_esi, _id, _hash):
+        return KM
+
+    async def value(_km, _prices):
+        await asyncio.sleep(price_delay)  # pricing à froid
+        return 12_000_000.0
+
+    async def drop(_km, _prices):
+        return 0.0
+
+    async def names(_esi, ids):
+        return [{"id": 11129, "name": "Shuttle"}]
+
+    async def region(_esi, _system_id):
+        return None
+
+    ctx = PipelineContext(
+        esi=None,
+        prices=None,
+        outbound=outbound,
+        settings=types.SimpleNamespace(
+            CORPORATION_ID="1", DISCORD_PROVISIONAL_POST=True, DISCORD_PROVISIONAL_GRACE_MS=20
+        ),
+        resolve_names=names,
+        get_region_id_for_system=region,
+        compute_killmail_value=value,
+        compute_killmail_drop=drop,
+        build_embed_insight5=build_embed_insight5,
+        peek_names=lambda ids: {},
+    )
+    return ctx, fetch
+
+
+def test_provisional_post_is_edited_once_enriched(monkeypatch):
+    async def scenario():
+        out, channel = Outbound(), Channel()
+        out.attach(channel)
+        out.start()
+        ctx, fetch = make_ctx(out, price_delay=0.2)
+        monkeypatch.setattr(processor, "fetch_killmail_details", fetch)
+
+        await (await process_ref(ctx, KM.killmail_id, KM.killmail_hash))
+        assert VALUING_PLACEHOLDER in channel.sent[0][0]
+
+        await asyncio.gather(*processor._completions)
+        assert "12.00 M" in channel.edited[0][0]
+
+    asyncio.run(scenario())
+
+
+def test_warm_caches_post_final_embed_directly(monkeypatch):
+    async def scenario():
+        out, channel = Outbound(), Channel()
+        out.attach(channel)
+        out.start()
+        ctx, fetch = make_ctx(out, price_delay=0)
+        monkeypatch.setattr(processor, "fetch_killmail_details", fetch)
+
+        await (await process_ref(ctx, KM.killmail_id, KM.killmail_hash))
+        assert "12.00 M" in channel.sent[0][0]
+        assert channel.edited == []
+
+    asyncio.run(scenario())
+
+
+def test_provisional_post_is_archived_once_enriched(tmp_path, monkeypatch):
+    async def scenario():
+        out, channel = Outbound(path=str(tmp_path / "outbox.jsonl")), Channel()
+        out.attach(channel)
+        out.start()
+        ctx, fetch = make_ctx(out, price_delay=0.2)
+        ctx.archive = KillArchive(str(tmp_path / "archive"))
+        monkeypatch.setattr(processor, "fetch_killmail_details", fetch)
+        idx = KillIndex(str(tmp_path / "kills_index.json"))
+
+        assert await loop.handle_ref(ctx, idx, KM.killmail_id, KM.killmail_hash, source="esi")
+        await asyncio.sleep(0.05)
+        # Post provisoire accepté et indexé, valeur pas encore connue : pas archivé
+        assert await idx.known_set() == {(KM.killmail_id, KM.killmail_hash)}
+        assert KM.killmail_id not in ctx.archive
+
+        await asyncio.gather(*loop._finalizers, *processor._completions)
+        assert KM.killmail_id in ctx.archive
+        assert ctx.archive.cols["total_value"][0] == 12_000_000.0
+
+    asyncio.run(scenario())
+
+
+def test_failed_post_is_not_archived_and_replayed_post_is(tmp_path, monkeypatch):
+    async def scenario():
+        outbox = str(tmp_path / "outbox.jsonl")
+        out = Outbound(path=outbox)
+        ctx, fetch = make_ctx(out, price_delay=0)
+        ctx.archive = KillArchive(str(tmp_path / "archive"))
+        monkeypatch.setattr(processor, "fetch_killmail_details", fetch)
+        idx = KillIndex(str(tmp_path / "kills_index.json"))
+
+        await loop.handle_ref(ctx, idx, KM.killmail_id, KM.killmail_hash, source="esi")
+        out.close(ChannelUnavailable("channel supprimé"))  # arrêt avant l'envoi
+        await asyncio.gather(*loop._finalizers)
+        await out.flush()
+        assert KM.killmail_id not in ctx.archive and await idx.known_set() == set()
+
+        # Redémarrage : le post rejoué depuis l'outbox est archivé une fois envoyé
+        restarted, channel = Outbound(path=outbox), Channel()
+        archive = KillArchive(str(tmp_path / "archive"))
+        assert await loop.restore_outbox(restarted, idx, archive=archive) == 1
+        restarted.attach(channel)
+        restarted.start()
+        await asyncio.gather(*loop._finalizers)
+        assert len(channel.sent) == 1 and KM.killmail_id in archive
+        assert archive.cols["total_value"][0] == 12_000_000.0
+
+    asyncio.run(scenario())
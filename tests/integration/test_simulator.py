@@ -0,0 +1,40 @@
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+SIM = Path(__file__).resolve().parents[1] / "sim" / "run_sim.py"
+
+
+def test_scheduler_posts_every_kill_against_simulator(tmp_path):
+    # Process séparé : les URLs de base sont lues à l'import de src.config
+    report_path = tmp_path / "report.json"
+    proc = subprocess.run(
+        [
+            sys.executable,
+            str(SIM),
+            "--kills",
+            "6",
+            "--poll-interval",
+            "1",
+            "--batch-window-ms",
+            "100",
+            "--discord-429",
+            "0.2",
+            "--retry-after",
+            "0.2",
+            "--timeout",
+            "60",
+            "--json",
+            str(report_path),
+        ],
+        capture_output=True,
+        text=True,
+        timeout=120,
+    )
+    assert proc.returncode == 0, proc.stdout[-2000:] + proc.stderr[-2000:]
+    report = json.loads(report_path.read_text())
+    assert report["posted"] == 6
+    assert report["duplicates"] == 0
+    assert report["detection_latency_s"]["max"] > 0
+    assert any(k.startswith("esi GET /esi/v1/killmails/") for k in report["requests"])
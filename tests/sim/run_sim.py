@@ -0,0 +1,268 @@
+"""Charge de bout en bout : le vrai start_scheduler contre le simulateur local.
+
+Exemples :
+    python tests/sim/run_sim.py --kills 200                       # rafale de 200 kills
+    python tests/sim/run_sim.py --esi-latency 5 --esi-429 0.2     # ESI lent + tempête de 429
+    python tests/sim/run_sim.py --arrival-rate 2 --discord webhook --json report.json
+
+Rapporte le débit (kills postés/s) et la latence de détection (arrivée du
+kill côté simulateur -> post accepté par le faux Discord)."""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import re
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any
+
+ROOT = Path(__file__).resolve().parents[2]
+sys.path[:0] = [str(ROOT), str(Path(__file__).resolve().parent)]
+
+from server import CORPORATION_ID, ServiceConfig, SimConfig, SimState, start_server  # noqa: E402
+
+CHANNEL_ID = 4242
+_KILL_URL = re.compile(r"/kill/(\d+)/")
+
+
+class PostLog:
+    """Premier post de chaque kill (les doublons sont comptés à part)."""
+
+    def __init__(self, state: SimState):
+        self.state = state
+        self.first: dict[int, float] = {}
+        self.duplicates = 0
+        self.messages = 0
+        self.done = asyncio.Event()
+
+    def record(self, embeds: list[dict], at: float) -> None:
+        self.messages += 1
+        for embed in embeds:
+            m = _KILL_URL.search(str(embed.get("url") or ""))
+            if not m:
+                continue
+            km_id = int(m.group(1))
+            if km_id in self.first:
+                self.duplicates += 1
+                continue
+            self.first[km_id] = at
+        if len(self.first) >= len(self.state.kills):
+            self.done.set()
+
+
+def _percentile(values: list[float], q: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[max(0, math.ceil(q * len(values)) - 1)]
+
+
+def _configure_env(cfg: SimConfig, base: str, args: argparse.Namespace) -> None:
+    """Le bot lit son .env à l'import : tout est posé avant d'importer src."""
+    env = {
+        "ESI_BASE_URL": f"{base}/esi",
+        "SSO_BASE_URL": f"{base}/sso",
+        "ZKB_BASE_URL": f"{base}/zkb/api",
+        "EVE_CLIENT_ID": "sim",
+        "EVE_CLIENT_SECRET": "sim",
+        "EVE_REFRESH_TOKEN": "sim",
+        "CORPORATION_ID": str(CORPORATION_ID),
+        "DISCORD_CHANNEL_ID": str(CHANNEL_ID),
+        "DISCORD_WEBHOOK_URL": (
+            f"{base}/discord/api/webhooks/1/sim" if args.discord == "webhook" else ""
+        ),
+        "DISCORD_BATCH_WINDOW_MS": str(args.batch_window_ms),
+        "POLL_INTERVAL_SECONDS": str(args.poll_interval),
+        "ZKB_ENABLE": "true" if args.zkb else "false",
+        "ZKB_INTERVAL_SECONDS": str(args.zkb_interval),
+        "ZKB_POST_ENABLE": "false",
+        "STATE_SNAPSHOT_ENABLE": "false",
+        "TENANTS_FILE": "",
+        "ROUTES_FILE": "",
+        "EVE_EXTRA_REFRESH_TOKENS": "",
+        "ESI_USER_AGENT": "killbot-sim",
+    }
+    os.environ.update(env)
+
+
+def _fake_discord(log: PostLog, svc: ServiceConfig, state: SimState) -> Any:
+    """Client et channel Discord en mémoire (mode gateway), mêmes erreurs
+    que l'API : 429 avec retry_after, 5xx."""
+    import discord
+
+    from src.botui.webhook import WebhookError
+
+    class FakeMessage:
+        def __init__(self, msg_id: int):
+            self.id = msg_id
+
+        async def edit(self, *, embeds: list[discord.Embed]) -> None:
+            await asyncio.sleep(svc.latency_s)
+
+    class FakeChannel(discord.abc.Messageable):
+        id = CHANNEL_ID
+
+        async def _get_channel(self) -> Any:
+            return self
+
+        async def send(self, *, embeds: list[discord.Embed]) -> FakeMessage:  # type: ignore[override]
+            await asyncio.sleep(svc.latency_s)
+            roll = state.rng.random()
+            if roll < svc.rate_limit_rate:
+                raise WebhookError(429, "rate limited", svc.retry_after_s)
+            if roll < svc.rate_limit_rate + svc.error_rate:
+                raise WebhookError(503, "simulated outage")
+            log.record([e.to_dict() for e in embeds], time.time())
+            return FakeMessage(state.next_message_id())
+
+    class FakeClient:
+        def __init__(self) -> None:
+            self.channel = FakeChannel()
+
+        def get_channel(self, channel_id: int) -> Any:
+            return self.channel if channel_id == CHANNEL_ID else None
+
+        async def fetch_channel(self, channel_id: int) -> Any:
+            return self.get_channel(channel_id)
+
+    return FakeClient()
+
+
+async def run(cfg: SimConfig, args: argparse.Namespace) -> dict[str, Any]:
+    state = SimState(cfg)
+    log = PostLog(state)
+    state.on_post = log.record
+    runner, base = await start_server(state)
+    _configure_env(cfg, base, args)
+    os.makedirs("data", exist_ok=True)
+
+    from src.config import settings
+    from src.core.latency import TRACES
+    from src.core.tenants import load_tenants
+    from src.scheduler.loop import start_scheduler
+
+    client = _fake_discord(log, cfg.discord, state) if args.discord == "gateway" else None
+    started = time.time()
+    await start_scheduler(client, load_tenants(settings))
+    try:
+        await asyncio.wait_for(log.done.wait(), timeout=args.timeout)
+        timed_out = False
+    except TimeoutError:
+        timed_out = True
+    finished = time.time()
+    await runner.cleanup()
+
+    latencies = [at - state.by_id[km_id].at for km_id, at in log.first.items()]
+    first_arrival = min(k.at for k in state.kills)
+    last_post = max(log.first.values(), default=finished)
+    pipeline = {
+        f"{source}/{segment}": {
+            "p50": _percentile(v, 0.5),
+            "p90": _percentile(v, 0.9),
+            "count": len(v),
+        }
+        for (source, segment), v in TRACES.summary().items()
+        if source == "all"
+    }
+    return {
+        "config": {
+            "kills": cfg.kills,
+            "arrival_rate": cfg.arrival_rate,
+            "discord": args.discord,
+            "esi": vars(cfg.esi),
+            "zkb": vars(cfg.zkb),
+            "discord_service": vars(cfg.discord),
+            "poll_interval": args.poll_interval,
+        },
+        "timed_out": timed_out,
+        "elapsed_s": finished - started,
+        "posted": len(log.first),
+        "duplicates": log.duplicates,
+        "messages": log.messages,
+        "throughput_kills_per_s": len(log.first) / max(1e-9, last_post - first_arrival),
+        "detection_latency_s": {
+            "p50": _percentile(latencies, 0.5),
+            "p90": _percentile(latencies, 0.9),
+            "p99": _percentile(latencies, 0.99),
+            "max": max(latencies, default=0.0),
+        },
+        "pipeline_latency_s": pipeline,
+        "requests": {
+            f"{svc} {route} {status}": n
+            for (svc, route, status), n in sorted(state.requests.items())
+        },
+    }
+
+
+def _service(args: argparse.Namespace, name: str) -> ServiceConfig:
+    return ServiceConfig(
+        latency_s=getattr(args, f"{name}_latency"),
+        jitter_s=getattr(args, f"{name}_jitter"),
+        error_rate=getattr(args, f"{name}_5xx"),
+        rate_limit_rate=getattr(args, f"{name}_429"),
+        retry_after_s=args.retry_after,
+    )
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--kills", type=int, default=200)
+    p.add_argument("--arrival-rate", type=float, default=0.0, help="kills/s (0 = rafale)")
+    p.add_argument("--attackers", type=int, default=5)
+    p.add_argument("--items", type=int, default=20)
+    p.add_argument("--esi-cache", type=float, default=0.0, help="cache de la liste recent (s)")
+    p.add_argument("--zkb-delay", type=float, default=5.0)
+    for name in ("esi", "zkb", "discord"):
+        p.add_argument(f"--{name}-latency", type=float, default=0.02)
+        p.add_argument(f"--{name}-jitter", type=float, default=0.0)
+        p.add_argument(f"--{name}-5xx", type=float, default=0.0)
+        p.add_argument(f"--{name}-429", type=float, default=0.0)
+    p.add_argument("--retry-after", type=float, default=1.0)
+    p.add_argument("--discord", choices=("gateway", "webhook"), default="gateway")
+    p.add_argument("--zkb", action="store_true", help="active aussi la source zKill")
+    p.add_argument("--zkb-interval", type=int, default=10)
+    p.add_argument("--poll-interval", type=int, default=2)
+    p.add_argument("--batch-window-ms", type=int, default=500)
+    p.add_argument("--timeout", type=float, default=600.0)
+    p.add_argument("--seed", type=int, default=1)
+    p.add_argument("--json", help="écrit le rapport dans ce fichier")
+    return p.parse_args(argv)
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = parse_args(argv)
+    cfg = SimConfig(
+        kills=args.kills,
+        arrival_rate=args.arrival_rate,
+        attackers=args.attackers,
+        items=args.items,
+        esi_cache_s=args.esi_cache,
+        zkb_delay_s=args.zkb_delay,
+        seed=args.seed,
+        esi=_service(args, "esi"),
+        zkb=_service(args, "zkb"),
+        discord=_service(args, "discord"),
+    )
+    # Le bot écrit dans data/ (chemin relatif) : répertoire jetable
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        try:
+            report = asyncio.run(run(cfg, args))
+        finally:
+            os.chdir(cwd)
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.json:
+        Path(args.json).write_text(text, encoding="utf-8")
+    return 1 if report["timed_out"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,296 @@
+"""Serveur HTTP local qui imite ESI, SSO, zKill et les webhooks Discord.
+
+Les kills "arrivent" selon SimConfig (rafale ou débit constant) ; chaque
+service a sa latence, son taux de 5xx et de 429 (avec Retry-After et en-têtes
+de rate-limit). Ne dépend pas de src/ : le driver configure le bot (URLs de
+base) avant de l'importer."""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import random
+import time
+from collections import Counter
+from collections.abc import Callable
+from dataclasses import dataclass, field
+from datetime import UTC, datetime
+
+from aiohttp import web
+
+CORPORATION_ID = 98_000_001
+FIRST_KILL_ID = 130_000_000
+TYPE_POOL = list(range(2_000, 2_060))
+SHIP_POOL = [587, 11129, 17738, 24690, 29344]
+SYSTEM_POOL = list(range(30_000_001, 30_000_021))
+
+
+@dataclass
+class ServiceConfig:
+    latency_s: float = 0.02
+    jitter_s: float = 0.0
+    error_rate: float = 0.0  # proportion de réponses 5xx
+    rate_limit_rate: float = 0.0  # proportion de réponses 429
+    retry_after_s: float = 1.0
+
+
+@dataclass
+class SimConfig:
+    kills: int = 200
+    # 0 => rafale : tous les kills arrivent à start_delay_s
+    arrival_rate: float = 0.0
+    start_delay_s: float = 1.0
+    attackers: int = 5
+    items: int = 20
+    # Durée de cache de la liste "recent" ESI (un kill n'y apparaît qu'au rafraîchissement)
+    esi_cache_s: float = 0.0
+    # Délai avant qu'un kill soit listé sur zKill
+    zkb_delay_s: float = 5.0
+    seed: int = 1
+    esi: ServiceConfig = field(default_factory=ServiceConfig)
+    zkb: ServiceConfig = field(default_factory=ServiceConfig)
+    discord: ServiceConfig = field(default_factory=ServiceConfig)
+
+
+@dataclass
+class SimKill:
+    km_id: int
+    km_hash: str
+    at: float  # epoch d'arrivée (= killmail_time)
+    body: dict
+
+
+class SimState:
+    """Kills générés et compteurs de requêtes (par service, route, status)."""
+
+    def __init__(self, cfg: SimConfig):
+        self.cfg = cfg
+        self.rng = random.Random(cfg.seed)
+        self.t0 = time.time()
+        self.kills = [self._make_kill(i) for i in range(cfg.kills)]
+        self.by_id = {k.km_id: k for k in self.kills}
+        self.requests: Counter[tuple[str, str, int]] = Counter()
+        self._recent_snapshot: tuple[float, list[dict]] = (-1.0, [])
+        self._message_id = 0
+        # Appelé à chaque post webhook accepté : (embeds, epoch)
+        self.on_post: Callable[[list[dict], float], None] = lambda embeds, at: None
+
+    def _arrival(self, i: int) -> float:
+        start = self.t0 + self.cfg.start_delay_s
+        return start if self.cfg.arrival_rate <= 0 else start + i / self.cfg.arrival_rate
+
+    def _make_kill(self, i: int) -> SimKill:
+        rng = self.rng
+        km_id = FIRST_KILL_ID + i
+        km_hash = hashlib.sha1(str(km_id).encode()).hexdigest()
+        at = self._arrival(i)
+        attackers = [
+            {
+                "character_id": 91_000_000 + rng.randrange(5_000),
+                "corporation_id": CORPORATION_ID if n == 0 else 98_500_000 + rng.randrange(50),
+                "damage_done": rng.randrange(1, 1_000),
+                "final_blow": n == 0,
+                "security_status": 0.0,
+                "ship_type_id": rng.choice(SHIP_POOL),
+            }
+            for n in range(max(1, self.cfg.attackers))
+        ]
+        items = [
+            {
+                "flag": 5,
+                "item_type_id": rng.choice(TYPE_POOL),
+                "quantity_destroyed": rng.randrange(0, 3),
+                "quantity_dropped": rng.randrange(0, 2),
+                "singleton": 0,
+            }
+            for _ in range(self.cfg.items)
+        ]
+        body = {
+            "killmail_id": km_id,
+            "killmail_time": datetime.fromtimestamp(at, tz=UTC).strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "solar_system_id": rng.choice(SYSTEM_POOL),
+            "attackers": attackers,
+            "victim": {
+                "character_id": 92_000_000 + rng.randrange(5_000),
+                "corporation_id": 98_900_000 + rng.randrange(50),
+                "damage_taken": sum(a["damage_done"] for a in attackers),
+                "ship_type_id": rng.choice(SHIP_POOL),
+                "items": items,
+            },
+        }
+        return SimKill(km_id, km_hash, at, body)
+
+    def arrived(self, now: float, delay: float = 0.0) -> list[SimKill]:
+        return [k for k in self.kills if k.at + delay <= now]
+
+    def recent_list(self, now: float) -> list[dict]:
+        """Liste "recent" ESI, figée pendant esi_cache_s comme le cache CCP."""
+        built_at, data = self._recent_snapshot
+        if built_at < 0 or now - built_at >= self.cfg.esi_cache_s:
+            data = [
+                {"killmail_id": k.km_id, "killmail_hash": k.km_hash}
+                for k in sorted(self.arrived(now), key=lambda k: -k.km_id)
+            ]
+            self._recent_snapshot = (now, data)
+        return data
+
+    def next_message_id(self) -> int:
+        self._message_id += 1
+        return self._message_id
+
+
+def _json(data: object, status: int = 200, headers: dict | None = None) -> web.Response:
+    return web.Response(
+        text=json.dumps(data), status=status, content_type="application/json", headers=headers
+    )
+
+
+async def _emulate(
+    state: SimState, service: str, svc: ServiceConfig, request: web.Request
+) -> web.Response | None:
+    """Latence puis, selon les taux configurés, un 429 ou un 5xx."""
+    delay = svc.latency_s + (state.rng.uniform(0, svc.jitter_s) if svc.jitter_s else 0.0)
+    if delay > 0:
+        await asyncio.sleep(delay)
+    roll = state.rng.random()
+    if roll < svc.rate_limit_rate:
+        retry = svc.retry_after_s
+        headers = {
+            "Retry-After": str(int(retry) or 1),
+            "X-RateLimit-Remaining": "0",
+            "X-RateLimit-Reset-After": str(retry),
+        }
+        return _json({"error": "rate limited", "retry_after": retry}, 429, headers)
+    if roll < svc.rate_limit_rate + svc.error_rate:
+        return _json({"error": "simulated outage"}, 503)
+    return None
+
+
+def build_app(state: SimState) -> web.Application:
+    cfg = state.cfg
+
+    @web.middleware
+    async def count_requests(request: web.Request, handler):
+        resp = await handler(request)
+        route = request.match_info.route.resource
+        name = route.canonical if route is not None else request.path
+        service = name.split("/", 2)[1] if name.count("/") > 1 else name
+        state.requests[(service, f"{request.method} {name}", resp.status)] += 1
+        return resp
+
+    app = web.Application(middlewares=[count_requests])
+    routes = web.RouteTableDef()
+
+    # --- SSO ---
+    @routes.post("/sso/v2/oauth/token")
+    async def token(request: web.Request) -> web.Response:
+        return _json({"access_token": "sim-access", "expires_in": 1200, "token_type": "Bearer"})
+
+    # --- ESI ---
+    async def esi_gate(request: web.Request) -> web.Response | None:
+        return await _emulate(state, "esi", cfg.esi, request)
+
+    @routes.get("/esi/v1/corporations/{corp}/killmails/recent/")
+    async def recent(request: web.Request) -> web.Response:
+        if (err := await esi_gate(request)) is not None:
+            return err
+        data = state.recent_list(time.time())
+        etag = '"' + hashlib.md5(json.dumps(data).encode()).hexdigest() + '"'
+        headers = {"ETag": etag, "X-ESI-Error-Limit-Remain": "100"}
+        if request.headers.get("If-None-Match") == etag:
+            return web.Response(status=304, headers=headers)
+        return _json(data, headers=headers)
+
+    @routes.get("/esi/v1/killmails/{km_id}/{km_hash}/")
+    async def killmail(request: web.Request) -> web.Response:
+        if (err := await esi_gate(request)) is not None:
+            return err
+        kill = state.by_id.get(int(request.match_info["km_id"]))
+        if kill is None or kill.km_hash != request.match_info["km_hash"]:
+            return _json({"error": "not found"}, 404)
+        return _json(kill.body, headers={"ETag": f'"{kill.km_hash}"'})
+
+    @routes.post("/esi/latest/universe/names/")
+    async def names(request: web.Request) -> web.Response:
+        if (err := await esi_gate(request)) is not None:
+            return err
+        ids = await request.json()
+        return _json([{"id": i, "name": f"Sim {i}", "category": "character"} for i in ids])
+
+    @routes.get("/esi/latest/universe/systems/{system_id}/")
+    async def system(request: web.Request) -> web.Response:
+        if (err := await esi_gate(request)) is not None:
+            return err
+        sid = int(request.match_info["system_id"])
+        return _json(
+            {"system_id": sid, "name": f"SIM-{sid}", "constellation_id": 20_000_000 + sid % 5}
+        )
+
+    @routes.get("/esi/latest/universe/constellations/{cid}/")
+    async def constellation(request: web.Request) -> web.Response:
+        if (err := await esi_gate(request)) is not None:
+            return err
+        cid = int(request.match_info["cid"])
+        return _json({"constellation_id": cid, "region_id": 10_000_000 + cid % 3})
+
+    @routes.get("/esi/latest/markets/{region_id}/history/")
+    async def history(request: web.Request) -> web.Response:
+        if (err := await esi_gate(request)) is not None:
+            return err
+        type_id = int(request.query.get("type_id", "0"))
+        return _json(
+            [
+                {"date": f"2025-01-0{d}", "average": 1_000.0 + type_id, "volume": 10 + d}
+                for d in range(1, 8)
+            ]
+        )
+
+    @routes.get("/esi/status")
+    async def status(request: web.Request) -> web.Response:
+        return _json({"players": 0})
+
+    # --- zKill ---
+    @routes.get("/zkb/api/corporationID/{corp}/page/{page}/")
+    async def zkb_page(request: web.Request) -> web.Response:
+        if (err := await _emulate(state, "zkb", cfg.zkb, request)) is not None:
+            return err
+        if request.match_info["page"] != "1":
+            return _json([])
+        listed = sorted(state.arrived(time.time(), cfg.zkb_delay_s), key=lambda k: -k.km_id)
+        return _json([{"killmail_id": k.km_id, "zkb": {"hash": k.km_hash}} for k in listed[:200]])
+
+    # --- Discord (webhook, mode headless) ---
+    @routes.get("/discord/api/webhooks/{hook}/{token}")
+    async def webhook_get(request: web.Request) -> web.Response:
+        return _json({"id": request.match_info["hook"], "type": 1})
+
+    @routes.post("/discord/api/webhooks/{hook}/{token}")
+    async def webhook_post(request: web.Request) -> web.Response:
+        if (err := await _emulate(state, "discord", cfg.discord, request)) is not None:
+            return err
+        payload = await request.json()
+        msg_id = state.next_message_id()
+        state.on_post(payload.get("embeds") or [], time.time())
+        return _json({"id": str(msg_id)})
+
+    @routes.patch("/discord/api/webhooks/{hook}/{token}/messages/{msg_id}")
+    async def webhook_edit(request: web.Request) -> web.Response:
+        if (err := await _emulate(state, "discord", cfg.discord, request)) is not None:
+            return err
+        return _json({"id": request.match_info["msg_id"]})
+
+    app.add_routes(routes)
+    return app
+
+
+async def start_server(state: SimState, host: str = "127.0.0.1") -> tuple[web.AppRunner, str]:
+    """Démarre le serveur sur un port libre ; renvoie (runner, base_url)."""
+    runner = web.AppRunner(build_app(state), access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, host, 0)
+    await site.start()
+    server = site._server
+    assert server is not None
+    port = server.sockets[0].getsockname()[1]  # type: ignore[union-attr]
+    return runner, f"http://{host}:{port}"
@@ -0,0 +1,131 @@
+import json
+from datetime import UTC, datetime
+
+import pytest
+
+from src.botui.reports import format_summary, format_top
+from src.core import archive as archive_mod
+from src.core.archive import KillArchive, open_archive, period_bounds
+
+NOW = datetime(2025, 9, 17, 15, 30, tzinfo=UTC)
+T = int(NOW.timestamp())
+
+
+def rec(km_id, t, *, kill=True, value=100.0, pilot=1, corp=10, ship=587):
+    side = "final" if kill else "victim"
+    return {
+        "killmail_id": km_id,
+        "time": t,
+        "solar_system_id": 30000142,
+        "region_id": 10000002,
+        "ship_type_id": ship,
+        f"{side}_character_id": pilot,
+        f"{side}_corporation_id": corp,
+        "total_value": value,
+        "dropped_value": value / 2,
+        "is_kill": kill,
+    }
+
+
+def test_period_bounds():
+    assert period_bounds("day", NOW) == (int(datetime(2025, 9, 17, tzinfo=UTC).timestamp()), T + 1)
+    assert period_bounds("week", NOW)[0] == T - 7 * 86400
+    assert period_bounds("month", NOW)[0] == int(datetime(2025, 9, 1, tzinfo=UTC).timestamp())
+    assert period_bounds("all", NOW) == (0, T + 1)
+    with pytest.raises(ValueError):
+        period_bounds("year", NOW)
+
+
+def test_add_keeps_time_order_dedups_and_reloads(tmp_path):
+    archive = KillArchive(str(tmp_path))
+    assert archive.add_many([rec(3, T), rec(1, T - 300)]) == 2
+    assert archive.add(rec(2, T - 100))  # rattrapage : inséré au milieu
+    assert not archive.add(rec(2, T - 100))
+    assert list(archive.cols["killmail_id"]) == [1, 2, 3]
+
+    # Sans boucle asyncio l'écriture est immédiate ; disque en ordre d'arrivée
+    reloaded = KillArchive(str(tmp_path))
+    assert list(reloaded.cols["killmail_id"]) == [1, 2, 3]
+    assert list(reloaded.cols["time"]) == [T - 300, T - 100, T]
+    assert 2 in reloaded and 4 not in reloaded
+
+
+def test_interrupted_append_is_truncated(tmp_path):
+    KillArchive(str(tmp_path)).add_many([rec(1, T - 10), rec(2, T)])
+    with open(tmp_path / "time.bin", "ab") as f:
+        f.write(b"\x01\x02\x03")  # ligne à moitié écrite
+    with open(tmp_path / "killmail_id.bin", "ab") as f:
+        f.write((3).to_bytes(8, "little"))
+    archive = KillArchive(str(tmp_path))
+    assert len(archive) == 2
+    assert list(archive.cols["killmail_id"]) == [1, 2]
+
+    # Les fichiers sont tronqués aussi : un ajout ultérieur reste aligné
+    archive.add(rec(4, T + 10))
+    reloaded = KillArchive(str(tmp_path))
+    assert list(reloaded.cols["killmail_id"]) == [1, 2, 4]
+    assert list(reloaded.cols["time"]) == [T - 10, T, T + 10]
+
+
+def test_summary_and_top(tmp_path):
+    archive = KillArchive(str(tmp_path))
+    archive.add_many(
+        [
+            rec(1, T - 40 * 86400, value=10_000.0, pilot=7),  # hors du mois
+            rec(2, T - 3600, value=300.0, pilot=7),
+            rec(3, T - 1800, value=500.0, pilot=8),
+            rec(4, T - 900, value=100.0, pilot=7, corp=0),
+            rec(5, T - 60, kill=False, value=200.0, pilot=9, ship=11198),
+        ]
+    )
+    start, end = period_bounds("month", NOW)
+    s = archive.summary(start, end)
+    assert (s["kills"], s["losses"]) == (3, 1)
+    assert (s["isk_killed"], s["isk_lost"], s["isk_dropped"]) == (900.0, 200.0, 550.0)
+    assert s["efficiency"] == pytest.approx(900 / 1100)
+    assert s["biggest"] == {"killmail_id": 3, "total_value": 500.0, "is_kill": True}
+
+    assert archive.top(start, end, by="pilot") == [(8, 500.0, 1), (7, 400.0, 2)]
+    assert archive.top(start, end, by="pilot", metric="count") == [(7, 400.0, 2), (8, 500.0, 1)]
+    assert archive.top(start, end, by="corp") == [(10, 800.0, 2)]  # ID 0 ignoré
+    assert archive.top(start, end, by="ship", kills=False) == [(11198, 200.0, 1)]
+    assert archive.top(start, end, by="pilot", limit=1) == [(8, 500.0, 1)]
+    with pytest.raises(ValueError):
+        archive.top(start, end, by="fleet")
+
+
+async def test_reports_format(tmp_path, monkeypatch):
+    monkeypatch.setattr("src.botui.reports.period_bounds", lambda p: period_bounds(p, NOW))
+    archive = KillArchive(str(tmp_path))
+    assert "No killmail" in format_summary(archive, "day")
+    archive.add_many([rec(1, T - 60, value=2_500_000.0, pilot=7)])
+    await archive.flush()
+
+    text = format_summary(archive, "day")
+    assert "Kills : 1" in text and "zkillboard.com/kill/1/" in text
+
+    async def resolve_names(esi, ids):
+        return [{"id": 7, "name": "Pilot Seven"}]
+
+    text = await format_top(
+        archive,
+        period="week",
+        by="pilot",
+        kills=True,
+        metric="isk",
+        limit=5,
+        resolve_names=resolve_names,
+    )
+    assert "1. [Pilot Seven](https://zkillboard.com/character/7/)" in text
+
+
+def test_open_archive_imports_legacy_jsonl_once(tmp_path, monkeypatch):
+    monkeypatch.setattr(archive_mod, "_ARCHIVES", {})
+    legacy = tmp_path / "archive.jsonl"
+    legacy.write_text(
+        "\n".join(json.dumps(r) for r in (rec(2, T), rec(1, T - 5))) + "\nnot json\n",
+        encoding="utf-8",
+    )
+    archive = open_archive(str(tmp_path / "archive"), legacy_jsonl=str(legacy))
+    assert list(archive.cols["killmail_id"]) == [1, 2]
+    assert open_archive(str(tmp_path / "archive"), legacy_jsonl=str(legacy)) is archive
@@ -0,0 +1,165 @@
+import asyncio
+import dataclasses
+import json
+import types
+from datetime import date, datetime, timedelta
+
+import pytest
+
+from src.core import archive as archive_mod
+from src.core import processor
+from src.core.archive import KillArchive
+from src.core.models import Attacker, Killmail, Victim
+from src.core.processor import PipelineContext
+from src.core.ratelimit import RateLimiter
+from src.core.store import JSONStore
+from src.scheduler import backfill
+from src.scheduler.backfill import Backfill, parse_job
+from src.zkb.zkill import KillmailRef
+
+CORP = 98092494
+T0 = datetime.fromisoformat("2025-09-10T12:00:00+00:00")
+
+
+def make_km(km_id: int, km_hash: str) -> Killmail:
+    return Killmail(
+        killmail_id=km_id,
+        killmail_hash=km_hash,
+        killmail_time=T0 + timedelta(minutes=km_id),
+        solar_system_id=30004563,
+        victim=Victim(corporation_id=1, ship_type_id=587, damage_taken=10),
+        attackers=[Attacker(corporation_id=CORP, damage_done=10, final_blow=True)],
+    )
+
+
+def make_ctx() -> PipelineContext:
+    async def resolve_names(esi, ids):
+        return []
+
+    async def region(esi, system_id):
+        return 10000002
+
+    async def value(km, prices):
+        return 1_000.0
+
+    return PipelineContext(
+        esi=None,
+        prices=None,
+        outbound=None,
+        settings=types.SimpleNamespace(CORPORATION_ID=CORP),
+        resolve_names=resolve_names,
+        get_region_id_for_system=region,
+        compute_killmail_value=value,
+        compute_killmail_drop=value,
+        build_embed_insight5=lambda *a, **k: None,
+    )
+
+
+def test_parse_job_pages_and_months():
+    assert parse_job(CORP, pages="3-7").page_range() == (3, 7)
+    assert parse_job(CORP).page_range() == (1, 10)
+    job = parse_job(CORP, since="2024-11-15", until="2025-02-03")
+    assert job.segments() == [(2025, 2), (2025, 1), (2024, 12), (2024, 11)]
+    assert job.until == date(2025, 2, 3)
+    with pytest.raises(ValueError):
+        parse_job(CORP, pages="5-2")
+    with pytest.raises(ValueError):
+        parse_job(CORP, until="2025-01-01")
+
+
+async def test_backfill_checkpoints_each_page_and_resumes(tmp_path, monkeypatch):
+    # 3 pages de 2 kills, plus récent d'abord comme zKill
+    history = {p: [KillmailRef(i, f"h{i}") for i in (8 - 2 * p, 7 - 2 * p)] for p in (1, 2, 3)}
+    calls: list[int] = []
+    fail_on = {2}
+
+    async def fake_page(s, corporation_id, page, *, year=None, month=None):
+        calls.append(page)
+        if page in fail_on:
+            fail_on.discard(page)
+            raise RuntimeError("zKill down")
+        return history.get(page, [])
+
+    async def fake_details(esi, km_id, km_hash, *, limiter=None):
+        return make_km(km_id, km_hash)
+
+    monkeypatch.setattr(backfill, "fetch_killrefs_page", fake_page)
+    monkeypatch.setattr(backfill, "fetch_killmail_details", fake_details)
+    monkeypatch.setattr(processor, "fetch_killmail_details", fake_details)
+    monkeypatch.setattr(backfill, "ZKB_PAGE_INTERVAL_S", 0.0)
+    # Écriture d'archive plus lente que celle du checkpoint
+    monkeypatch.setattr(archive_mod, "WRITE_DELAY_S", 1.0)
+
+    def make(job):
+        return Backfill(
+            make_ctx(),
+            job,
+            archive=KillArchive(str(tmp_path / "archive")),
+            checkpoint=JSONStore(str(tmp_path / "backfill.json"), {}),
+            limiter=RateLimiter(100),
+        )
+
+    job = parse_job(CORP, pages="1-3")
+    first = make(job)
+    with pytest.raises(RuntimeError):
+        await first.run()  # page 2 en échec : la page 1 est dans le checkpoint
+    saved = json.loads((tmp_path / "backfill.json").read_text())
+    assert saved["progress"]["page"] == 1 and saved["progress"]["archived"] == 2
+    # ... et ses kills sont sur disque avant lui (sans flush explicite)
+    assert len(KillArchive(str(tmp_path / "archive")).cols["killmail_id"]) == 2
+
+    second = make(job)
+    assert second.resume()
+    progress = await second.run()
+    assert progress.done and progress.archived == 6 and progress.errors == 0
+
+    await second.archive.flush()
+    archive = KillArchive(str(tmp_path / "archive"))  # relu depuis le disque
+    assert list(archive.cols["killmail_id"]) == [1, 2, 3, 4, 5, 6]  # trié par temps
+    assert set(archive.cols["region_id"]) == {10000002}
+    assert archive.summary(0, 2**40)["kills"] == 6
+    assert archive.summary(0, 2**40)["isk_killed"] == 6_000.0
+    # Reprise à la page 2 (la page 1 n'est pas relistée)
+    assert calls.count(1) == 1
+
+
+async def test_backfill_archives_before_posting_and_counts_post_errors(tmp_path, monkeypatch):
+    async def fake_page(s, corporation_id, page, *, year=None, month=None):
+        return [KillmailRef(i, f"h{i}") for i in (3, 2, 1)]
+
+    async def fake_details(esi, km_id, km_hash, *, limiter=None):
+        return make_km(km_id, km_hash)
+
+    monkeypatch.setattr(backfill, "fetch_killrefs_page", fake_page)
+    monkeypatch.setattr(backfill, "fetch_killmail_details", fake_details)
+    monkeypatch.setattr(processor, "fetch_killmail_details", fake_details)
+    monkeypatch.setattr(backfill, "ZKB_PAGE_INTERVAL_S", 0.0)
+
+    posted: list[int] = []
+
+    class FailingOutbound:
+        def __init__(self):
+            self.n = 0
+
+        def submit(self, embed, *, meta=None, **extra):
+            self.n += 1
+            delivery = asyncio.get_running_loop().create_future()
+            if self.n == 2:
+                delivery.set_exception(RuntimeError("channel refusé"))
+            else:
+                posted.append(self.n)
+                delivery.set_result(None)
+            return delivery
+
+    ctx = dataclasses.replace(make_ctx(), outbound=FailingOutbound())
+    bf = Backfill(
+        ctx,
+        parse_job(CORP, pages="1-1", post=True),
+        archive=KillArchive(str(tmp_path / "archive")),
+        checkpoint=JSONStore(str(tmp_path / "backfill.json"), {}),
+        limiter=RateLimiter(100),
+    )
+    progress = await bf.run()
+    assert progress.done and progress.archived == 3
+    assert progress.posted == 2 and progress.errors == 1 and posted == [1, 3]
+    assert list(KillArchive(str(tmp_path / "archive")).cols["killmail_id"]) == [1, 2, 3]
@@ -1,5 +1,6 @@
 import asyncio
 
+from src.scheduler import loop
 from src.scheduler.loop import KillIndex
 
 
@@ -20,7 +21,90 @@ def test_kill_index_roundtrip(tmp_path):
     known = asyncio.run(idx.known_set())
     assert known == {(1, "hash1"), (2, "hash2")}
 
-    # réécriture filtrée (simulateur de cleanup)
-    asyncio.run(idx.rewrite_with({(2, "hash2")}))
+    # expiration par watermark (simulateur de cleanup)
+    assert asyncio.run(idx.expire_below(2)) == 1
     known2 = asyncio.run(idx.known_set())
     assert known2 == {(2, "hash2")}
+    assert asyncio.run(idx.expire_below(2)) == 0
+
+
+def test_kill_index_reservations(tmp_path):
+    idx = KillIndex(str(tmp_path / "kills_index.json"))
+
+    async def scenario():
+        # ESI réserve : zKill ne peut pas réserver le même kill en parallèle
+        assert await idx.reserve(1, "hash1") is True
+        assert await idx.reserve(1, "hash1") is False
+
+        # échec du post : la réservation est libérée et le kill retentable
+        await idx.release(1, "hash1")
+        assert await idx.reserve(1, "hash1") is True
+
+        # post réussi : le kill est connu et ne peut plus être réservé
+        await idx.commit(1, "hash1")
+        assert await idx.known_set() == {(1, "hash1")}
+        assert await idx.reserve(1, "hash1") is False
+
+    asyncio.run(scenario())
+
+
+def test_kill_index_reads_the_file_once(tmp_path, monkeypatch):
+    idx = KillIndex(str(tmp_path / "kills_index.json"))
+    asyncio.run(idx.add_if_absent(1, "hash1"))
+
+    def no_read():
+        raise AssertionError("KillIndex must not re-read its file")
+
+    monkeypatch.setattr(idx.store, "read", no_read)
+    assert asyncio.run(idx.reserve(1, "hash1")) is False
+    assert asyncio.run(idx.reserve(2, "hash2")) is True
+    assert len(idx) == 1
+
+    # Un nouvel index relit le fichier écrit
+    assert asyncio.run(KillIndex(str(tmp_path / "kills_index.json")).known_set()) == {(1, "hash1")}
+
+
+def test_kill_index_gives_up_after_max_attempts(tmp_path):
+    idx = KillIndex(str(tmp_path / "kills_index.json"))
+
+    async def scenario():
+        for _ in range(loop.MAX_ATTEMPTS - 1):
+            assert await idx.reserve(1, "hash1") is True
+            assert await idx.fail(1, "hash1") is True
+        assert await idx.reserve(1, "hash1") is True
+        assert await idx.fail(1, "hash1") is False  # dernier essai
+        assert await idx.reserve(1, "hash1") is False
+        assert idx.inflight() == 0
+
+        # sorti de la fenêtre : le compteur expire avec l'index
+        await idx.expire_below(2)
+        assert await idx.reserve(1, "hash1") is True
+
+    asyncio.run(scenario())
+
+
+def test_failed_post_invalidates_etag_only_for_transient_errors(tmp_path):
+    idx = KillIndex(str(tmp_path / "kills_index.json"))
+    invalidated = []
+
+    async def post(error):
+        delivery = asyncio.get_running_loop().create_future()
+        delivery.set_exception(error)
+        await loop._finalize_post(
+            None, idx, 1, "hash1", delivery, source="esi",
+            on_failure=lambda: invalidated.append(error),
+        )  # fmt: skip
+
+    async def scenario():
+        await idx.reserve(1, "hash1")
+        await post(ValueError("payload refusé"))
+        assert invalidated == []  # non retentable : l'ETag est conservé
+        await idx.reserve(1, "hash1")
+        await post(TimeoutError())
+        assert len(invalidated) == 1
+        await idx.reserve(1, "hash1")
+        await post(TimeoutError())  # essais épuisés : abandon, pas de relance
+        assert len(invalidated) == 1
+        assert await idx.reserve(1, "hash1") is False
+
+    asyncio.run(scenario())
@@ -0,0 +1,44 @@
+from datetime import UTC, datetime
+
+import src.core.latency as latency
+from src.core.latency import LatencyTracker, percentile
+
+
+def test_percentile_nearest_rank():
+    values = sorted(float(i) for i in range(1, 101))
+    assert percentile(values, 0.5) == 50.0
+    assert percentile(values, 0.9) == 90.0
+    assert percentile(values, 0.99) == 99.0
+    assert percentile([], 0.5) == 0.0
+
+
+def test_trace_segments_and_rolling_window(monkeypatch):
+    clock = iter([100.0, 102.0, 105.0, 106.0, 200.0, 201.0, 203.0, 204.0])
+    monkeypatch.setattr(latency.time, "time", lambda: next(clock))
+    tracker = LatencyTracker(window=1)
+    km_time = datetime.fromtimestamp(40.0, tz=UTC)
+
+    tracker.seen(1, "esi")
+    tracker.seen(1, "zkb")  # 2e source : la 1re est gardée
+    tracker.details(1, km_time)
+    tracker.enriched(1)
+    trace = tracker.posted(1)
+    assert trace is not None and trace.source == "esi"
+    assert trace.span("visibility") == 60.0
+    assert trace.span("details") == 2.0
+    assert trace.span("enrich") == 3.0
+    assert trace.span("post") == 1.0
+    assert trace.span("total") == 66.0
+    assert tracker.posted(1) is None
+
+    # Fenêtre glissante : seul le dernier kill posté compte
+    tracker.seen(2, "zkb")
+    tracker.details(2, None)
+    tracker.enriched(2)
+    tracker.posted(2)
+    summary = tracker.summary()
+    assert summary[("zkb", "pipeline")] == [4.0]
+    assert ("esi", "pipeline") not in summary
+    assert ("zkb", "total") not in summary  # killmail_time inconnu
+    labels = {lbl["quantile"] for lbl, _v in tracker.samples()}
+    assert labels == {"0.5", "0.9", "0.99"}
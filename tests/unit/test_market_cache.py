@@ -1,33 +1,39 @@
 import json
+import os
 from datetime import datetime, timedelta
 
+import pytest
+
+from src.core import price_table
+from src.core.price_table import PriceTable
 from src.core.prices_cache import PricesCache
 
 
 def test_prices_cache_ttl_valid(tmp_path, monkeypatch):
     p = tmp_path / "prices.json"
+    now_iso = datetime.utcnow().isoformat()
+    data = {"31117": {"avg_price": 123.45, "updated_at": now_iso}}
+    p.write_text(json.dumps(data))
+
+    # L'ancien prices.json est importé dans la table binaire au chargement
     cache = PricesCache(str(p))
 
     # Force une TTL courte pour le test
     monkeypatch.setattr(cache, "ttl", timedelta(days=7))
 
-    now_iso = datetime.utcnow().isoformat()
-    data = {"31117": {"avg_price": 123.45, "updated_at": now_iso}}
-    p.write_text(json.dumps(data))
-
     assert cache.get(31117) == 123.45
+    assert (tmp_path / "prices.bin").exists()
 
 
 def test_prices_cache_ttl_expired(tmp_path, monkeypatch):
     p = tmp_path / "prices.json"
-    cache = PricesCache(str(p))
-
-    monkeypatch.setattr(cache, "ttl", timedelta(days=7))
-
     old_iso = (datetime.utcnow() - timedelta(days=8)).isoformat()
     data = {"31117": {"avg_price": 123.45, "updated_at": old_iso}}
     p.write_text(json.dumps(data))
 
+    cache = PricesCache(str(p))
+    monkeypatch.setattr(cache, "ttl", timedelta(days=7))
+
     assert cache.get(31117) is None
 
 
@@ -36,3 +42,56 @@ def test_prices_cache_set_and_get(tmp_path):
     cache = PricesCache(str(p))
     cache.set(32880, 42.0)
     assert cache.get(32880) == 42.0
+    # Persisté : un nouveau cache relit la table sans repasser par le JSON
+    assert PricesCache(str(p)).get(32880) == 42.0
+
+
+def test_price_table_sorted_lookup_update_and_stale(tmp_path):
+    path = str(tmp_path / "prices.bin")
+    table = PriceTable(path)
+    table.set_many([(30, 3.0, 300.0), (10, 1.0, 100.0), (20, 2.0, 200.0)])
+    assert list(table.ids) == [10, 20, 30]
+    assert table.get(20) == (2.0, 200.0)
+    assert table.get(15) is None
+
+    table.set(20, 2.5, 250.0)  # type_id existant : écrit en place
+    assert len(table) == 3
+    assert table.stale(150.0) == [10]
+
+    shared = PriceTable(path, readonly=True)
+    assert shared.get(20) == (2.5, 250.0)
+    with pytest.raises(PermissionError):
+        shared.set(40, 4.0, 400.0)
+    shared.close()
+    table.close()
+
+
+async def test_new_type_ids_are_merged_off_the_loop(tmp_path, monkeypatch):
+    monkeypatch.setattr(price_table, "WRITE_DELAY_S", 0.01)
+    path = str(tmp_path / "prices.bin")
+    table = PriceTable(path)
+    for type_id in range(300, 0, -1):
+        table.set(type_id, float(type_id), 100.0)
+    # Servis depuis la mémoire, fichier pas encore réécrit
+    assert table.get(42) == (42.0, 100.0) and len(table) == 300
+    assert not os.path.exists(path)
+
+    await table.flush()
+    assert list(table.ids) == list(range(1, 301))
+    table.set(42, 4.2, 200.0)  # type_id existant : en place
+    reloaded = PriceTable(path, readonly=True)
+    assert len(reloaded) == 300 and reloaded.get(42) == (4.2, 200.0)
+    reloaded.close()
+    table.close()
+
+
+def test_invalid_price_table_is_moved_aside_and_json_reimported(tmp_path):
+    p = tmp_path / "prices.json"
+    now_iso = datetime.utcnow().isoformat()
+    p.write_text(json.dumps({"31117": {"avg_price": 123.45, "updated_at": now_iso}}))
+    (tmp_path / "prices.bin").write_bytes(b"")  # crash avant l'écriture des données
+
+    cache = PricesCache(str(p))
+    assert cache.get(31117) == 123.45
+    assert (tmp_path / "prices.bin.corrupt").exists()
+    assert PriceTable(str(tmp_path / "prices.bin"), readonly=True).get(31117) is not None
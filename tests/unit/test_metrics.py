@@ -0,0 +1,76 @@
+import asyncio
+
+from src.core.metrics import METRICS, Metrics, record_http, route_of, serve_metrics
+
+
+def test_route_of_collapses_ids_and_hashes():
+    assert route_of("/v1/killmails/123/" + "ab" * 20 + "/") == "/v1/killmails/{id}/{hash}/"
+    assert (
+        route_of("/latest/markets/10000002/history/?type_id=587") == "/latest/markets/{id}/history/"
+    )
+    assert (
+        route_of("https://zkillboard.com/api/corporationID/98/page/1/")
+        == "/api/corporationID/{id}/page/{id}/"
+    )
+
+
+def test_render_counters_histograms_and_collectors():
+    m = Metrics()
+    m.describe("x_total", "counter", "things")
+    m.inc("x_total", route="/a", status=200)
+    m.inc("x_total", route="/a", status=200)
+    m.inc("x_total", route="/a", status=304)
+    m.observe("lat_seconds", 0.02, stage="names")
+    m.observe("lat_seconds", 3.0, stage="names")
+    m.register("size", lambda: [({"tenant": "a"}, 7)])
+
+    text = m.render()
+    assert "# HELP x_total things" in text
+    assert "# TYPE x_total counter" in text
+    assert 'x_total{route="/a",status="200"} 2' in text
+    assert 'x_total{route="/a",status="304"} 1' in text
+    assert 'lat_seconds_bucket{stage="names",le="0.025"} 1' in text
+    assert 'lat_seconds_bucket{stage="names",le="+Inf"} 2' in text
+    assert 'lat_seconds_count{stage="names"} 2' in text
+    assert 'size{tenant="a"} 7' in text
+    assert m.histogram("lat_seconds", stage="names") == (2, 3.02)
+
+
+def test_time_observes_even_on_error():
+    m = Metrics()
+    try:
+        with m.time("op_seconds", op="x"):
+            raise RuntimeError
+    except RuntimeError:
+        pass
+    assert m.histogram("op_seconds", op="x")[0] == 1
+
+
+async def test_metrics_endpoint_serves_prometheus_text():
+    record_http("esi", "/v1/killmails/1/" + "f" * 40 + "/", 429, 0.1)
+    server = await serve_metrics("127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+    try:
+
+        async def get(path: str) -> bytes:
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.write(f"GET {path} HTTP/1.1\r\nHost: x\r\n\r\n".encode())
+            await writer.drain()
+            data = await reader.read()
+            writer.close()
+            return data
+
+        body = await get("/metrics")
+        assert body.startswith(b"HTTP/1.1 200")
+        assert b"text/plain; version=0.0.4" in body
+        assert (
+            b'killbot_http_requests_total{route="/v1/killmails/{id}/{hash}/",'
+            b'service="esi",status="429"}' in body
+        )
+        assert (await get("/other")).startswith(b"HTTP/1.1 404")
+    finally:
+        server.close()
+        await server.wait_closed()
+    assert METRICS.value(
+        "killbot_http_requests_total", service="esi", route="/v1/killmails/{id}/{hash}/", status=429
+    )
@@ -0,0 +1,289 @@
+import asyncio
+import json
+import os
+import types
+
+import discord
+
+from src.botui import outbound as outbound_mod
+from src.botui.outbound import Outbound
+
+
+class DummyChannel:
+    def __init__(self):
+        self.messages: list[list[discord.Embed]] = []
+
+    async def send(self, *, embeds: list[discord.Embed]):
+        self.messages.append(embeds)
+        return types.SimpleNamespace(id=len(self.messages))
+
+
+def test_outbound_buffers_until_channel_attached():
+    async def scenario():
+        out = Outbound()
+        out.start()
+        futs = [out.submit(discord.Embed(title=f"kill {i}")) for i in range(3)]
+        await asyncio.sleep(0)
+
+        # Pas de channel : rien n'est posté, tout reste en file
+        assert not out.ready
+        assert not any(f.done() for f in futs)
+        assert out.pending() == 3
+
+        channel = DummyChannel()
+        out.attach(channel)
+        msgs = await asyncio.gather(*futs)
+
+        # Le backlog part en un seul message, ordre préservé
+        assert [[e.title for e in m] for m in channel.messages] == [["kill 0", "kill 1", "kill 2"]]
+        assert [m.id for m in msgs] == [1, 1, 1]
+
+    asyncio.run(scenario())
+
+
+def test_outbound_packs_at_most_ten_embeds_per_message():
+    async def scenario():
+        out = Outbound(window_s=0.05)
+        channel = DummyChannel()
+        out.attach(channel)
+        out.start()
+        futs = [out.submit(discord.Embed(title=str(i))) for i in range(12)]
+        await asyncio.gather(*futs)
+
+        assert [len(m) for m in channel.messages] == [10, 2]
+        assert [e.title for m in channel.messages for e in m] == [str(i) for i in range(12)]
+
+    asyncio.run(scenario())
+
+
+def test_outbound_respects_character_budget():
+    async def scenario():
+        out = Outbound(window_s=0.05, max_chars=2500)
+        channel = DummyChannel()
+        out.attach(channel)
+        out.start()
+        futs = [out.submit(discord.Embed(description="x" * 1000)) for _ in range(5)]
+        await asyncio.gather(*futs)
+
+        assert [len(m) for m in channel.messages] == [2, 2, 1]
+
+    asyncio.run(scenario())
+
+
+def make_http_exception(status):
+    response = types.SimpleNamespace(status=status, reason="err")
+    return discord.HTTPException(response, "error")
+
+
+def test_outbound_rejected_message_only_fails_the_bad_embed():
+    class RejectingChannel(DummyChannel):
+        async def send(self, *, embeds):
+            if any(e.title == "bad" for e in embeds):
+                raise make_http_exception(400)
+            return await super().send(embeds=embeds)
+
+    async def scenario():
+        out = Outbound()
+        channel = RejectingChannel()
+        out.attach(channel)
+        out.start()
+        futs = [out.submit(discord.Embed(title=t)) for t in ("a", "bad", "c")]
+        results = await asyncio.gather(*futs, return_exceptions=True)
+
+        assert isinstance(results[1], discord.HTTPException)
+        assert not isinstance(results[0], Exception)
+        assert not isinstance(results[2], Exception)
+        # Renvoi un par un, ordre conservé
+        assert [[e.title for e in m] for m in channel.messages] == [["a"], ["c"]]
+
+    asyncio.run(scenario())
+
+
+def test_outbound_does_not_retry_non_http_bugs():
+    class BuggyChannel:
+        async def send(self, *, embeds):
+            raise TypeError("not serializable")
+
+    async def scenario():
+        out = Outbound()
+        out.attach(BuggyChannel())
+        out.start()
+        fut = out.submit(discord.Embed(title="k"))
+        results = await asyncio.gather(fut, return_exceptions=True)
+        assert isinstance(results[0], TypeError)
+
+    asyncio.run(scenario())
+
+
+def test_outbound_retries_transient_errors_without_losing_posts(monkeypatch, tmp_path):
+    monkeypatch.setattr(outbound_mod, "RETRY_MIN_S", 0.0)
+
+    class FlakyChannel(DummyChannel):
+        def __init__(self):
+            super().__init__()
+            self.failures = 2
+
+        async def send(self, *, embeds):
+            if self.failures:
+                self.failures -= 1
+                raise make_http_exception(503)
+            return await super().send(embeds=embeds)
+
+    async def scenario():
+        path = str(tmp_path / "outbox.jsonl")
+        out = Outbound(path=path)
+        channel = FlakyChannel()
+        out.attach(channel)
+        out.start()
+        fut = out.submit(discord.Embed(title="k"), meta={"km_id": 1, "km_hash": "h"})
+        msg = await fut
+        assert msg.id == 1
+        assert channel.messages[0][0].title == "k"
+        # Envoyé mais pas encore acquitté : toujours dans l'outbox
+        assert len(Outbound(path=path).restore()) == 1
+        out.ack(fut)
+        await out.flush()
+        assert Outbound(path=path).restore() == []
+
+    asyncio.run(scenario())
+
+
+def test_outbox_survives_restart(tmp_path):
+    path = str(tmp_path / "outbox.jsonl")
+
+    async def before_restart():
+        out = Outbound(path=path)  # channel jamais disponible (panne Discord)
+        out.submit(discord.Embed(title="a"), meta={"km_id": 1, "km_hash": "h1"})
+        out.submit(discord.Embed(title="b"), meta={"km_id": 2, "km_hash": "h2"})
+
+    async def after_restart():
+        out = Outbound(path=path)
+        records = out.restore()
+        assert [r["meta"]["km_id"] for r in records] == [1, 2]
+        out.discard(records[0])  # déjà dans l'index avant l'arrêt
+        fut = out.requeue(records[1])
+        channel = DummyChannel()
+        out.attach(channel)
+        out.start()
+        await fut
+        out.ack(fut)
+        assert [e.title for e in channel.messages[0]] == ["b"]
+        assert out.restore() == []
+
+    asyncio.run(before_restart())
+    asyncio.run(after_restart())
+
+
+def test_outbox_log_is_append_only_and_compacts(tmp_path, monkeypatch):
+    monkeypatch.setattr(outbound_mod, "COMPACT_MIN_DEAD", 4)
+    path = tmp_path / "outbox.jsonl"
+    log = outbound_mod.OutboxLog(str(path))
+    for seq in range(1, 4):
+        log.add(seq, {"km_id": seq}, {"title": str(seq)})
+    assert len(path.read_text().splitlines()) == 3
+
+    log.done({1})
+    assert len(path.read_text().splitlines()) == 4  # une ligne "done" ajoutée
+    log.done({2})  # lignes mortes >= seuil : journal réécrit
+    assert [json.loads(x)["seq"] for x in path.read_text().splitlines()] == [3]
+    assert list(outbound_mod.OutboxLog(str(path)).records) == [3]
+
+
+def test_outbox_appends_are_group_committed_off_the_loop(tmp_path, monkeypatch):
+    path = tmp_path / "outbox.jsonl"
+    fsyncs = []
+    real_fsync = os.fsync
+    monkeypatch.setattr(outbound_mod.os, "fsync", lambda fd: (fsyncs.append(fd), real_fsync(fd))[1])
+
+    async def scenario():
+        out = Outbound(path=str(path))
+        fsyncs.clear()
+        for i in range(5):
+            out.submit(discord.Embed(title=str(i)), meta={"km_id": i})
+        assert path.read_text() == "" and fsyncs == []  # rien d'écrit dans la boucle
+        await out.flush()
+        assert len(path.read_text().splitlines()) == 5 and len(fsyncs) == 1
+
+        # L'envoi attend l'entrée d'outbox sur disque
+        out.submit(discord.Embed(title="late"), meta={"km_id": 9})
+        channel = DummyChannel()
+        out.attach(channel)
+        out.start()
+        await asyncio.sleep(0.05)
+        assert len(channel.messages) == 1
+        assert len(path.read_text().splitlines()) == 6
+
+    asyncio.run(scenario())
+
+
+def test_outbound_close_fails_pending_and_keeps_outbox(tmp_path):
+    path = str(tmp_path / "outbox.jsonl")
+
+    async def scenario():
+        out = Outbound(path=path)
+        out.start()
+        fut = out.submit(discord.Embed(title="kill"), meta={"km_id": 1})
+        dropped = out.close(discord.Forbidden(types.SimpleNamespace(status=403, reason=""), ""))
+
+        assert dropped == 1 and out.closed
+        assert isinstance(fut.exception(), discord.Forbidden)
+        try:
+            out.submit(discord.Embed(title="later"))
+        except discord.Forbidden:
+            pass
+        else:
+            raise AssertionError("submit() after close() must fail")
+
+    asyncio.run(scenario())
+    # Le post reste dans l'outbox pour le prochain démarrage
+    assert [r["meta"] for r in Outbound(path=path).restore()] == [{"km_id": 1}]
+
+
+class EditableChannel(DummyChannel):
+    def __init__(self):
+        super().__init__()
+        self.edits: list[list[str | None]] = []
+
+    async def send(self, *, embeds: list[discord.Embed]):
+        self.messages.append(embeds)
+        channel = self
+
+        class _Msg:
+            async def edit(self, *, embeds):
+                channel.edits.append([e.title for e in embeds])
+
+        return _Msg()
+
+
+def test_outbound_edit_replaces_queued_embed_without_extra_call():
+    async def scenario():
+        out = Outbound()
+        out.start()
+        fut = out.submit(discord.Embed(title="provisional"), editable=True)
+        final = discord.Embed(title="final")
+        channel = EditableChannel()
+        edit = asyncio.create_task(out.edit(fut, final))
+        await asyncio.sleep(0)
+        out.attach(channel)
+
+        assert await edit is True
+        assert [[e.title for e in m] for m in channel.messages] == [["final"]]
+        assert channel.edits == []
+
+    asyncio.run(scenario())
+
+
+def test_outbound_edit_after_send_keeps_other_embeds_of_message():
+    async def scenario():
+        out = Outbound()
+        channel = EditableChannel()
+        out.attach(channel)
+        out.start()
+        a = out.submit(discord.Embed(title="a (valuing)"), editable=True)
+        b = out.submit(discord.Embed(title="b"))
+        await asyncio.gather(a, b)
+
+        assert await out.edit(a, discord.Embed(title="a 12M")) is True
+        assert channel.edits == [["a 12M", "b"]]
+
+    asyncio.run(scenario())
@@ -0,0 +1,39 @@
+import tracemalloc
+
+import pytest
+
+from src.core.profiler import ProfileCapture
+
+
+def _work() -> list[bytes]:
+    return [bytes(1000) for _ in range(200)]
+
+
+async def test_capture_stops_after_n_events_with_report():
+    prof = ProfileCapture()
+    report = prof.start("process", 2)
+    kept = _work()
+    prof.tick("poll")  # autre cible : ignoré
+    prof.tick("process")
+    assert not report.done()
+    prof.tick("process")
+
+    text = await report
+    assert prof.active is None
+    assert not tracemalloc.is_tracing()
+    assert text.startswith("profile: 2/2 process event(s)")
+    assert "cumulative time" in text and "_work" in text
+    assert "allocation sites" in text and "test_profiler.py" in text
+    assert kept
+
+
+async def test_single_capture_and_partial_stop():
+    prof = ProfileCapture()
+    with pytest.raises(ValueError):
+        prof.start("nope", 1)
+    report = prof.start("poll", 3)
+    with pytest.raises(RuntimeError):
+        prof.start("poll", 1)
+    prof.tick("poll")
+    prof.stop()
+    assert (await report).startswith("profile: 1/3 poll event(s)")
@@ -0,0 +1,105 @@
+import asyncio
+import types
+
+import discord
+import pytest
+
+from src.botui.outbound import Outbound
+from src.botui.routing import RoutedOutbound, compile_routes, compile_rule
+
+FACTS = {
+    "is_kill": True,
+    "total_value": 2_500_000_000.0,
+    "ship_type_id": 17738,
+    "region_id": 10000058,
+    "system_id": 30004563,
+    "solo": False,
+}
+
+
+def test_compiled_rule_matches_all_conditions():
+    rule = {
+        "name": "big-kills",
+        "match": {"kind": "kill", "min_value": 1e9, "region_ids": [10000058], "solo": False},
+    }
+    pred = compile_rule(rule)
+    assert pred(FACTS)
+    assert not pred({**FACTS, "is_kill": False})
+    assert not pred({**FACTS, "total_value": 5e8})
+    assert not pred({**FACTS, "total_value": None})  # pas encore valorisé
+    assert not pred({**FACTS, "region_id": 10000002})
+    assert compile_rule({"name": "all"})(FACTS)
+
+
+def test_compile_routes_rejects_bad_config():
+    with pytest.raises(ValueError, match="unknown match keys"):
+        compile_routes([{"name": "x", "channel_id": 1, "match": {"colour": "red"}}])
+    with pytest.raises(ValueError, match="duplicated"):
+        compile_routes([{"name": "x", "channel_id": 1}, {"name": "x", "channel_id": 2}])
+    with pytest.raises(ValueError, match="channel_id or a webhook_url"):
+        compile_routes([{"name": "x"}])
+    routes = compile_routes([{"name": "caps", "channel_id": 1, "match": {"min_value": 1}}])
+    assert routes[0].needs_enrichment
+
+
+class Channel:
+    def __init__(self):
+        self.embeds: list[discord.Embed] = []
+
+    async def send(self, *, embeds):
+        self.embeds.extend(embeds)
+        return types.SimpleNamespace(id=len(self.embeds))
+
+
+def test_routed_outbound_fans_out_one_rendered_embed(tmp_path):
+    routes = compile_routes(
+        [
+            {"name": "kills", "channel_id": 1, "match": {"kind": "kill"}},
+            {"name": "losses", "channel_id": 2, "match": {"kind": "loss"}},
+            {"name": "caps", "channel_id": 3, "match": {"min_value": 1e9}},
+        ]
+    )
+
+    async def scenario():
+        channels = {}
+        for r in routes:
+            r.outbound = Outbound(path=str(tmp_path / f"{r.name}.jsonl"))
+            channels[r.name] = Channel()
+            r.outbound.attach(channels[r.name])
+            r.outbound.start()
+        out = RoutedOutbound(routes)
+
+        embed = discord.Embed(title="titan down")
+        delivery = out.submit(embed, meta={"km_id": 1, "km_hash": "h"}, facts=FACTS)
+        await delivery
+        out.ack(delivery)
+
+        assert channels["kills"].embeds == [embed] and channels["caps"].embeds == [embed]
+        assert channels["losses"].embeds == []
+        # Rien ne reste dans les outbox une fois acquitté
+        assert out.restore() == []
+
+        # Aucun channel ciblé : le kill est traité sans post
+        none = out.submit(embed, facts={**FACTS, "is_kill": None, "total_value": 0.0})
+        assert none.done() and none.result() is None
+
+    asyncio.run(scenario())
+
+
+def test_routed_outbound_restores_one_record_per_kill(tmp_path):
+    routes = compile_routes([{"name": "a", "channel_id": 1}, {"name": "b", "channel_id": 2}])
+
+    async def submit_then_crash():
+        for r in routes:
+            r.outbound = Outbound(path=str(tmp_path / f"{r.name}.jsonl"))
+        RoutedOutbound(routes).submit(discord.Embed(title="x"), meta={"km_id": 7, "km_hash": "h"})
+
+    asyncio.run(submit_then_crash())
+
+    async def restart():
+        for r in routes:
+            r.outbound = Outbound(path=str(tmp_path / f"{r.name}.jsonl"))
+        (record,) = RoutedOutbound(routes).restore()
+        assert record["meta"]["km_id"] == 7 and len(record["parts"]) == 2
+
+    asyncio.run(restart())
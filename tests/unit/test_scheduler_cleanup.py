@@ -1,4 +1,4 @@
-from src.scheduler.cleanup_policy import should_rewrite_cleanup_index
+from src.scheduler.cleanup_policy import expiry_watermark, should_rewrite_cleanup_index
 
 
 def test_cleanup_rewrite_requires_esi_snapshot():
@@ -31,3 +31,13 @@ def test_cleanup_rewrite_allows_esi_only_mode():
         zkb_enabled=False,
         zkb_snapshot_ok=False,
     )
+
+
+def test_expiry_watermark_waits_for_every_enabled_source():
+    assert expiry_watermark(esi_low_id=None, zkb_enabled=False, zkb_low_id=None) is None
+    assert expiry_watermark(esi_low_id=500, zkb_enabled=True, zkb_low_id=None) is None
+
+
+def test_expiry_watermark_is_lowest_listing_id():
+    assert expiry_watermark(esi_low_id=500, zkb_enabled=False, zkb_low_id=100) == 500
+    assert expiry_watermark(esi_low_id=500, zkb_enabled=True, zkb_low_id=100) == 100
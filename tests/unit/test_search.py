@@ -0,0 +1,113 @@
+import shutil
+
+import pytest
+
+from src.botui.reports import format_search, search_criteria
+from src.core.archive import KillArchive
+from src.esi import universe
+
+T = 1_758_000_000
+RIFTER, SLASHER = 587, 585
+JITA, AMAMAKE = 30000142, 30002537
+
+
+def rec(km_id, *, victim, victim_corp, ship, system, attackers, kill=True):
+    return {
+        "killmail_id": km_id,
+        "time": T + km_id,
+        "solar_system_id": system,
+        "region_id": 10000002,
+        "ship_type_id": ship,
+        "victim_character_id": victim,
+        "victim_corporation_id": victim_corp,
+        "final_character_id": attackers[0][0],
+        "final_corporation_id": attackers[0][1],
+        "final_ship_type_id": attackers[0][3],
+        "total_value": 1_000.0 * km_id,
+        "is_kill": kill,
+        "attackers": attackers,
+    }
+
+
+def fill(archive):
+    archive.add_many(
+        [
+            rec(1, victim=100, victim_corp=10, ship=RIFTER, system=JITA,
+                attackers=[(200, 20, 0, SLASHER)], kill=False),
+            rec(2, victim=300, victim_corp=30, ship=SLASHER, system=AMAMAKE,
+                attackers=[(100, 10, 0, RIFTER), (200, 20, 0, RIFTER)]),
+            rec(3, victim=100, victim_corp=10, ship=SLASHER, system=AMAMAKE,
+                attackers=[(300, 30, 0, RIFTER)], kill=False),
+            rec(4, victim=200, victim_corp=20, ship=RIFTER, system=AMAMAKE,
+                attackers=[(100, 10, 0, SLASHER)]),
+        ]
+    )  # fmt: skip
+
+
+def test_query_intersects_posting_lists(tmp_path):
+    archive = KillArchive(str(tmp_path))
+    fill(archive)
+    q = archive.search.query
+    assert q({"pilot": 100}) == [4, 3, 2, 1]  # plus récents d'abord
+    assert q({"pilot": 100}, role="victim") == [3, 1]
+    assert q({"pilot": 100}, role="attacker") == [4, 2]
+    assert q({"pilot": 100, "system": AMAMAKE}) == [4, 3, 2]
+    assert q({"pilot": 100, "system": AMAMAKE}, role="victim") == [3]
+    assert q({"corp": 20, "ship": RIFTER}) == [4, 2, 1]
+    assert q({"corp": 20, "ship": RIFTER}, role="attacker") == [2]  # attaquant non final
+    assert q({"pilot": 100}, limit=2) == [4, 3]
+    assert q({"pilot": 999}) == []
+    with pytest.raises(ValueError):
+        q({"pilot": 100}, role="bystander")
+
+
+def test_index_is_persisted_and_rebuilt_for_older_archives(tmp_path):
+    fill(KillArchive(str(tmp_path)))
+    reloaded = KillArchive(str(tmp_path))
+    assert reloaded.search.query({"corp": 20, "ship": RIFTER}, role="attacker") == [2]
+
+    # Archive antérieure aux index : reconstruits depuis les colonnes
+    shutil.rmtree(tmp_path / "search")
+    rebuilt = KillArchive(str(tmp_path))
+    assert rebuilt.search.query({"pilot": 100}, role="victim") == [3, 1]
+    assert rebuilt.search.query({"pilot": 200}, role="attacker") == [1]  # coup final seulement
+    assert (tmp_path / "search" / "term.bin").exists()
+
+
+def test_torn_posting_write_does_not_shift_later_postings(tmp_path):
+    fill(KillArchive(str(tmp_path)))
+    with open(tmp_path / "search" / "term.bin", "ab") as f:
+        f.write((1 << 32 | 555).to_bytes(8, "little"))  # terme sans killmail
+    archive = KillArchive(str(tmp_path))
+    archive.add(
+        rec(5, victim=400, victim_corp=40, ship=RIFTER, system=JITA,
+            attackers=[(100, 10, 0, SLASHER)])
+    )  # fmt: skip
+    reloaded = KillArchive(str(tmp_path))
+    assert reloaded.search.query({"pilot": 400}, role="victim") == [5]
+    assert reloaded.search.query({"pilot": 100}, role="attacker") == [5, 4, 2]
+    assert reloaded.search.query({"pilot": 555}) == []
+
+
+async def test_format_search_and_name_criteria(tmp_path, monkeypatch):
+    archive = KillArchive(str(tmp_path))
+    fill(archive)
+    await archive.flush()
+    monkeypatch.setattr(universe, "NAME_CACHE", universe.LRUCache(maxsize=10))
+    universe.NAME_CACHE.set(100, {"category": "character", "id": 100, "name": "Pilot Hundred"})
+    universe.NAME_CACHE.set(AMAMAKE, {"category": "solar_system", "id": AMAMAKE, "name": "Amamake"})
+
+    criteria = await search_criteria({"pilot": "pilot hundred", "system": str(AMAMAKE)}, None)
+    assert criteria == {"pilot": 100, "system": AMAMAKE}
+
+    async def resolve_names(esi, ids):
+        return [universe.NAME_CACHE.get(i) for i in ids if i in universe.NAME_CACHE]
+
+    text = await format_search(
+        archive, criteria, role="victim", limit=5, resolve_names=resolve_names
+    )
+    assert text.splitlines()[0] == "**Search — pilot Pilot Hundred, system Amamake (victim)**"
+    assert "Loss · Type 585 in Amamake" in text and "zkillboard.com/kill/3/" in text
+    assert "No archived killmail" in await format_search(
+        archive, {"pilot": 999}, role="any", limit=5
+    )
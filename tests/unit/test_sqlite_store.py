@@ -0,0 +1,101 @@
+import asyncio
+import json
+import time
+import types
+from datetime import datetime, timedelta
+
+from src.core.prices_cache import PricesCache
+from src.core.sqlite_store import SQLiteStore, migrate_json
+from src.esi.universe import NAME_CACHE
+from src.scheduler import snapshot
+from src.scheduler.loop import KillIndex
+from src.scheduler.state import SchedulerState
+
+
+def test_sqlite_is_wal_and_kill_index_is_per_tenant(tmp_path):
+    db = SQLiteStore(str(tmp_path / "killbot.sqlite3"))
+    assert db._conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+
+    idx = KillIndex(str(tmp_path / "unused.json"), db=db, tenant="alpha")
+    assert asyncio.run(idx.add_if_absent(1, "h1")) is True
+    assert asyncio.run(idx.add_if_absent(2, "h2")) is True
+    assert asyncio.run(idx.add_if_absent(1, "h1")) is False
+    assert not (tmp_path / "unused.json").exists()
+
+    # Rechargé depuis la base ; l'autre tenant ne voit rien
+    assert asyncio.run(KillIndex("x", db=db, tenant="alpha").known_set()) == {(1, "h1"), (2, "h2")}
+    assert asyncio.run(KillIndex("x", db=db, tenant="beta").known_set()) == set()
+
+    assert asyncio.run(idx.expire_below(2)) == 1
+    assert db.kills_load("alpha") == [(2, "h2")]
+
+
+def test_sqlite_prices_keep_ttl(tmp_path):
+    db = SQLiteStore(str(tmp_path / "killbot.sqlite3"))
+    cache = PricesCache(str(tmp_path / "prices.json"), db=db)
+    cache.set(587, 12.5)
+    assert cache.get(587) == 12.5
+    assert len(cache) == 1
+    old = (datetime.utcnow() - timedelta(days=30)).isoformat()
+    db.prices_set([(588, 1.0, old)])
+    assert cache.get(588) is None
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_migration_imports_json_files_once(tmp_path):
+    index = tmp_path / "kills_index.json"
+    prices = tmp_path / "prices.json"
+    state = tmp_path / "state.json"
+    index.write_text(json.dumps([{"id": 5, "hash": "a", "posted": True}]))
+    now = datetime.utcnow().isoformat()
+    prices.write_text(json.dumps({"587": {"avg_price": 3.0, "updated_at": now}}))
+    state.write_text(
+        json.dumps(
+            {
+                "version": snapshot.SNAPSHOT_VERSION,
+                "scheduler": {"last_etag": "E"},
+                "caches": {"names": [{"id": 7, "name": "Jita"}], "regions": []},
+            }
+        )
+    )
+    db = SQLiteStore(str(tmp_path / "killbot.sqlite3"))
+    paths = dict(index_path=str(index), prices_path=str(prices), state_path=str(state))
+
+    counts = migrate_json(db, tenant="default", **paths)
+    assert counts == {"kills": 1, "prices": 1, "names": 1, "state": 1}
+    assert migrate_json(db, tenant="default", **paths) == {}
+    assert db.kills_load("default") == [(5, "a")]
+    assert db.price_get(587) == (3.0, now)
+    assert db.names_recent(10) == [{"id": 7, "name": "Jita"}]
+
+
+def test_snapshot_in_sqlite_stores_names_in_table(tmp_path):
+    db = SQLiteStore(str(tmp_path / "killbot.sqlite3"))
+    settings = types.SimpleNamespace(EVE_REFRESH_TOKEN="r")
+    esi = types.SimpleNamespace(
+        refresh_token=None,
+        token_state=lambda: ("tok", time.time() + 600),
+        restore_token=lambda *a: None,
+    )
+    NAME_CACHE.clear()
+    NAME_CACHE.set(9, {"id": 9, "name": "Amarr", "category": "solar_system"})
+    save = snapshot.install(SchedulerState(last_etag="E"), esi, settings, db=db, key="t1")
+    save()
+    NAME_CACHE.clear()
+
+    blob = db.state_get("snapshot:t1")
+    assert "names" not in blob["caches"]
+    state = SchedulerState()
+    snapshot.install(state, esi, settings, db=db, key="t1")
+    assert state.last_etag == "E"
+    assert NAME_CACHE.get(9)["name"] == "Amarr"
+    NAME_CACHE.clear()
+
+
+def test_zkb_submissions_are_recorded(tmp_path):
+    db = SQLiteStore(str(tmp_path / "killbot.sqlite3"))
+    assert db.zkb_submitted(1, "h") is False
+    db.zkb_record(1, "h", 500)
+    assert db.zkb_submitted(1, "h") is False
+    db.zkb_record(1, "h", 302)
+    assert db.zkb_submitted(1, "h") is True
@@ -0,0 +1,41 @@
+from src.core.startup import StartupTimer
+
+
+def test_startup_timer_keeps_first_mark_and_orders_report(monkeypatch):
+    ticks = iter([0.5, 1.25, 2.0, 9.0])
+    monkeypatch.setattr("src.core.startup.time.perf_counter", lambda: next(ticks))
+    timer = StartupTimer(t0=0.0)
+
+    timer.mark("imports")
+    timer.mark("store loading")
+    timer.mark("gateway ready")
+    timer.mark("imports")  # déjà marqué : ignoré
+
+    assert [name for name, _ in timer.marks] == ["imports", "store loading", "gateway ready"]
+    report = timer.report()
+    assert "+   750.0 ms" in report  # store loading : 1.25 - 0.5
+    assert "t=2.000s" in report
+
+
+def test_startup_report_waits_for_required_phases(capsys):
+    timer = StartupTimer(t0=0.0)
+    timer.mark("first poll")
+    timer.report_once("gateway ready", "first poll")
+    assert not timer.reported and capsys.readouterr().out == ""
+
+    timer.mark("gateway ready")
+    timer.report_once("gateway ready", "first poll")
+    timer.report_once("gateway ready", "first poll")
+    assert capsys.readouterr().out.count("timing breakdown") == 1
+
+
+def test_startup_report_waits_for_declared_phases(capsys):
+    timer = StartupTimer(t0=0.0)
+    timer.wait_for("gateway ready")
+    timer.mark("first poll")
+    timer.report_once("first poll")
+    assert capsys.readouterr().out == ""
+
+    timer.mark("gateway ready")
+    timer.report_once("gateway ready")
+    assert "timing breakdown" in capsys.readouterr().out
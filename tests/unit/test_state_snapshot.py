@@ -0,0 +1,110 @@
+import asyncio
+import json
+import time
+import types
+
+import pytest
+
+from src.esi.client import AsyncESIClient
+from src.esi.universe import NAME_CACHE, REGION_CACHE
+from src.scheduler import snapshot
+from src.scheduler.state import SchedulerState
+
+
+@pytest.fixture(autouse=True)
+def clean_caches():
+    # NAME_CACHE / REGION_CACHE sont partagés par tout le process
+    NAME_CACHE.clear()
+    REGION_CACHE.clear()
+    yield
+    NAME_CACHE.clear()
+    REGION_CACHE.clear()
+
+
+@pytest.fixture()
+def make_esi():
+    clients: list[AsyncESIClient] = []
+
+    def _make():
+        clients.append(AsyncESIClient())
+        return clients[-1]
+
+    yield _make
+
+    async def _close():
+        for c in clients:
+            await c.aclose()
+
+    asyncio.run(_close())
+
+
+def test_snapshot_roundtrip_restores_etag_token_and_caches(make_esi):
+    settings = types.SimpleNamespace(EVE_REFRESH_TOKEN="refresh-A")
+    state = SchedulerState(last_etag='W/"abc"', esi_low_id=10, zkb_low_id=8)
+    esi = make_esi()
+    esi.restore_token("access-1", time.time() + 1200)
+    NAME_CACHE.set(30004563, {"id": 30004563, "name": "L-A5XP", "category": "solar_system"})
+    REGION_CACHE.set(30004563, 10000058)
+
+    data = snapshot.capture(state, esi, settings)
+    NAME_CACHE.clear()
+    REGION_CACHE.clear()
+
+    state2 = SchedulerState()
+    esi2 = make_esi()
+    assert snapshot.restore(data, state2, esi2, settings) is True
+    assert state2 == state
+    assert esi2.token_state()[0] == "access-1"
+    assert NAME_CACHE.get(30004563)["name"] == "L-A5XP"
+    assert REGION_CACHE.get(30004563) == 10000058
+
+
+def test_snapshot_ignores_token_of_another_refresh_token_or_expired(make_esi):
+    esi = make_esi()
+    esi.restore_token("access-1", time.time() + 1200)
+    data = snapshot.capture(SchedulerState(), esi, types.SimpleNamespace(EVE_REFRESH_TOKEN="A"))
+
+    esi2 = make_esi()
+    snapshot.restore(data, SchedulerState(), esi2, types.SimpleNamespace(EVE_REFRESH_TOKEN="B"))
+    assert esi2.token_state()[0] is None
+
+    data["token"]["expire_at"] = time.time() - 1
+    esi3 = make_esi()
+    snapshot.restore(data, SchedulerState(), esi3, types.SimpleNamespace(EVE_REFRESH_TOKEN="A"))
+    assert esi3.token_state()[0] is None
+
+
+def test_snapshot_install_returns_saver(tmp_path, make_esi):
+    path = str(tmp_path / "state.json")
+    settings = types.SimpleNamespace(EVE_REFRESH_TOKEN="A")
+    state = SchedulerState()
+    save = snapshot.install(state, make_esi(), settings, path=path)
+
+    state.last_etag = '"v2"'
+    save()
+    assert json.loads(open(path).read())["scheduler"]["last_etag"] == '"v2"'
+
+
+def test_snapshot_rejects_unknown_version(make_esi):
+    assert snapshot.restore({"version": 0}, SchedulerState(), make_esi(), None) is False
+
+
+def test_snapshot_token_follows_the_client_refresh_token():
+    # Tenants : le token du client prime sur EVE_REFRESH_TOKEN du .env
+    env = types.SimpleNamespace(EVE_REFRESH_TOKEN="env")
+    esi = AsyncESIClient(refresh_token="tenant-A")
+    esi.restore_token("access-A", time.time() + 1200)
+    data = snapshot.capture(SchedulerState(), esi, env)
+
+    other = AsyncESIClient(refresh_token="tenant-B")
+    snapshot.restore(data, SchedulerState(), other, env)
+    same = AsyncESIClient(refresh_token="tenant-A")
+    snapshot.restore(data, SchedulerState(), same, env)
+    assert other.token_state()[0] is None
+    assert same.token_state()[0] == "access-A"
+
+    async def _close():
+        for c in (esi, other, same):
+            await c.aclose()
+
+    asyncio.run(_close())
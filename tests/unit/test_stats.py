@@ -0,0 +1,38 @@
+import time
+
+import discord
+
+from src.botui.outbound import Outbound
+from src.botui.routing import Route
+from src.botui.stats import collect_stats, format_stats
+from src.esi import client as esi_client
+from src.scheduler import loop
+
+
+async def test_stats_report_tenant_queues_polls_and_budget(tmp_path, monkeypatch):
+    idx = loop.KillIndex(str(tmp_path / "kills_index.json"))
+    await idx.add_if_absent(1, "a")
+    await idx.reserve(2, "b")
+    out = Outbound()  # pas de channel : le post reste en file
+    out.submit(discord.Embed(title="kill"))
+    route = Route("main", 1, "", lambda f: True, False, outbound=out)
+    rt = loop.TenantRuntime("default", idx, out, [route], last_poll_s=0.42)
+    rt.last_poll_at = time.time() - 10
+    rt.next_poll_at = {0: time.time() + 110, 1: time.time() + 50}
+    monkeypatch.setattr(loop, "RUNTIME", {"default": rt})
+    monkeypatch.setitem(esi_client.ERROR_LIMIT, "remain", 87.0)
+    monkeypatch.setitem(esi_client.ERROR_LIMIT, "reset_at", time.time() + 30)
+
+    stats = collect_stats()
+    assert stats["tenants"][0]["index"] == 1
+    assert stats["tenants"][0]["inflight"] == 1
+    assert stats["tenants"][0]["queues"] == {"main": 1}
+
+    text = format_stats(stats)
+    assert "KillIndex : 1 kills, 1 in flight" in text
+    assert "Pending posts : main 1" in text
+    assert "Last poll : 0.42s (10s ago), next in " in text  # slot le plus proche (~50s)
+    assert stats["tenants"][0]["next_poll_at"] == rt.next_poll_at[1]
+    assert "ESI error budget : 87 left" in text
+    assert "**Caches**" in text and "- names :" in text
+    assert "**Event loop**" in text and "- Max lag : " in text
@@ -0,0 +1,56 @@
+import asyncio
+import json
+import threading
+import time
+
+from src.core import store as store_mod
+from src.core.looplag import LoopLagMonitor
+from src.core.store import JSONStore
+
+
+async def test_save_is_debounced_and_written_off_the_loop(tmp_path, monkeypatch):
+    monkeypatch.setattr(store_mod, "WRITE_DELAY_S", 0.01)
+    path = tmp_path / "data.json"
+    store = JSONStore(str(path), [])
+    threads = []
+    write_file = store._write_file
+
+    def spy(seq, data):
+        threads.append(threading.current_thread())
+        write_file(seq, data)
+
+    monkeypatch.setattr(store, "_write_file", spy)
+    for i in range(5):
+        store.save(list(range(i + 1)))
+    # Lecture servie depuis la mémoire, avant même l'écriture
+    assert store.read() == [0, 1, 2, 3, 4]
+    await store.flush()
+
+    assert json.loads(path.read_text()) == [0, 1, 2, 3, 4]
+    assert len(threads) == 1  # une rafale = une écriture
+    assert threads[0] is not threading.main_thread()
+
+
+def test_pending_save_is_written_when_the_loop_stops(tmp_path):
+    path = tmp_path / "data.json"
+    store = JSONStore(str(path), {})
+
+    async def main():
+        store.save({"a": 1})  # programmé, asyncio.run annule la tâche en sortie
+
+    asyncio.run(main())
+    assert json.loads(path.read_text()) == {"a": 1}
+    assert not (tmp_path / "data.json.tmp").exists()
+
+
+async def test_loop_lag_monitor_reports_blocking_code(capsys):
+    monitor = LoopLagMonitor(interval=0.01, warn_after=0.05)
+    monitor.start()
+    await asyncio.sleep(0.02)
+    time.sleep(0.1)  # code synchrone qui bloque la boucle
+    await asyncio.sleep(0.03)
+    monitor.stop()
+
+    assert monitor.max_recent() >= 0.05
+    assert monitor.stalls >= 1
+    assert "[loop] event loop blocked for" in capsys.readouterr().out
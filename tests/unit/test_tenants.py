@@ -0,0 +1,65 @@
+import json
+import os
+import types
+
+import pytest
+
+from src.core.tenants import load_tenants
+
+ENV = types.SimpleNamespace(
+    TENANTS_FILE="",
+    CORPORATION_ID="98000001",
+    EVE_REFRESH_TOKEN="refresh-env",
+    DISCORD_CHANNEL_ID="123",
+    DISCORD_WEBHOOK_URL="",
+)
+
+
+def test_single_tenant_from_env_keeps_data_paths():
+    (tenant,) = load_tenants(ENV)
+    assert (tenant.corporation_id, tenant.refresh_token, tenant.channel_id) == (
+        98000001,
+        "refresh-env",
+        123,
+    )
+    assert tenant.path("kills_index.json") == os.path.join("data", "kills_index.json")
+
+
+def test_tenants_file_gives_each_corp_its_own_files(tmp_path):
+    path = tmp_path / "tenants.json"
+    path.write_text(
+        json.dumps(
+            [
+                {"name": "alpha", "corporation_id": 1, "refresh_token": "a", "channel_id": 10},
+                {"corporation_id": 2, "refresh_token": "b", "webhook_url": "https://hook"},
+            ]
+        )
+    )
+    alpha, beta = load_tenants(types.SimpleNamespace(TENANTS_FILE=str(path)))
+    assert alpha.path("outbox.jsonl") == os.path.join("data", "tenants", "alpha", "outbox.jsonl")
+    assert beta.name == "2" and beta.webhook_url == "https://hook"
+
+
+def test_tenants_file_rejects_duplicates_and_missing_target(tmp_path):
+    path = tmp_path / "tenants.json"
+    one = {"name": "x", "corporation_id": 1, "refresh_token": "a", "channel_id": 10}
+    path.write_text(json.dumps([one, one]))
+    with pytest.raises(ValueError, match="duplicate"):
+        load_tenants(types.SimpleNamespace(TENANTS_FILE=str(path)))
+
+    path.write_text(json.dumps([{"corporation_id": 1, "refresh_token": "a"}]))
+    with pytest.raises(ValueError, match="channel_id or a webhook_url"):
+        load_tenants(types.SimpleNamespace(TENANTS_FILE=str(path)))
+
+
+def test_extra_refresh_tokens_from_env_and_file(tmp_path):
+    env = types.SimpleNamespace(**{**vars(ENV), "EVE_EXTRA_REFRESH_TOKENS": " r2, ,r3 "})
+    assert load_tenants(env)[0].extra_refresh_tokens == ["r2", "r3"]
+
+    path = tmp_path / "tenants.json"
+    entry = {"corporation_id": 1, "refresh_token": "a", "channel_id": 10}
+    path.write_text(json.dumps([{**entry, "extra_refresh_tokens": ["b", "c"]}]))
+    assert load_tenants(types.SimpleNamespace(TENANTS_FILE=str(path)))[0].extra_refresh_tokens == [
+        "b",
+        "c",
+    ]
@@ -0,0 +1,136 @@
+import asyncio
+import types
+from datetime import datetime
+
+from src.botui import test_runner
+from src.config import settings
+from src.core import processor
+from src.core.caches import LRUCache
+from src.core.metrics import record_http
+from src.core.models import Attacker, Killmail, KillmailRef, Victim
+from src.core.probe import Probe, probe_step
+from src.core.processor import PipelineContext
+from src.scheduler import loop
+
+CORP = 98092494
+KM = Killmail(
+    killmail_id=7,
+    killmail_hash="h7",
+    killmail_time=datetime.fromisoformat("2025-09-10T12:00:00+00:00"),
+    solar_system_id=30004563,
+    victim=Victim(corporation_id=1, ship_type_id=587, damage_taken=10),
+    attackers=[Attacker(corporation_id=CORP, damage_done=10, final_blow=True)],
+)
+
+
+async def test_probe_counts_only_its_own_tasks():
+    cache = LRUCache(maxsize=10, name="names")
+    cache.set(1, "a")
+    probe = Probe()
+
+    async def work():
+        with probe_step("names"):
+            cache.get(1)
+            cache.get(2)
+            await asyncio.sleep(0)
+            record_http("esi", "/latest/universe/names/", 200, 0.01)
+
+    with probe.active():
+        task = asyncio.create_task(work())  # la tâche hérite de la sonde
+    outside = asyncio.create_task(work())  # trafic concurrent : non compté
+    await asyncio.gather(task, outside)
+
+    step = probe.steps["names"]
+    assert step.calls == {"esi": 1}
+    assert (step.hits["names"], step.misses["names"]) == (1, 1)
+
+
+async def test_run_test_post_uses_shared_ctx_and_reports_each_step(monkeypatch):
+    names_cache = LRUCache(maxsize=10, name="names")
+    esi_calls = []
+
+    async def resolve_names(esi, ids):
+        if names_cache.get("all") is None:
+            record_http("esi", "/latest/universe/names/", 200, 0.01)
+            names_cache.set("all", [])
+        return []
+
+    async def region(esi, system_id):
+        return 10000002
+
+    async def value(km, prices):
+        return 1_000.0
+
+    async def recent(esi, corp_id, *, etag=None, force_body=False):
+        esi_calls.append(esi)
+        record_http("esi", f"/latest/corporations/{corp_id}/killmails/recent/", 200, 0.01)
+        return "ok", None, [KillmailRef(killmail_id=7, killmail_hash="h7")]
+
+    async def details(esi, km_id, km_hash):
+        esi_calls.append(esi)
+        return KM
+
+    shared_esi = object()
+    live_outbound = types.SimpleNamespace(submit=None)  # ne doit pas servir
+    ctx = PipelineContext(
+        esi=shared_esi,
+        prices=None,
+        outbound=live_outbound,
+        settings=settings.model_copy(update={"DISCORD_PROVISIONAL_POST": True}),
+        resolve_names=resolve_names,
+        get_region_id_for_system=region,
+        compute_killmail_value=value,
+        compute_killmail_drop=value,
+        build_embed_insight5=lambda km, **kw: ("embed", kw["total_value"]),
+        corporation_id=CORP,
+    )
+    monkeypatch.setattr(loop, "RUNTIME", {"default": types.SimpleNamespace(ctx=ctx)})
+    monkeypatch.setattr(test_runner, "fetch_recent_killmails", recent)
+    monkeypatch.setattr(processor, "fetch_killmail_details", details)
+
+    sent: list[tuple] = []
+
+    async def defer(ephemeral=False):
+        pass
+
+    async def send(content=None, *, embed=None, ephemeral=False):
+        sent.append((content, embed, ephemeral))
+
+    interaction = types.SimpleNamespace(
+        response=types.SimpleNamespace(defer=defer),
+        followup=types.SimpleNamespace(send=send),
+    )
+    await test_runner.run_test_post(interaction, "esi")
+
+    assert esi_calls == [shared_esi, shared_esi]  # client du scheduler, pas de client froid
+    assert sent[0] == (None, ("embed", 1_000.0), False)  # embed public, valeur complète
+    report, _, ephemeral = sent[1]
+    assert ephemeral and report.startswith("**✅ /test_post_esi terminé**")
+    assert "**Lecture récents** : OK (1 éléments, killmail 7) — " in report
+    assert "appels esi ×1" in report.split("\n")[1]
+    names_line = next(line for line in report.split("\n") if "Résolution des noms" in line)
+    assert "appels esi ×1" in names_line and "cache names 0/1" in names_line
+    for label in (
+        "Détails du killmail",
+        "Région",
+        "Estimation de la valeur",
+        "Publication Discord",
+    ):
+        assert f"**{label}** : OK" in report
+
+
+async def test_run_test_post_without_scheduler(monkeypatch):
+    monkeypatch.setattr(loop, "RUNTIME", {})
+    sent = []
+
+    async def defer(ephemeral=False):
+        pass
+
+    async def send(content=None, *, ephemeral=False):
+        sent.append(content)
+
+    interaction = types.SimpleNamespace(
+        response=types.SimpleNamespace(defer=defer), followup=types.SimpleNamespace(send=send)
+    )
+    await test_runner.run_test_post(interaction, "esi")
+    assert "Scheduler non démarré" in sent[0]
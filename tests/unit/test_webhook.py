@@ -0,0 +1,84 @@
+import asyncio
+import json
+
+import discord
+import httpx
+import pytest
+
+from src.botui.outbound import ChannelUnavailable, Outbound, is_retryable_error
+from src.botui.webhook import WebhookChannel, WebhookError
+
+URL = "https://discord.com/api/webhooks/1/token"
+
+
+def make_hook(handler):
+    return WebhookChannel(URL, client=httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+
+
+def test_webhook_posts_through_outbound_and_edits():
+    calls: list[tuple[str, str, dict]] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        body = json.loads(request.content) if request.content else {}
+        calls.append((request.method, request.url.path, body))
+        return httpx.Response(200, json={"id": "77"})
+
+    async def scenario():
+        hook = make_hook(handler)
+        out = Outbound()
+        out.attach(hook)
+        out.start()
+        fut = out.submit(discord.Embed(title="kill"), editable=True)
+        await fut
+        assert await out.edit(fut, discord.Embed(title="kill 12M")) is True
+        await hook.aclose()
+
+    asyncio.run(scenario())
+    assert [(m, p) for m, p, _ in calls] == [
+        ("POST", "/api/webhooks/1/token"),
+        ("PATCH", "/api/webhooks/1/token/messages/77"),
+    ]
+    assert calls[1][2]["embeds"][0]["title"] == "kill 12M"
+
+
+def test_webhook_rate_limit_is_retryable_with_retry_after():
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(429, json={"retry_after": 1.5})
+
+    async def scenario():
+        hook = make_hook(handler)
+        with pytest.raises(WebhookError) as err:
+            await hook.send(embeds=[discord.Embed(title="x")])
+        await hook.aclose()
+        return err.value
+
+    exc = asyncio.run(scenario())
+    assert is_retryable_error(exc) and exc.retry_after == 1.5
+
+
+def test_webhook_waits_for_empty_bucket():
+    seen: list[float] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        seen.append(asyncio.get_event_loop().time())
+        headers = {"X-RateLimit-Remaining": "0", "X-RateLimit-Reset-After": "0.2"}
+        return httpx.Response(200, json={"id": "1"}, headers=headers)
+
+    async def scenario():
+        hook = make_hook(handler)
+        await hook.send(embeds=[discord.Embed(title="a")])
+        await hook.send(embeds=[discord.Embed(title="b")])
+        await hook.aclose()
+
+    asyncio.run(scenario())
+    assert seen[1] - seen[0] >= 0.19
+
+
+def test_webhook_check_reports_deleted_webhook_as_unavailable():
+    async def scenario():
+        hook = make_hook(lambda request: httpx.Response(404, json={"message": "Unknown Webhook"}))
+        with pytest.raises(ChannelUnavailable):
+            await hook.check()
+        await hook.aclose()
+
+    asyncio.run(scenario())
@@ -0,0 +1,48 @@
+import asyncio
+import types
+
+from src.zkb import runner
+from src.zkb.zkill import KillmailRef
+
+
+def make_settings(**kw):
+    base = dict(
+        ZKB_ENABLE=True,
+        ZKB_PAGES=1,
+        ZKB_EVERY_N=3,
+        ZKB_INTERVAL_SECONDS=0,
+        ZKB_MAX_PER_CYCLE=0,
+        POLL_INTERVAL_SECONDS=120,
+    )
+    base.update(kw)
+    return types.SimpleNamespace(**base)
+
+
+def test_zkb_interval_defaults_to_every_n_polls():
+    assert runner.zkb_interval_seconds(make_settings()) == 360
+    assert runner.zkb_interval_seconds(make_settings(ZKB_INTERVAL_SECONDS=45)) == 45
+
+
+def test_zkb_cycle_oldest_first_with_budget(monkeypatch):
+    async def fake_fetch(corporation_id, *, pages=1):
+        # zKill : plus récent d'abord
+        return [KillmailRef(3, "c"), KillmailRef(2, "b"), KillmailRef(1, "a")]
+
+    monkeypatch.setattr(runner, "fetch_corporation_killrefs", fake_fetch)
+
+    seen: list[int] = []
+
+    async def handle_ref(km_id, km_hash):
+        seen.append(km_id)
+        # le kill 1 est déjà connu (posté via ESI) : ne consomme pas de budget
+        return km_id != 1
+
+    processed = asyncio.run(
+        runner.run_zkb_cycle(
+            settings=make_settings(ZKB_MAX_PER_CYCLE=1),
+            corporation_id=42,
+            handle_ref=handle_ref,
+        )
+    )
+    assert processed == 1
+    assert seen == [1, 2]